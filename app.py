@@ -12,24 +12,15 @@ sys.path.insert(0, str(backend_dir))
 # Configurar variáveis de ambiente para produção
 os.environ.setdefault("ENVIRONMENT", "production")
 
-# Importar a aplicação
-try:
-    from app.main_simple_render import app
-    print("Aplicacao Render carregada com sucesso!")
-except ImportError as e:
-    print(f"Erro ao importar aplicacao: {e}")
-    # Fallback para aplicação de emergência
-    from fastapi import FastAPI
-    
-    app = FastAPI(title="Espaço VIV - Emergency Mode")
-    
-    @app.get("/")
-    def root():
-        return {"message": "Espaço VIV API em modo de emergência", "status": "ok"}
-    
-    @app.get("/health")
-    def health():
-        return {"status": "healthy", "mode": "emergency"}
+# Carregado como "uvicorn app:app", este modulo se chama "app" e esconde o pacote
+# backend/app; com __path__ apontando para ele, os imports app.* abaixo funcionam
+if __name__ == "app":
+    __path__ = [str(backend_dir / "app")]
+
+# Importar a aplicação (sem fallback: um erro de importação deve derrubar o deploy, não
+# subir uma API de emergência que responde "healthy"). A inicialização do banco roda no
+# lifespan da aplicação, não na importação.
+from app.main_simple_render import app
 
 if __name__ == "__main__":
     import uvicorn
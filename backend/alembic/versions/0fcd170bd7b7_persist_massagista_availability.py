@@ -0,0 +1,47 @@
+"""Persist massagista availability
+
+Revision ID: 0fcd170bd7b7
+Revises: f87b2ce17b16
+Create Date: 2026-10-19 09:12:44.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0fcd170bd7b7'
+down_revision: Union[str, Sequence[str], None] = 'f87b2ce17b16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('availability_days',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('time_slots', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'date', name='uq_availability_days_user_date')
+    )
+    op.create_index(op.f('ix_availability_days_id'), 'availability_days', ['id'], unique=False)
+    op.create_index(op.f('ix_availability_days_user_id'), 'availability_days', ['user_id'], unique=False)
+    op.create_table('availability_versions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('availability_versions')
+    op.drop_index(op.f('ix_availability_days_user_id'), table_name='availability_days')
+    op.drop_index(op.f('ix_availability_days_id'), table_name='availability_days')
+    op.drop_table('availability_days')
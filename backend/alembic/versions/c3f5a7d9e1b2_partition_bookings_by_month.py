@@ -0,0 +1,113 @@
+"""Partition bookings by month
+
+Revision ID: c3f5a7d9e1b2
+Revises: 9b1e5c2d7a44
+Create Date: 2026-10-19 15:12:44.481920
+
+On PostgreSQL, bookings becomes a table partitioned by range of booking_date,
+with one partition per month (bookings_pYYYY_MM), a default partition for
+anything outside them, and a plain bookings_archive table for archived
+partitions (see app/partitions.py). Other databases keep the plain table.
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f5a7d9e1b2'
+down_revision: Union[str, Sequence[str], None] = '9b1e5c2d7a44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, user_id, unit_id, service_id, booking_date, status, notes, created_at"
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute("ALTER TABLE bookings RENAME TO bookings_legacy")
+    op.execute("ALTER TABLE bookings_legacy RENAME CONSTRAINT bookings_pkey TO bookings_legacy_pkey")
+    op.execute("ALTER INDEX ix_bookings_id RENAME TO ix_bookings_legacy_id")
+
+    # The partition key has to be part of the primary key
+    op.execute("""
+        CREATE TABLE bookings (
+            id INTEGER NOT NULL DEFAULT nextval('bookings_id_seq'::regclass),
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            unit_id INTEGER NOT NULL REFERENCES units (id),
+            service_id INTEGER NOT NULL REFERENCES services (id),
+            booking_date TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            status VARCHAR(20),
+            notes TEXT,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            PRIMARY KEY (id, booking_date)
+        ) PARTITION BY RANGE (booking_date)
+    """)
+    op.execute("CREATE INDEX ix_bookings_id ON bookings (id)")
+    op.execute("CREATE TABLE bookings_default PARTITION OF bookings DEFAULT")
+
+    first = bind.execute(sa.text("SELECT min(booking_date) FROM bookings_legacy")).scalar()
+    this_month = date.today().replace(day=1)
+    month = min(first.date().replace(day=1), this_month) if first else this_month
+    while month <= _add_months(this_month, MONTHS_AHEAD):
+        end = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE bookings_p{month:%Y_%m} PARTITION OF bookings "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+        month = end
+
+    op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_legacy")
+    # Keep the id sequence when the legacy table (its owner) is dropped
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id")
+    op.execute("DROP TABLE bookings_legacy")
+
+    op.execute("CREATE TABLE bookings_archive (LIKE bookings)")
+    op.execute("ALTER TABLE bookings_archive ADD PRIMARY KEY (id)")
+    op.create_index('ix_bookings_archive_booking_date', 'bookings_archive', ['booking_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute("ALTER TABLE bookings RENAME TO bookings_partitioned")
+    op.execute("ALTER TABLE bookings_partitioned RENAME CONSTRAINT bookings_pkey TO bookings_partitioned_pkey")
+    op.execute("ALTER INDEX ix_bookings_id RENAME TO ix_bookings_partitioned_id")
+    op.create_table('bookings',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('bookings_id_seq'::regclass)"), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unit_id', sa.Integer(), nullable=False),
+    sa.Column('service_id', sa.Integer(), nullable=False),
+    sa.Column('booking_date', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['service_id'], ['services.id'], ),
+    sa.ForeignKeyConstraint(['unit_id'], ['units.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_bookings_id'), 'bookings', ['id'], unique=False)
+    # Archived bookings come back too
+    op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_partitioned")
+    op.execute(f"INSERT INTO bookings ({COLUMNS}) SELECT {COLUMNS} FROM bookings_archive")
+    op.execute("ALTER SEQUENCE bookings_id_seq OWNED BY bookings.id")
+    op.execute("DROP TABLE bookings_partitioned")
+    op.drop_index('ix_bookings_archive_booking_date', table_name='bookings_archive')
+    op.execute("DROP TABLE bookings_archive")
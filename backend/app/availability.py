@@ -0,0 +1,125 @@
+"""
+Persistencia da disponibilidade das massagistas.
+
+Substitui o antigo dicionario em memoria `availability_db`. Cada gravacao e um
+unico upsert em lote seguido do incremento da versao do usuario; cada worker
+mantem um cache de leitura que so e recarregado quando a versao muda.
+"""
+import json
+import threading
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import AvailabilityDay, AvailabilityVersion
+
+# Cache por worker - structure: {user_id: (version, {date: {status, time_slots}})}
+_cache: Dict[int, Tuple[int, Dict[str, Dict]]] = {}
+_cache_lock = threading.Lock()
+
+UNAVAILABLE_DAY = {"status": "unavailable", "time_slots": []}
+
+def _dialect_insert(db: Session):
+    """Return the dialect-specific insert() that supports ON CONFLICT"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+def save_days(db: Session, user_id: int, dates: List[str], status: str, time_slots: List[str]) -> int:
+    """Upsert the availability of several days in one statement and bump the user version"""
+    if not dates:
+        return 0
+
+    encoded_slots = json.dumps(time_slots)
+    rows = [
+        {"user_id": user_id, "date": date_str, "status": status, "time_slots": encoded_slots}
+        for date_str in dict.fromkeys(dates)
+    ]
+
+    insert = _dialect_insert(db)
+    if insert is not None:
+        stmt = insert(AvailabilityDay).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id", "date"],
+            set_={
+                "status": stmt.excluded.status,
+                "time_slots": stmt.excluded.time_slots,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        ))
+
+        version_stmt = insert(AvailabilityVersion).values(user_id=user_id, version=1)
+        db.execute(version_stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"version": AvailabilityVersion.__table__.c.version + 1}
+        ))
+    else:
+        # Generic fallback for databases without ON CONFLICT support
+        existing = {
+            day.date: day for day in db.query(AvailabilityDay).filter(
+                AvailabilityDay.user_id == user_id,
+                AvailabilityDay.date.in_([row["date"] for row in rows])
+            )
+        }
+        for row in rows:
+            day = existing.get(row["date"])
+            if day:
+                day.status = row["status"]
+                day.time_slots = row["time_slots"]
+            else:
+                db.add(AvailabilityDay(**row))
+
+        version = db.get(AvailabilityVersion, user_id, with_for_update=True)
+        if version:
+            version.version += 1
+        else:
+            db.add(AvailabilityVersion(user_id=user_id, version=1))
+
+    db.commit()
+
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+    return len(rows)
+
+def get_user_days(db: Session, user_id: int) -> Dict[str, Dict]:
+    """Get all saved days for a user, served from the worker cache while the version is current"""
+    version = db.execute(
+        select(AvailabilityVersion.version).where(AvailabilityVersion.user_id == user_id)
+    ).scalar()
+    if version is None:
+        return {}
+
+    cached = _cache.get(user_id)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    days = {}
+    for day in db.query(AvailabilityDay).filter(AvailabilityDay.user_id == user_id):
+        days[day.date] = {
+            "status": day.status,
+            "time_slots": json.loads(day.time_slots) if day.time_slots else []
+        }
+
+    with _cache_lock:
+        _cache[user_id] = (version, days)
+
+    return days
+
+def get_day(db: Session, user_id: int, date_str: str, default: Dict = None) -> Dict:
+    """Get the availability of a single day"""
+    return get_user_days(db, user_id).get(date_str, default if default is not None else UNAVAILABLE_DAY)
+
+def get_month(db: Session, user_id: int, year: int, month: int) -> Dict[str, Dict]:
+    """Get the availability of every saved day in a month"""
+    month_str = f"{year}-{month:02d}"
+    return {
+        date_str: availability
+        for date_str, availability in get_user_days(db, user_id).items()
+        if date_str.startswith(month_str)
+    }
@@ -4,9 +4,11 @@ from datetime import datetime, timedelta
 from typing import List, Optional
 import secrets
 import hashlib
+import os
 
 from app.models import User, Unit, Service, Booking, PasswordReset
 from pydantic import EmailStr
+from utils.cache import TTLCache
 
 # ============================================================================
 # USER CRUD OPERATIONS
@@ -42,6 +44,38 @@ def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     """Get user by ID"""
     return db.query(User).filter(User.id == user_id).first()
 
+# ============================================================================
+# PRINCIPAL CACHE - authenticated user data by ID
+# ============================================================================
+
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+)
+
+def get_user_principal(db: Session, user_id: int) -> Optional[dict]:
+    """Get the authenticated user data, cached to avoid a users query per request"""
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = get_user_by_id(db, user_id)
+        if user is None:
+            return None
+        principal = {
+            "id": user.id,
+            "name": user.name,
+            "email": user.email,
+            "phone": user.phone,
+            "user_type": user.user_type,
+            "created_at": user.created_at,
+            "is_active": user.is_active
+        }
+        principal_cache.set(user_id, principal)
+    return dict(principal)
+
+def invalidate_user_principal(user_id: int):
+    """Must be called after any change to a user row (profile, deactivation, password)"""
+    principal_cache.pop(user_id)
+
 def get_all_users(db: Session) -> List[User]:
     """Get all active users"""
     return db.query(User).filter(User.is_active == True).all()
@@ -57,6 +91,7 @@ def update_user(db: Session, user_id: int, update_data: dict) -> Optional[User]:
             setattr(user, key, value)
     
     db.commit()
+    invalidate_user_principal(user_id)
     db.refresh(user)
     return user
 
@@ -68,6 +103,7 @@ def change_user_password(db: Session, user_id: int, new_password: str) -> bool:
     
     user.password = hash_password(new_password)
     db.commit()
+    invalidate_user_principal(user_id)
     return True
 
 # ============================================================================
@@ -224,4 +260,5 @@ def reset_user_password(db: Session, token: str, new_password: str) -> bool:
     password_reset.is_used = True
     
     db.commit()
+    invalidate_user_principal(user.id)
     return True
\ No newline at end of file
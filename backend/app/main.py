@@ -6,17 +6,33 @@ from sqlalchemy.orm import Session
 import os
 from contextlib import asynccontextmanager
 
-from database.connection import get_db, init_db
-from routes import auth, bookings, massagistas, units
-from utils.auth import get_current_user
+from database.connection import get_db, init_db, replica_router
+from database.deadlines import DeadlineMiddleware
+from database.instrumentation import SQLInstrumentationMiddleware
+from database.replica import ReadYourWritesMiddleware
+from database.maintenance import job_runner
+from routes import admin, auth, bookings, massagistas, units
+from utils.auth import get_current_user, token_versions
+from utils.denylist import token_denylist
+from utils.avatars import AVATAR_DIR, AVATAR_URL_PREFIX, ImmutableStaticFiles
+from utils.rate_limit import RateLimitMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
+    token_versions.refresh()
+    token_denylist.refresh()
+    auth.mailer.start()
+    bookings.reminder_scheduler.start()
+    job_runner.start()
+    replica_router.start()
     yield
     # Shutdown
-    pass
+    replica_router.stop()
+    job_runner.stop()
+    bookings.reminder_scheduler.stop()
+    auth.mailer.stop()
 
 app = FastAPI(
     title="Espaço VIV API",
@@ -25,6 +41,19 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Per-route deadlines, applied as database statement timeouts (503 once expired)
+app.add_middleware(DeadlineMiddleware)
+
+# Query count and DB time per request (Server-Timing header, per-route histograms in /api/admin/metrics)
+app.add_middleware(SQLInstrumentationMiddleware)
+
+# Rate limiting for login and public calendar endpoints (runs inside CORS so 429s
+# still carry CORS headers, and before any route does hashing or DB work)
+app.add_middleware(RateLimitMiddleware)
+
+# Keeps a client's reads on the primary for a few seconds after it writes
+app.add_middleware(ReadYourWritesMiddleware, router=replica_router)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +63,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Uploaded avatars are content-addressed, so they get long-lived immutable cache headers
+# (mounted before /static so it takes precedence)
+os.makedirs(AVATAR_DIR, exist_ok=True)
+app.mount(AVATAR_URL_PREFIX, ImmutableStaticFiles(directory=AVATAR_DIR), name="avatars")
+
 # Static files
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
 if os.path.exists(frontend_path):
@@ -44,6 +78,7 @@ app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(bookings.router, prefix="/api/bookings", tags=["bookings"])
 app.include_router(massagistas.router, prefix="/api/massagista", tags=["massagistas"])
 app.include_router(units.router, prefix="/api/units", tags=["units"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 @app.get("/")
 async def root():
@@ -51,7 +86,10 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "version": "1.0.0"}
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+    }
 
 if __name__ == "__main__":
     import uvicorn
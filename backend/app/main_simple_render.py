@@ -9,18 +9,26 @@ import jwt
 from jwt.exceptions import DecodeError, ExpiredSignatureError
 import os
 import secrets
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import calendar as cal
 from collections import defaultdict
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
 
 # Database imports
-from app.database import get_db, create_tables, init_db
+from app.database import get_db, get_read_db, verify_migrations, init_db, engine, read_engine, DB_AUTO_CREATE
+from database.engine import pool_status, prewarm_pool
+from database.deadlines import DeadlineMiddleware
+from database.instrumentation import SQLInstrumentationMiddleware, route_query_metrics
+from database.slow_queries import slow_query_log
 from app.models import User, Unit, Service, Booking, PasswordReset
 from app import crud
+from app import availability
+from app.maintenance import job_runner
+from utils.rate_limit import RateLimitMiddleware
+from utils.cache import TTLCache, token_cache_key
+from utils.mailer import Mailer
+from utils.startup import startup_timer
 
 # Carrega as variaveis de ambiente do arquivo .env
 load_dotenv()
@@ -40,18 +48,53 @@ def validate_email_configuration():
     else:
         print("[EMAIL] Sistema de email desativado")
 
-# Validate email configuration on startup
-validate_email_configuration()
+# Seeding the default units/services is a one-off: off by default so workers do not repeat it
+DB_SEED_ON_STARTUP = os.getenv("DB_SEED_ON_STARTUP", str(DB_AUTO_CREATE)).lower() == "true"
+
+# Background email delivery (outbox table + SMTP worker thread)
+mailer = Mailer(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: importing this module has no side effects, everything runs here once per process
+    startup_timer.begin()
+    with startup_timer.phase("email_config"):
+        validate_email_configuration()
+    with startup_timer.phase("migrations"):
+        verify_migrations()
+    if DB_SEED_ON_STARTUP:
+        with startup_timer.phase("seed"):
+            init_db()
+    with startup_timer.phase("pool_prewarm"):
+        prewarm_pool(engine)
+        if read_engine is not engine:
+            prewarm_pool(read_engine)
+    with startup_timer.phase("workers"):
+        mailer.start()
+        # Periodic cleanup (expired reset tokens, past bookings), run by one process at a time
+        job_runner.start()
+    startup_timer.finish()
+    yield
+    # Shutdown
+    job_runner.stop()
+    mailer.stop()
 
 app = FastAPI(
     title="Espaco VIV API - Render",
     description="API para sistema de agendamento de massagens",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Initialize database tables and data
-create_tables()
-init_db()
+# Per-route deadlines, applied as database statement timeouts (503 once expired)
+app.add_middleware(DeadlineMiddleware)
+
+# Query count and DB time per request (Server-Timing header, per-route histograms in /api/admin/metrics)
+app.add_middleware(SQLInstrumentationMiddleware)
+
+# Rate limiting for login and public calendar endpoints (runs inside CORS so 429s
+# still carry CORS headers, and before any route does hashing or DB work)
+app.add_middleware(RateLimitMiddleware)
 
 # CORS - mais permissivo para testes iniciais
 app.add_middleware(
@@ -66,6 +109,9 @@ app.add_middleware(
 SECRET_KEY = os.getenv("SECRET_KEY", "espacoviv-render-key-2024")
 ALGORITHM = "HS256"
 
+# Verified token payloads by token digest, expiring at the token's exp (see verify_access_token)
+verified_token_cache = TTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "4096")))
+
 # ============================================================================
 # MODELOS
 # ============================================================================
@@ -162,9 +208,7 @@ class AdvancedDayView(BaseModel):
 # This will be replaced by database PasswordReset table
 password_reset_tokens = {}
 
-# Availability database - structure: {user_id: {date: {status, time_slots}}}
-# This will be extended later with proper database tables
-availability_db = {}
+# Availability is persisted in the availability_days table - see app/availability.py
 
 # ============================================================================
 # FUNÇÕES UTILITÁRIAS
@@ -187,24 +231,21 @@ def verify_access_token(token: str, db: Session = None) -> Dict:
         raise HTTPException(status_code=401, detail="Erro interno do servidor")
         
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        key = token_cache_key(token)
+        payload = verified_token_cache.get(key)
+        if payload is None:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            verified_token_cache.set(key, payload, expires_at=payload.get("exp"))
         user_id = payload.get("user_id")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Token invalido")
         
-        # Find user in database
-        user = crud.get_user_by_id(db, user_id)
+        # Find user in database (cached per worker, see crud.get_user_principal)
+        user = crud.get_user_principal(db, user_id)
         if user is None:
             raise HTTPException(status_code=401, detail="Usuario nao encontrado")
         
-        return {
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "phone": user.phone,
-            "created_at": user.created_at,
-            "is_active": user.is_active
-        }
+        return user
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado")
     except DecodeError:
@@ -280,92 +321,14 @@ def validate_password_strength(password: str) -> Dict[str, Any]:
     }
 
 def send_password_reset_email(email: str, reset_token: str):
-    """Send password reset email with professional configuration"""
-    # Email configuration from environment variables
-    email_enabled = os.getenv("EMAIL_ENABLED", "false").lower() == "true"
-    smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USER", "")
-    smtp_password = os.getenv("SMTP_PASSWORD", "")
-    from_name = os.getenv("EMAIL_FROM_NAME", "Espaco VIV")
-    reply_to = os.getenv("EMAIL_REPLY_TO", "noreply@espacoviv.com")
-    
-    # Check if email is enabled and configured
-    if not email_enabled:
-        print(f"[EMAIL] Email desabilitado. Token de reset para {email}: {reset_token}")
-        return False
-        
-    if not all([smtp_user, smtp_password]):
-        print(f"[EMAIL] Configuracao incompleta. Token de reset para {email}: {reset_token}")
+    """Queue the password reset email; the outbox worker delivers it in the background"""
+    if not mailer.enabled:
+        print(f"[EMAIL] Email desabilitado ou configuracao incompleta. Token de reset para {email}: {reset_token}")
         return False
     
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = f"{from_name} <{smtp_user}>"
-        msg['To'] = email
-        msg['Reply-To'] = reply_to
-        msg['Subject'] = "Espaco VIV - Codigo de Redefinicao de Senha"
-        
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>Espaco VIV - Redefinicao de Senha</title>
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: linear-gradient(135deg, #47103C 0%, #6B2154 100%); padding: 30px; border-radius: 10px; text-align: center;">
-                    <h1 style="color: white; margin: 0; font-size: 24px;">Espaco VIV</h1>
-                    <p style="color: #f0f0f0; margin: 10px 0 0 0;">Redefinicao de Senha</p>
-                </div>
-                
-                <div style="padding: 30px; background: #f9f9f9; border-radius: 10px; margin-top: 20px;">
-                    <h2 style="color: #47103C; margin-top: 0;">Ola!</h2>
-                    <p>Voce solicitou a redefinicao da sua senha. Use o codigo de verificacao abaixo:</p>
-                    
-                    <div style="background: white; padding: 25px; border-radius: 8px; text-align: center; margin: 25px 0; border: 2px dashed #47103C;">
-                        <h2 style="color: #47103C; font-family: 'Courier New', monospace; letter-spacing: 3px; margin: 0; font-size: 28px;">{reset_token}</h2>
-                    </div>
-                    
-                    <div style="background: #fff3cd; border: 1px solid #ffeeba; border-radius: 5px; padding: 15px; margin: 20px 0;">
-                        <p style="margin: 0; font-size: 14px; color: #856404;">
-                            <strong>Importante:</strong> Este codigo e valido por 1 hora. Se voce nao solicitou esta redefinicao, ignore este email.
-                        </p>
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin-top: 30px; padding: 20px; color: #666; font-size: 12px;">
-                    <p>Esta mensagem foi enviada automaticamente pelo sistema Espaco VIV.</p>
-                    <p>Para duvidas, entre em contato conosco.</p>
-                    <hr style="border: none; border-top: 1px solid #eee; margin: 15px 0;">
-                    <p>&copy; 2024 Espaco VIV. Todos os direitos reservados.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(html_body, 'html'))
-        
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
-        
-        print(f"[EMAIL] Email de redefinicao enviado com sucesso para {email}")
-        return True
-        
-    except smtplib.SMTPAuthenticationError:
-        print(f"[EMAIL] ERRO: Falha na autenticacao SMTP para {email}")
-        return False
-    except smtplib.SMTPException as e:
-        print(f"[EMAIL] ERRO SMTP ao enviar para {email}: {str(e)}")
-        return False
-    except Exception as e:
-        print(f"[EMAIL] ERRO geral ao enviar para {email}: {str(e)}")
-        return False
+    mailer.enqueue(email, "password_reset", {"reset_token": reset_token})
+    print(f"[EMAIL] Email de redefinicao enfileirado para {email}")
+    return True
 
 def get_default_slots(target_date: date) -> List[str]:
     """Get default time slots based on day of week"""
@@ -409,6 +372,26 @@ async def health_check():
         }
     }
 
+# ADMIN
+@app.get("/api/admin/metrics")
+async def get_metrics(current_user: Dict = Depends(get_current_user)):
+    """Connection pool, background jobs, startup phases and per-route SQL histograms"""
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores")
+    return {
+        "database_pool": pool_status(engine),
+        "jobs": job_runner.status(),
+        "startup": startup_timer.status(),
+        "sql_by_route": route_query_metrics.snapshot()
+    }
+
+@app.get("/api/admin/slow-queries")
+async def get_slow_queries(limit: int = 50, current_user: Dict = Depends(get_current_user)):
+    """Most recent slow statements first, with their captured plans"""
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores")
+    return {**slow_query_log.status(), "entries": slow_query_log.entries(min(max(limit, 1), 500))}
+
 # AUTH
 @app.post("/api/auth/register")
 async def register(user_data: UserRegister, db: Session = Depends(get_db)):
@@ -558,7 +541,7 @@ async def get_units():
 
 # MASSAGISTAS
 @app.get("/api/massagista/by-unit/{unit_code}")
-async def get_massagistas_by_unit(unit_code: str, db: Session = Depends(get_db)):
+async def get_massagistas_by_unit(unit_code: str, db: Session = Depends(get_read_db)):
     from app.models import User, UserSpecialty, Service
     print(f"Buscando massagistas para unidade: {unit_code}")
     
@@ -638,7 +621,7 @@ async def create_booking(booking_data: BookingCreate):
     }
 
 @app.get("/api/bookings/available-times/{massagista_id}/{date}")
-async def get_available_times(massagista_id: int, date: str):
+async def get_available_times(massagista_id: int, date: str, db: Session = Depends(get_read_db)):
     # Mock massagista validation for now
     valid_massagista_ids = [1, 2, 3, 4]
     if massagista_id not in valid_massagista_ids:
@@ -651,10 +634,9 @@ async def get_available_times(massagista_id: int, date: str):
         
         # Buscar horários configurados pelo massagista para esta data
         configured_times = []
-        if massagista_id in availability_db and date in availability_db[massagista_id]:
-            day_availability = availability_db[massagista_id][date]
-            if day_availability.get("status") == "available":
-                configured_times = day_availability.get("time_slots", [])
+        day_availability = availability.get_day(db, massagista_id, date)
+        if day_availability.get("status") == "available":
+            configured_times = day_availability.get("time_slots", [])
         
         # Se não há configuração específica, usar horários padrão
         if not configured_times:
@@ -686,9 +668,12 @@ async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(
     
     # Create password reset token in database
     password_reset = crud.create_password_reset_token(db, user.id)
-    
+    reset_token = password_reset.token
+    # Release the write lock before the outbox write, which uses its own connection
+    db.commit()
+
     # Try to send the email
-    email_sent = send_password_reset_email(request.email, password_reset.token)
+    email_sent = send_password_reset_email(request.email, reset_token)
     
     # Always return the same message for security (don't reveal if email exists)
     return {
@@ -814,7 +799,7 @@ async def get_services():
 
 # NOVOS ENDPOINTS FUNCIONAIS
 @app.post("/api/test/availability/day/{date}")
-async def test_day_availability(date: str, request: Request):
+async def test_day_availability(date: str, request: Request, db: Session = Depends(get_db)):
     try:
         body = await request.body()
         import json
@@ -826,13 +811,7 @@ async def test_day_availability(date: str, request: Request):
         print(f"SUCESSO Day {date}: status={status}, slots={len(time_slots)}")
         
         user_id = 1
-        if user_id not in availability_db:
-            availability_db[user_id] = {}
-        
-        availability_db[user_id][date] = {
-            "status": status,
-            "time_slots": time_slots
-        }
+        availability.save_days(db, user_id, [date], status, time_slots)
         
         return {"message": "OK"}
     except Exception as e:
@@ -840,7 +819,7 @@ async def test_day_availability(date: str, request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/test/availability/week")
-async def test_week_availability(request: Request):
+async def test_week_availability(request: Request, db: Session = Depends(get_db)):
     try:
         body = await request.body()
         import json
@@ -853,14 +832,7 @@ async def test_week_availability(request: Request):
         print(f"SUCESSO Week: {len(dates)} dates, status={status}, slots={len(time_slots)}")
         
         user_id = 1
-        if user_id not in availability_db:
-            availability_db[user_id] = {}
-        
-        for date_str in dates:
-            availability_db[user_id][date_str] = {
-                "status": status,
-                "time_slots": time_slots
-            }
+        availability.save_days(db, user_id, dates, status, time_slots)
         
         return {"message": "OK"}
     except Exception as e:
@@ -868,14 +840,14 @@ async def test_week_availability(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/calendar/day/{date}")
-async def get_saved_day_availability(date: str):
+async def get_saved_day_availability(date: str, db: Session = Depends(get_read_db)):
     try:
         user_id = 1
-        if user_id not in availability_db or date not in availability_db[user_id]:
+        data = availability.get_user_days(db, user_id).get(date)
+        if data is None:
             print(f"GET Day {date}: VAZIO")
             return {"status": "available", "time_slots": []}
         
-        data = availability_db[user_id][date]
         print(f"GET Day {date}: {data}")
         return data
     except Exception as e:
@@ -883,7 +855,7 @@ async def get_saved_day_availability(date: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/massagista/appointments/today")
-async def get_today_appointments(db: Session = Depends(get_db)):
+async def get_today_appointments(db: Session = Depends(get_read_db)):
     try:
         user_id = 1
         today = datetime.now().date()
@@ -919,7 +891,7 @@ async def get_today_appointments(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/massagista/appointments/week")
-async def get_week_appointments(db: Session = Depends(get_db)):
+async def get_week_appointments(db: Session = Depends(get_read_db)):
     try:
         user_id = 1
         today = datetime.now().date()
@@ -957,7 +929,7 @@ async def get_week_appointments(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/massagista/appointments/month")
-async def get_month_appointments(db: Session = Depends(get_db)):
+async def get_month_appointments(db: Session = Depends(get_read_db)):
     try:
         user_id = 1
         today = datetime.now().date()
@@ -996,7 +968,7 @@ async def get_month_appointments(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/massagista/appointments/all")
-async def get_all_appointments(db: Session = Depends(get_db)):
+async def get_all_appointments(db: Session = Depends(get_read_db)):
     try:
         user_id = 1
         
@@ -1025,7 +997,7 @@ async def get_all_appointments(db: Session = Depends(get_db)):
 
 # AVAILABILITY/CALENDAR APIs
 @app.put("/api/massagista/availability/{date}")
-async def set_day_availability(date: str, request: Request):
+async def set_day_availability(date: str, request: Request, db: Session = Depends(get_db)):
     """Set availability for a specific day"""
     try:
         # Lê o body da requisição diretamente
@@ -1047,13 +1019,7 @@ async def set_day_availability(date: str, request: Request):
         # Temporariamente usando user_id fixo para teste
         user_id = 1
         
-        if user_id not in availability_db:
-            availability_db[user_id] = {}
-        
-        availability_db[user_id][date] = {
-            "status": status,
-            "time_slots": time_slots
-        }
+        availability.save_days(db, user_id, [date], status, time_slots)
         
         print(f"Sucesso! Dados salvos para dia {date} user {user_id}")
         return {"message": f"Disponibilidade para {date} atualizada com sucesso"}
@@ -1063,14 +1029,11 @@ async def set_day_availability(date: str, request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/massagista/availability/{date}")
-async def get_day_availability(date: str, current_user: Dict = Depends(get_current_user)):
+async def get_day_availability(date: str, current_user: Dict = Depends(get_current_user), db: Session = Depends(get_read_db)):
     """Get availability for a specific day"""
     user_id = current_user["id"]
     
-    if user_id not in availability_db or date not in availability_db[user_id]:
-        return {"status": "unavailable", "time_slots": []}
-    
-    return availability_db[user_id][date]
+    return availability.get_day(db, user_id, date)
 
 @app.put("/api/test/week-data")
 async def test_week_data(request: WeekAvailabilityRequest):
@@ -1082,7 +1045,7 @@ async def test_week_data(request: WeekAvailabilityRequest):
     return {"message": "Dados validados com sucesso", "data": request}
 
 @app.put("/api/massagista/availability/week")
-async def set_week_availability(request: Request):
+async def set_week_availability(request: Request, db: Session = Depends(get_db)):
     """Set availability for entire week"""
     try:
         # Lê o body da requisição diretamente
@@ -1105,15 +1068,8 @@ async def set_week_availability(request: Request):
         # Temporariamente usando user_id fixo para teste
         user_id = 1
         
-        if user_id not in availability_db:
-            availability_db[user_id] = {}
-        
-        # Set availability for all provided dates
-        for date_str in dates:
-            availability_db[user_id][date_str] = {
-                "status": status,
-                "time_slots": time_slots
-            }
+        # Set availability for all provided dates in a single batched upsert
+        availability.save_days(db, user_id, dates, status, time_slots)
         
         print(f"Sucesso! Dados salvos para user {user_id}")
         return {"message": f"Semana marcada como {status}"}
@@ -1123,48 +1079,22 @@ async def set_week_availability(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/massagista/availability/month/{year}/{month}")
-async def get_month_availability(year: int, month: int, current_user: Dict = Depends(get_current_user)):
+async def get_month_availability(year: int, month: int, current_user: Dict = Depends(get_current_user), db: Session = Depends(get_read_db)):
     """Get availability for entire month"""
     user_id = current_user["id"]
     
-    if user_id not in availability_db:
-        return {}
-    
-    # Filter availability for the requested month
-    month_availability = {}
-    month_str = f"{year}-{month:02d}"
-    
-    for date_str, availability in availability_db[user_id].items():
-        if date_str.startswith(month_str):
-            month_availability[date_str] = availability
-    
-    return month_availability
+    return availability.get_month(db, user_id, year, month)
 
 # PUBLIC APIs for calendar consultation (no auth needed)
 @app.get("/api/massagista/{massagista_id}/availability/month/{year}/{month}")
-async def get_massagista_month_availability(massagista_id: int, year: int, month: int):
+async def get_massagista_month_availability(massagista_id: int, year: int, month: int, db: Session = Depends(get_read_db)):
     """Get public availability for a specific massagista for entire month"""
-    if massagista_id not in availability_db:
-        return {}
-    
-    # Filter availability for the requested month
-    month_availability = {}
-    month_str = f"{year}-{month:02d}"
-    
-    for date_str, availability in availability_db[massagista_id].items():
-        if date_str.startswith(month_str):
-            month_availability[date_str] = availability
-    
-    return month_availability
+    return availability.get_month(db, massagista_id, year, month)
 
 @app.get("/api/massagista/{massagista_id}/availability/day/{date}")
-async def get_massagista_day_availability(massagista_id: int, date: str):
+async def get_massagista_day_availability(massagista_id: int, date: str, db: Session = Depends(get_read_db)):
     """Get public availability for a specific massagista for a specific day"""
-    if massagista_id not in availability_db:
-        return {"status": "unavailable", "time_slots": []}
-    
-    day_availability = availability_db[massagista_id].get(date, {"status": "unavailable", "time_slots": []})
-    return day_availability
+    return availability.get_day(db, massagista_id, date)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+import os
+
+from sqlalchemy import and_, or_
+
+from app.database import engine
+from app.models import AvailabilityDay, Booking, PasswordReset
+from app.partitions import BOOKING_ARCHIVE_AFTER_MONTHS, archive_partitions, ensure_future_partitions
+from utils.jobs import BOOKING_SETTLE_HOURS, Job, JobContext, JobRunner, local_now
+from utils.mailer import purge_email_outbox
+
+# Maintenance sweeps for the Render app, executed by the leader process only
+
+AVAILABILITY_RETENTION_DAYS = int(os.getenv("AVAILABILITY_RETENTION_DAYS", "90"))
+
+def purge_password_resets(ctx: JobContext) -> int:
+    """Delete reset tokens that were used or have expired"""
+    resets = PasswordReset.__table__
+    return ctx.batched(resets, or_(resets.c.is_used == True, resets.c.expires_at < datetime.utcnow()))
+
+def complete_past_bookings(ctx: JobContext) -> int:
+    """Confirmed bookings whose time has passed become completed"""
+    bookings = Booking.__table__
+    cutoff = local_now() - timedelta(hours=BOOKING_SETTLE_HOURS)
+    return ctx.batched(
+        bookings,
+        and_(bookings.c.booking_date < cutoff, bookings.c.status == "confirmed"),
+        {"status": "completed"}
+    )
+
+def purge_old_availability(ctx: JobContext) -> int:
+    days = AvailabilityDay.__table__
+    cutoff = (local_now() - timedelta(days=AVAILABILITY_RETENTION_DAYS)).strftime("%Y-%m-%d")
+    return ctx.batched(days, days.c.date < cutoff)
+
+def maintain_booking_partitions(ctx: JobContext) -> int:
+    """Create the upcoming monthly partitions and archive the old ones (PostgreSQL only)"""
+    created = ensure_future_partitions(ctx.engine)
+    return len(created) + archive_partitions(ctx.engine, BOOKING_ARCHIVE_AFTER_MONTHS)
+
+job_runner = JobRunner(engine, [
+    Job("purge_password_resets", 60 * 60, purge_password_resets),
+    Job("complete_past_bookings", 15 * 60, complete_past_bookings),
+    Job("purge_old_availability", 24 * 60 * 60, purge_old_availability),
+    Job("purge_email_outbox", 6 * 60 * 60, purge_email_outbox),
+    Job("maintain_booking_partitions", 24 * 60 * 60, maintain_booking_partitions),
+])
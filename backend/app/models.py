@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -53,6 +53,7 @@ class Service(Base):
 class Booking(Base):
     __tablename__ = "bookings"
     
+    # On PostgreSQL the table is partitioned by month and its primary key is (id, booking_date), see app/partitions.py
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     unit_id = Column(Integer, ForeignKey("units.id"), nullable=False)
@@ -87,4 +88,22 @@ class UserSpecialty(Base):
     custom_price = Column(Float, nullable=True)  # If null, uses service default price
     
     user = relationship("User", back_populates="specialties")
-    service = relationship("Service")
\ No newline at end of file
+    service = relationship("Service")
+
+class AvailabilityDay(Base):
+    __tablename__ = "availability_days"
+    __table_args__ = (UniqueConstraint("user_id", "date", name="uq_availability_days_user_date"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    date = Column(String(10), nullable=False)  # YYYY-MM-DD
+    status = Column(String(20), nullable=False)  # available or unavailable
+    time_slots = Column(Text, nullable=True)  # JSON list of HH:MM strings
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AvailabilityVersion(Base):
+    __tablename__ = "availability_versions"
+    
+    # Bumped on every write so each worker knows when its cached copy is stale
+    user_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
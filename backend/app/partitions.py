@@ -0,0 +1,164 @@
+"""
+Monthly partitions of the render bookings table (PostgreSQL only).
+
+The c3f5a7d9e1b2 migration turns bookings into a table partitioned by range of
+booking_date: bookings_pYYYY_MM holds one month, bookings_default anything
+outside the existing months. ensure_future_partitions keeps the next
+BOOKING_PARTITION_MONTHS_AHEAD months created ahead of time, moving rows that
+already landed in the default partition. archive_partitions detaches months
+older than BOOKING_ARCHIVE_AFTER_MONTHS and moves them to bookings_archive, or
+with BOOKING_ARCHIVE_MODE=file to gzipped CSV files in BOOKING_ARCHIVE_DIR, so
+the hot table only keeps recent history. Both run daily as a maintenance job.
+
+    python -m app.partitions ensure
+    python -m app.partitions archive --older-than 24 --mode file
+
+On other databases bookings is a plain table and everything here is a no-op.
+"""
+import argparse
+import gzip
+import os
+import re
+from datetime import date
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.database import engine as default_engine
+
+BOOKING_PARTITION_MONTHS_AHEAD = int(os.getenv("BOOKING_PARTITION_MONTHS_AHEAD", "3"))
+BOOKING_ARCHIVE_AFTER_MONTHS = int(os.getenv("BOOKING_ARCHIVE_AFTER_MONTHS", "0"))  # 0 disables archival
+BOOKING_ARCHIVE_MODE = os.getenv("BOOKING_ARCHIVE_MODE", "table").lower()  # table or file
+BOOKING_ARCHIVE_DIR = os.getenv("BOOKING_ARCHIVE_DIR", "archive")
+
+PARENT = "bookings"
+ARCHIVE_TABLE = "bookings_archive"
+DEFAULT_PARTITION = "bookings_default"
+_PARTITION_NAME = re.compile(r"^bookings_p(\d{4})_(\d{2})$")
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_p{month:%Y_%m}"
+
+def is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.exec_driver_sql(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%(table)s)", {"table": PARENT}
+    ).first() is not None
+
+def list_partitions(conn) -> List[Tuple[date, str]]:
+    """Monthly partitions attached to bookings, oldest first"""
+    rows = conn.exec_driver_sql(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%(table)s)", {"table": PARENT}
+    )
+    months = []
+    for (name,) in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(months)
+
+def create_partition(conn, month: date) -> str:
+    """Create and attach the partition of month, taking its rows out of the default partition"""
+    name = partition_name(month)
+    start, end = f"{month:%Y-%m-%d}", f"{add_months(month, 1):%Y-%m-%d}"
+    conn.exec_driver_sql(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    # ATTACH fails while the default partition still holds rows of this range
+    moved = conn.exec_driver_sql(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE booking_date >= %(start)s AND booking_date < %(end)s "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved",
+        {"start": start, "end": end}
+    ).rowcount
+    conn.exec_driver_sql(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+    print(f"[PARTITIONS] Particao {name} criada ({moved} agendamentos movidos da particao padrao)")
+    return name
+
+def ensure_future_partitions(engine=None, months_ahead: int = BOOKING_PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Create the missing partitions from the current month up to months_ahead months from now"""
+    engine = engine or default_engine
+    created = []
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return created
+        existing = {month for month, _ in list_partitions(conn)}
+    this_month = date.today().replace(day=1)
+    for offset in range(months_ahead + 1):
+        month = add_months(this_month, offset)
+        if month not in existing:
+            # One transaction per month keeps the ACCESS EXCLUSIVE lock of ATTACH short
+            with engine.begin() as conn:
+                created.append(create_partition(conn, month))
+    return created
+
+def _archive_to_file(conn, name: str, directory: Path) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name.replace('_p', '_', 1)}.csv.gz"
+    cursor = conn.connection.cursor()
+    try:
+        with gzip.open(path, "wt", encoding="utf-8", newline="") as output:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", output)
+    finally:
+        cursor.close()
+    return path
+
+def archive_partitions(engine=None, older_than_months: int = BOOKING_ARCHIVE_AFTER_MONTHS,
+                       mode: str = BOOKING_ARCHIVE_MODE, directory: Optional[str] = None) -> int:
+    """Move the partitions of months that ended more than older_than_months ago out of bookings.
+    Returns the number of archived bookings."""
+    engine = engine or default_engine
+    if older_than_months <= 0:
+        return 0
+    if mode not in ("table", "file"):
+        raise ValueError(f"BOOKING_ARCHIVE_MODE invalido: {mode}")
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return 0
+        partitions = list_partitions(conn)
+
+    cutoff = add_months(date.today().replace(day=1), -older_than_months)
+    archived = 0
+    for month, name in partitions:
+        if month >= cutoff:
+            break
+        # Detach, copy and drop commit together, so a failure leaves the partition in place
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+            if mode == "file":
+                rows = conn.exec_driver_sql(f"SELECT count(*) FROM {name}").scalar()
+                target = _archive_to_file(conn, name, Path(directory or BOOKING_ARCHIVE_DIR))
+            else:
+                rows = conn.exec_driver_sql(f"INSERT INTO {ARCHIVE_TABLE} SELECT * FROM {name}").rowcount
+                target = ARCHIVE_TABLE
+            conn.exec_driver_sql(f"DROP TABLE {name}")
+        archived += rows
+        print(f"[PARTITIONS] Particao {name} arquivada em {target} ({rows} agendamentos)")
+    return archived
+
+def main():
+    parser = argparse.ArgumentParser(description="Particoes mensais de agendamentos (PostgreSQL)")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    ensure = subcommands.add_parser("ensure", help="cria as particoes dos proximos meses")
+    ensure.add_argument("--months-ahead", type=int, default=BOOKING_PARTITION_MONTHS_AHEAD)
+    archive = subcommands.add_parser("archive", help="arquiva particoes antigas")
+    archive.add_argument("--older-than", type=int, default=BOOKING_ARCHIVE_AFTER_MONTHS, help="meses")
+    archive.add_argument("--mode", choices=("table", "file"), default=BOOKING_ARCHIVE_MODE)
+    archive.add_argument("--dir", default=BOOKING_ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    with default_engine.connect() as conn:
+        if not is_partitioned(conn):
+            print("[PARTITIONS] A tabela bookings nao e particionada (requer PostgreSQL), nada a fazer")
+            return
+    if args.command == "ensure":
+        created = ensure_future_partitions(months_ahead=args.months_ahead)
+        print(f"[PARTITIONS] {len(created)} particoes criadas")
+    else:
+        archived = archive_partitions(older_than_months=args.older_than, mode=args.mode, directory=args.dir)
+        print(f"[PARTITIONS] {archived} agendamentos arquivados")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Seeding for the render stack database.
+
+    python -m app.seed                     # default units and services (idempotent)
+    python -m app.seed synthetic --units 200 --massagistas 5000 --clients 200000 --bookings 10000000
+
+The synthetic dataset reproduces production-scale volumes and distributions
+(unit popularity, busy weekdays and hours, service mix, lead time, status by
+date) so query plans can be checked locally. Rows are generated in batches and
+written with COPY on PostgreSQL or a driver-level executemany elsewhere. The
+data is tagged (SYNTHETIC_UNIT_PREFIX, SYNTHETIC_EMAIL_DOMAIN) so a second run
+is skipped and --reset removes it before loading again.
+"""
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import delete, func, or_, select
+
+from app.crud import hash_password
+from app.database import engine
+from app.models import Booking, PasswordReset, Service, Unit, User, UserSpecialty
+
+DEFAULT_UNITS = [
+    {
+        "name": "Espaco VIV - Asa Norte",
+        "address": "SQN 203 Bloco A, Loja 06 - Asa Norte, Brasilia - DF, 70832-010",
+        "description": "Nossa unidade da Asa Norte oferece um ambiente acolhedor e moderno, com profissionais especializados em diversas tecnicas de bem-estar e relaxamento.",
+        "image_url": "frontend/assets/images/brasilia-nova.jpg"
+    },
+    {
+        "name": "Espaco VIV - Sao Paulo",
+        "address": "Rua das Palmeiras, 123 - Vila Madalena, Sao Paulo - SP, 05422-000",
+        "description": "Nossa unidade em Sao Paulo combina tecnologia de ponta com um ambiente relaxante, proporcionando experiencias unicas de bem-estar no coracao da cidade.",
+        "image_url": "frontend/assets/images/sao-paulo-nova.jpg"
+    },
+    {
+        "name": "Espaco VIV - Rio de Janeiro",
+        "address": "Av. das Americas, 456 - Barra da Tijuca, Rio de Janeiro - RJ, 22640-100",
+        "description": "Localizada na Barra da Tijuca, nossa unidade do Rio oferece uma vista deslumbrante e tratamentos exclusivos em um ambiente tropical e aconchegante.",
+        "image_url": "frontend/assets/images/rio-nova.jpg"
+    }
+]
+
+DEFAULT_SERVICES = [
+    {"name": "Massagem Relaxante", "description": "Massagem suave para aliviar tensoes e promover relaxamento", "price": 80.0, "duration_minutes": 60},
+    {"name": "Massagem Terapeutica", "description": "Massagem focada em aliviar dores musculares e melhorar a circulacao", "price": 100.0, "duration_minutes": 75},
+    {"name": "Drenagem Linfatica", "description": "Tecnica especializada para reducao de inchacos e melhora da circulacao linfatica", "price": 90.0, "duration_minutes": 60},
+    {"name": "Reflexologia", "description": "Massagem nos pes que estimula pontos reflexos para promover bem-estar geral", "price": 70.0, "duration_minutes": 45},
+    {"name": "Acupuntura", "description": "Terapia milenar chinesa com agulhas para equilibrio energetico e alivio de dores", "price": 120.0, "duration_minutes": 60}
+]
+
+SYNTHETIC_UNIT_PREFIX = "Sintetica"
+SYNTHETIC_EMAIL_DOMAIN = "synthetic.espacoviv.test"
+BATCH_SIZE = 50_000
+
+CITIES = [
+    ("Sao Paulo", "SP"), ("Rio de Janeiro", "RJ"), ("Brasilia", "DF"), ("Belo Horizonte", "MG"),
+    ("Curitiba", "PR"), ("Porto Alegre", "RS"), ("Salvador", "BA"), ("Recife", "PE"),
+    ("Fortaleza", "CE"), ("Goiania", "GO"),
+]
+# Relative demand, in DEFAULT_SERVICES order
+SERVICE_WEIGHTS = (38, 24, 16, 12, 10)
+# Monday..Sunday
+WEEKDAY_WEIGHTS = (0.8, 0.9, 1.0, 1.0, 1.2, 1.6, 0.5)
+# Opening hours 8h-21h, with lunch-time and after-work peaks
+HOUR_WEIGHTS = {8: 2, 9: 4, 10: 7, 11: 7, 12: 4, 13: 3, 14: 4, 15: 5, 16: 6, 17: 8, 18: 9, 19: 8, 20: 5}
+HISTORY_DAYS = 365
+FUTURE_DAYS = 60
+
+def seed_defaults(engine=engine) -> int:
+    """Insert the default units and their services when there are no units yet.
+
+    Returns the number of rows inserted (0 when the database was already seeded).
+    """
+    units, services = Unit.__table__, Service.__table__
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(units)).scalar():
+            return 0
+        conn.execute(units.insert(), DEFAULT_UNITS)
+        unit_ids = conn.execute(
+            select(units.c.id).where(units.c.name.in_([u["name"] for u in DEFAULT_UNITS]))
+        ).scalars().all()
+        rows = [dict(service, unit_id=unit_id) for unit_id in unit_ids for service in DEFAULT_SERVICES]
+        conn.execute(services.insert(), rows)
+    print(f"[SEED] Dados iniciais criados: {len(DEFAULT_UNITS)} unidades, {len(rows)} servicos")
+    return len(DEFAULT_UNITS) + len(rows)
+
+def _format_value(value, postgres: bool):
+    # SQLAlchemy's SQLite dialect stores DateTime as this exact string format, and
+    # range filters compare strings, so raw inserts must match it
+    if isinstance(value, datetime) and not postgres:
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return value
+
+def _bulk_insert(engine, table, columns, rows):
+    """Write rows (tuples in columns order) with COPY on PostgreSQL, executemany elsewhere"""
+    if not rows:
+        return
+    postgres = engine.dialect.name == "postgresql"
+    with engine.begin() as conn:
+        if postgres:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor = conn.connection.cursor()
+            try:
+                cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            finally:
+                cursor.close()
+        else:
+            mark = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+            conn.exec_driver_sql(
+                f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join([mark] * len(columns))})",
+                [tuple(_format_value(v, postgres) for v in row) for row in rows],
+            )
+
+def _next_id(conn, table) -> int:
+    return (conn.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+def _weighted_sampler(rng: random.Random, values, weights):
+    """Vectorized weighted sampling: sample(k) draws k values in one call"""
+    cum_weights = list(accumulate(weights))
+    return lambda k: rng.choices(values, cum_weights=cum_weights, k=k)
+
+def reset_synthetic(engine=engine):
+    """Delete all synthetic rows (bookings first, then specialties, services, users and units)"""
+    units, users, services = Unit.__table__, User.__table__, Service.__table__
+    bookings, specialties, resets = Booking.__table__, UserSpecialty.__table__, PasswordReset.__table__
+    synthetic_units = select(units.c.id).where(units.c.name.like(f"{SYNTHETIC_UNIT_PREFIX}%"))
+    synthetic_users = select(users.c.id).where(users.c.email.like(f"%@{SYNTHETIC_EMAIL_DOMAIN}"))
+    synthetic_services = select(services.c.id).where(services.c.unit_id.in_(synthetic_units))
+    with engine.begin() as conn:
+        removed = conn.execute(delete(bookings).where(or_(
+            bookings.c.unit_id.in_(synthetic_units), bookings.c.user_id.in_(synthetic_users)
+        ))).rowcount
+        conn.execute(delete(specialties).where(or_(
+            specialties.c.user_id.in_(synthetic_users), specialties.c.service_id.in_(synthetic_services)
+        )))
+        conn.execute(delete(resets).where(resets.c.user_id.in_(synthetic_users)))
+        conn.execute(delete(services).where(services.c.unit_id.in_(synthetic_units)))
+        conn.execute(delete(users).where(users.c.id.in_(synthetic_users)))
+        conn.execute(delete(units).where(units.c.id.in_(synthetic_units)))
+    print(f"[SEED] Dados sinteticos removidos ({removed} agendamentos)")
+
+def generate_synthetic(engine=engine, units: int = 200, massagistas: int = 5000, clients: int = 200_000,
+                       bookings: int = 10_000_000, seed: int = 42, batch_size: int = BATCH_SIZE) -> bool:
+    """Load a synthetic dataset; returns False when one is already present"""
+    unit_table, user_table, service_table = Unit.__table__, User.__table__, Service.__table__
+    booking_table, specialty_table = Booking.__table__, UserSpecialty.__table__
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(unit_table)
+                        .where(unit_table.c.name.like(f"{SYNTHETIC_UNIT_PREFIX}%"))).scalar():
+            print("[SEED] Dados sinteticos ja existem, nada a fazer (use --reset para recriar)")
+            return False
+        first_unit, first_user, first_service, first_specialty, first_booking = (
+            _next_id(conn, table) for table in (unit_table, user_table, service_table, specialty_table, booking_table)
+        )
+
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    started = time.perf_counter()
+
+    # Units and their services
+    unit_ids = list(range(first_unit, first_unit + units))
+    unit_rows, service_rows = [], []
+    unit_services = {}
+    for i, unit_id in enumerate(unit_ids):
+        city, state = CITIES[i % len(CITIES)]
+        unit_rows.append((unit_id, f"{SYNTHETIC_UNIT_PREFIX} {city} {i + 1:03d}", f"Rua Sintetica, {i + 1} - {city} - {state}", True))
+        unit_services[unit_id] = []
+        for service in DEFAULT_SERVICES:
+            service_id = first_service + len(service_rows)
+            unit_services[unit_id].append(service_id)
+            price = round(service["price"] * rng.uniform(0.85, 1.25), 2)
+            service_rows.append((service_id, service["name"], price, service["duration_minutes"], unit_id, True))
+    _bulk_insert(engine, unit_table, ("id", "name", "address", "is_active"), unit_rows)
+    _bulk_insert(engine, service_table, ("id", "name", "price", "duration_minutes", "unit_id", "is_active"), service_rows)
+
+    # Busier units get more staff and more bookings (Zipf-like popularity)
+    unit_weights = [1 / (rank + 1) ** 0.8 for rank in range(units)]
+    rng.shuffle(unit_weights)
+    sample_unit = _weighted_sampler(rng, unit_ids, unit_weights)
+
+    # Massagistas (with 2-4 specialties from their unit) and clients; one shared hash keeps this fast
+    password = hash_password("Sintetico123!")
+    user_columns = ("id", "name", "email", "password", "user_type", "unit_preference", "is_active", "created_at")
+    massagista_units = sample_unit(massagistas)
+    user_rows, specialty_rows = [], []
+    for i, unit_id in enumerate(massagista_units):
+        user_id = first_user + i
+        user_rows.append((user_id, f"Massagista {i + 1}", f"massagista{i + 1}@{SYNTHETIC_EMAIL_DOMAIN}",
+                          password, "massagista", str(unit_id), True, now - timedelta(days=rng.randrange(HISTORY_DAYS * 2))))
+        for service_id in rng.sample(unit_services[unit_id], rng.randint(2, 4)):
+            specialty_rows.append((first_specialty + len(specialty_rows), user_id, service_id, None))
+    first_client = first_user + massagistas
+    for i in range(clients):
+        user_rows.append((first_client + i, f"Cliente {i + 1}", f"cliente{i + 1}@{SYNTHETIC_EMAIL_DOMAIN}",
+                          password, "client", None, True, now - timedelta(days=rng.randrange(HISTORY_DAYS * 2))))
+        if len(user_rows) >= batch_size:
+            _bulk_insert(engine, user_table, user_columns, user_rows)
+            user_rows = []
+    _bulk_insert(engine, user_table, user_columns, user_rows)
+    _bulk_insert(engine, specialty_table, ("id", "user_id", "service_id", "custom_price"), specialty_rows)
+
+    # Bookings: (day, slot) drawn together from weekday x hour weights, half-hour slots
+    first_day = (now - timedelta(days=HISTORY_DAYS)).replace(hour=0, minute=0)
+    days = [first_day + timedelta(days=d) for d in range(HISTORY_DAYS + FUTURE_DAYS)]
+    slots = [timedelta(hours=h, minutes=m) for h in HOUR_WEIGHTS for m in (0, 30)]
+    sample_start = _weighted_sampler(
+        rng,
+        [day + slot for day in days for slot in slots],
+        [WEEKDAY_WEIGHTS[day.weekday()] * HOUR_WEIGHTS[slot.seconds // 3600] for day in days for slot in slots],
+    )
+    sample_service = _weighted_sampler(rng, range(len(DEFAULT_SERVICES)), SERVICE_WEIGHTS)
+    # Most bookings are made a few days ahead, some weeks ahead
+    sample_lead = _weighted_sampler(rng, [timedelta(hours=h) for h in range(1, 24 * 30)],
+                                    [1 / h ** 0.7 for h in range(1, 24 * 30)])
+    client_ids = range(first_client, first_client + clients)
+    booking_columns = ("id", "user_id", "unit_id", "service_id", "booking_date", "status", "created_at")
+
+    written = 0
+    while written < bookings:
+        k = min(batch_size, bookings - written)
+        starts, booking_units, service_picks = sample_start(k), sample_unit(k), sample_service(k)
+        clients_k, leads, draws = rng.choices(client_ids, k=k), sample_lead(k), [rng.random() for _ in range(k)]
+        rows = []
+        for i in range(k):
+            start = starts[i]
+            if start < now:
+                status = "cancelled" if draws[i] < 0.12 else "completed"
+            else:
+                status = "cancelled" if draws[i] < 0.08 else "confirmed"
+            unit_id = booking_units[i]
+            rows.append((first_booking + written + i, clients_k[i], unit_id, unit_services[unit_id][service_picks[i]],
+                         start, status, min(start - leads[i], now)))
+        _bulk_insert(engine, booking_table, booking_columns, rows)
+        written += k
+        elapsed = time.perf_counter() - started
+        print(f"[SEED] Agendamentos: {written:,}/{bookings:,} ({written / elapsed:,.0f} linhas/s)")
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # Explicit ids bypassed the sequences
+            for table in (unit_table, user_table, service_table, specialty_table, booking_table):
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), (SELECT MAX(id) FROM {table.name}))"
+                )
+        # Fresh statistics so the planner sees the new volumes
+        conn.exec_driver_sql("ANALYZE")
+
+    print(f"[SEED] Dados sinteticos carregados em {time.perf_counter() - started:.1f} s: {units} unidades, "
+          f"{massagistas} massagistas, {clients} clientes, {bookings:,} agendamentos")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de dados do banco (render)")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("defaults", help="unidades e servicos padrao (padrao)")
+    synthetic = subcommands.add_parser("synthetic", help="massa de dados sintetica em escala de producao")
+    synthetic.add_argument("--units", type=int, default=200)
+    synthetic.add_argument("--massagistas", type=int, default=5000)
+    synthetic.add_argument("--clients", type=int, default=200_000)
+    synthetic.add_argument("--bookings", type=int, default=10_000_000)
+    synthetic.add_argument("--seed", type=int, default=42)
+    synthetic.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    synthetic.add_argument("--reset", action="store_true", help="remove dados sinteticos anteriores")
+    args = parser.parse_args()
+
+    if args.command == "synthetic":
+        if args.reset:
+            reset_synthetic()
+        generate_synthetic(units=args.units, massagistas=args.massagistas, clients=args.clients,
+                           bookings=args.bookings, seed=args.seed, batch_size=args.batch_size)
+    elif not seed_defaults():
+        print("[SEED] Unidades ja cadastradas, nada a fazer")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark do motor de atribuicao automatica de agendamentos
+Execute com: python backend/benchmark_assignment.py [bookings] [massagistas]
+"""
+import random
+import sys
+import time
+from datetime import date
+
+from utils.assignment import (
+    ANY_UNIT, SLOTS_PER_DAY, BookingRequest, Therapist, match_bookings, window_mask
+)
+
+UNITS = ["sp-perdizes", "sp-pinheiros", "rj-centro", "rj-barra", "bsb-asa-norte"]
+SERVICES = ["relaxante", "shiatsu", "drenagem", "pedras-quentes", "quick-massage", "ventosaterapia"]
+
+def build_dataset(num_bookings: int, num_therapists: int, days: int = 30, seed: int = 42):
+    rng = random.Random(seed)
+    first_day = date.today().toordinal()
+
+    therapists = []
+    for therapist_id in range(1, num_therapists + 1):
+        therapists.append(Therapist(
+            id=therapist_id,
+            unit_code=rng.choice(UNITS + [None]),
+            specialties=frozenset(rng.sample(SERVICES, rng.randint(1, 4)))
+        ))
+
+    # Roughly half of the massagistas publish explicit availability for each day
+    windows = {}
+    for therapist in therapists:
+        for offset in range(days):
+            if rng.random() < 0.5:
+                start = rng.choice(["08:00", "09:00", "10:00", "13:00"])
+                end = rng.choice(["14:00", "17:00", "19:00", "21:00"])
+                windows[(therapist.id, first_day + offset)] = {ANY_UNIT: window_mask(start, end)}
+
+    bookings = []
+    for booking_id in range(1, num_bookings + 1):
+        unit_index = rng.randrange(len(UNITS))
+        bookings.append(BookingRequest(
+            id=booking_id,
+            unit_id=unit_index + 1,
+            unit_code=UNITS[unit_index],
+            service=rng.choice(SERVICES),
+            day=first_day + rng.randrange(days),
+            start=rng.randrange(16, SLOTS_PER_DAY - 6),
+            length=rng.choice([2, 2, 2, 3, 4])
+        ))
+
+    return bookings, therapists, windows
+
+def main():
+    num_bookings = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_therapists = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    bookings, therapists, windows = build_dataset(num_bookings, num_therapists)
+
+    start = time.perf_counter()
+    assignments = match_bookings(bookings, therapists, windows, busy={})
+    elapsed = time.perf_counter() - start
+
+    print(f"Agendamentos:  {num_bookings}")
+    print(f"Massagistas:   {num_therapists}")
+    print(f"Atribuidos:    {len(assignments)} ({len(assignments) / num_bookings * 100:.1f}%)")
+    print(f"Tempo:         {elapsed * 1000:.1f} ms")
+    print(f"Throughput:    {num_bookings / elapsed:,.0f} agendamentos/s")
+
+if __name__ == "__main__":
+    main()
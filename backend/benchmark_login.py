@@ -0,0 +1,105 @@
+"""
+Benchmark de login sob carga concorrente, junto com trafego de calendario
+Execute com: python backend/benchmark_login.py [logins] [concorrencia]
+
+Usa um banco SQLite temporario e chama a aplicacao em processo (requer httpx).
+Cada login usa uma conta propria e o rate limiter fica desligado, para medir o
+login em si e nao respostas 429. Ajuste PASSWORD_HASH_CONCURRENCY para comparar
+limites do pool de hashing.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "benchmark_login.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+from collections import Counter
+
+import httpx
+
+from app.main import app
+from database.connection import SessionLocal, init_db
+from models.users import Unit, User
+from utils.auth import get_password_hash
+
+EMAIL = "benchmark{}@espacoviv.com"
+PASSWORD = "Benchmark1!"
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def report(name, latencies):
+    if not latencies:
+        print(f"{name:<12} sem requisicoes")
+        return
+    print(
+        f"{name:<12} n={len(latencies):<5} "
+        f"p50={percentile(latencies, 50) * 1000:7.1f} ms  "
+        f"p99={percentile(latencies, 99) * 1000:7.1f} ms  "
+        f"media={statistics.mean(latencies) * 1000:7.1f} ms"
+    )
+
+async def timed(client, method, url, latencies, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    latencies.append(time.perf_counter() - start)
+    return response
+
+async def run(num_logins: int, concurrency: int):
+    init_db()
+    db = SessionLocal()
+    if not db.query(Unit).filter(Unit.code == "sp-perdizes").first():
+        db.add(Unit(code="sp-perdizes", name="Espaco VIV - Perdizes", city="Sao Paulo", state="SP", address="Rua Teste, 1"))
+    # One account per login, all with the same hash (hashed once, outside the measurement)
+    password_hash = get_password_hash(PASSWORD)
+    existing = {email for (email,) in db.query(User.email).filter(User.email.like("benchmark%@espacoviv.com"))}
+    db.add_all([
+        User(name=f"Benchmark {i}", email=EMAIL.format(i), password_hash=password_hash, user_type="massagista")
+        for i in range(num_logins) if EMAIL.format(i) not in existing
+    ])
+    db.commit()
+    db.close()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        login_latencies = []
+        statuses = Counter()
+        calendar_latencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+        done = asyncio.Event()
+
+        async def login(i):
+            async with semaphore:
+                response = await timed(client, "POST", "/api/auth/login", login_latencies,
+                                       json={"email": EMAIL.format(i), "password": PASSWORD})
+                statuses[response.status_code] += 1
+
+        async def calendar_traffic():
+            while not done.is_set():
+                await timed(client, "GET", "/api/bookings/available-slots/sp-perdizes", calendar_latencies,
+                            params={"date": "2030-01-02"})
+
+        calendar_tasks = [asyncio.create_task(calendar_traffic()) for _ in range(4)]
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(num_logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*calendar_tasks)
+
+    print(f"Logins: {num_logins}  concorrencia: {concurrency}  "
+          f"pool de hashing: {os.getenv('PASSWORD_HASH_CONCURRENCY', '2')}  tempo total: {elapsed:.2f} s")
+    print(f"Status dos logins: {dict(statuses)}")
+    report("login", login_latencies)
+    report("calendario", calendar_latencies)
+
+if __name__ == "__main__":
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(run(logins, concurrency))
@@ -0,0 +1,152 @@
+"""
+Benchmark do perfil SQLite (WAL + escritas serializadas) contra a configuracao padrao
+Execute com: python backend/benchmark_sqlite.py [segundos] [escritores] [leitores]
+
+Cada escritor repete o padrao de criacao de agendamento (SELECT de conflito e
+INSERT na mesma transacao) e cada leitor consulta o calendario de um dia, em
+threads, sobre um arquivo SQLite temporario com alguns milhares de agendamentos.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, and_, create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from database.engine import create_database_engine
+
+metadata = MetaData()
+
+bookings = Table(
+    "bookings", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("massagista_id", Integer, nullable=False),
+    Column("client_name", String(100), nullable=False),
+    Column("appointment_date", DateTime, nullable=False, index=True),
+    Column("status", String(20), nullable=False),
+)
+
+MASSAGISTAS = 20
+FIRST_DAY = datetime(2030, 1, 1, 8)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def report(name, latencies, errors, elapsed):
+    if not latencies:
+        print(f"  {name:<10} sem operacoes concluidas, {errors} erros 'database is locked'")
+        return
+    print(
+        f"  {name:<10} {len(latencies) / elapsed:8.1f} ops/s  "
+        f"p50={percentile(latencies, 50) * 1000:7.2f} ms  "
+        f"p99={percentile(latencies, 99) * 1000:7.2f} ms  "
+        f"media={statistics.mean(latencies) * 1000:7.2f} ms  "
+        f"erros={errors}"
+    )
+
+def random_slot(rng):
+    return FIRST_DAY + timedelta(days=rng.randrange(60), hours=rng.randrange(12))
+
+def seed(url: str, rows: int = 5000):
+    engine = create_engine(url)
+    metadata.create_all(engine)
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(bookings), [
+            {"massagista_id": rng.randrange(MASSAGISTAS), "client_name": f"Cliente {i}",
+             "appointment_date": random_slot(rng), "status": "confirmed"}
+            for i in range(rows)
+        ])
+    engine.dispose()
+
+def run(label, writer_engine, reader_engine, seconds, num_writers, num_readers):
+    stop = threading.Event()
+    results = {"escrita": ([], [0]), "leitura": ([], [0])}
+    lock = threading.Lock()
+
+    def writer(worker_id):
+        rng = random.Random(worker_id)
+        latencies, errors = results["escrita"]
+        while not stop.is_set():
+            massagista_id, slot = rng.randrange(MASSAGISTAS), random_slot(rng)
+            started = time.perf_counter()
+            try:
+                with writer_engine.begin() as conn:
+                    taken = conn.execute(select(func.count()).select_from(bookings).where(and_(
+                        bookings.c.massagista_id == massagista_id,
+                        bookings.c.appointment_date == slot,
+                    ))).scalar()
+                    if not taken:
+                        conn.execute(insert(bookings).values(
+                            massagista_id=massagista_id, client_name="Benchmark",
+                            appointment_date=slot, status="pending",
+                        ))
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    def reader(worker_id):
+        rng = random.Random(1000 + worker_id)
+        latencies, errors = results["leitura"]
+        while not stop.is_set():
+            day = FIRST_DAY + timedelta(days=rng.randrange(60))
+            started = time.perf_counter()
+            try:
+                with reader_engine.connect() as conn:
+                    conn.execute(select(bookings).where(and_(
+                        bookings.c.appointment_date >= day,
+                        bookings.c.appointment_date < day + timedelta(days=1),
+                    ))).all()
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(num_writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(num_readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{label}:")
+    for name, (latencies, errors) in results.items():
+        report(name, latencies, errors[0], elapsed)
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    num_writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    num_readers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    directory = tempfile.mkdtemp()
+    print(f"Duracao: {seconds:.0f} s  escritores: {num_writers}  leitores: {num_readers}")
+
+    default_url = f"sqlite:///{os.path.join(directory, 'padrao.db')}"
+    seed(default_url)
+    # What the app did before: SQLAlchemy defaults, rollback journal, driver busy timeout (5 s)
+    default_engine = create_engine(default_url, connect_args={"check_same_thread": False})
+    run("Configuracao padrao (journal rollback)", default_engine, default_engine, seconds, num_writers, num_readers)
+    default_engine.dispose()
+
+    tuned_url = f"sqlite:///{os.path.join(directory, 'ajustado.db')}"
+    seed(tuned_url)
+    writer_engine = create_database_engine(tuned_url)
+    reader_engine = create_database_engine(tuned_url, role="reader")
+    run("Perfil SQLite (WAL, escritas serializadas)", writer_engine, reader_engine, seconds, num_writers, num_readers)
+    writer_engine.dispose()
+    reader_engine.dispose()
@@ -0,0 +1,144 @@
+"""
+Request deadlines enforced as database statement timeouts.
+
+DeadlineMiddleware gives each request a deadline from the first matching
+DeadlineRule. Engines built by create_database_engine turn the time left into
+a statement timeout: SET LOCAL statement_timeout at the start of each
+PostgreSQL transaction, and a progress handler that interrupts the running
+statement on SQLite. Statements started after the deadline fail immediately.
+A request that fails after its deadline is answered with 503, so one heavy
+report gives its connection back instead of holding it for minutes.
+"""
+import json
+import os
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import event
+
+DEADLINES_ENABLED = os.getenv("DEADLINES_ENABLED", "true").lower() == "true"
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "15"))
+REPORT_DEADLINE_SECONDS = float(os.getenv("REPORT_DEADLINE_SECONDS", "5"))
+# SQLite VM instructions between two deadline checks
+SQLITE_PROGRESS_STEPS = 10000
+
+# Absolute time.monotonic() deadline of the current request
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    pass
+
+@dataclass
+class DeadlineRule:
+    name: str
+    pattern: str  # regex matched against the request path
+    seconds: float
+
+    def __post_init__(self):
+        self.regex = re.compile(self.pattern)
+
+def default_rules() -> List[DeadlineRule]:
+    """Tight budget for reports/statistics, a generous one for everything else"""
+    return [
+        DeadlineRule("reports", r"^/api/(calendar/)?stats/", REPORT_DEADLINE_SECONDS),
+        DeadlineRule("default", r"^/", REQUEST_DEADLINE_SECONDS),
+    ]
+
+def time_left() -> Optional[float]:
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def _begin(conn):
+    remaining = time_left()
+    if remaining is not None:
+        # SET LOCAL lasts until the end of this transaction only
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    deadline = current_deadline.get()
+    if conn.dialect.name == "sqlite":
+        _set_progress_handler(conn.connection.dbapi_connection, conn.connection.info, deadline)
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceeded("request deadline exceeded before the statement started")
+
+def _set_progress_handler(dbapi_connection, info: dict, deadline: Optional[float]):
+    # Kept until the next statement or checkin: SQLite does most of a SELECT's
+    # work while the rows are fetched, after the cursor execute has returned
+    if deadline is not None:
+        dbapi_connection.set_progress_handler(lambda: time.monotonic() >= deadline, SQLITE_PROGRESS_STEPS)
+        info["progress_handler"] = True
+    elif info.pop("progress_handler", False):
+        dbapi_connection.set_progress_handler(None, 0)
+
+def _checkin(dbapi_connection, connection_record):
+    if connection_record.info.get("progress_handler"):
+        _set_progress_handler(dbapi_connection, connection_record.info, None)
+
+def apply_deadlines(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    if engine.dialect.name == "postgresql":
+        event.listen(engine, "begin", _begin)
+    elif engine.dialect.name == "sqlite":
+        event.listen(engine, "checkin", _checkin)
+
+class DeadlineMiddleware:
+    """Sets the request deadline and turns failures after it into 503 responses"""
+
+    def __init__(self, app, rules: Optional[List[DeadlineRule]] = None):
+        self.app = app
+        self.rules = rules if rules is not None else default_rules()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not DEADLINES_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        rule = next((r for r in self.rules if r.regex.match(scope["path"])), None)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = time.monotonic() + rule.seconds
+        token = current_deadline.set(deadline)
+        started = False
+        replaced = False
+
+        async def send_wrapper(message):
+            nonlocal started, replaced
+            if message["type"] == "http.response.start":
+                started = True
+                # Handlers that wrap every error in a 500 still surface as a timeout
+                if message["status"] >= 500 and time.monotonic() >= deadline:
+                    replaced = True
+                    await self._reject(send, scope, rule)
+                    return
+            elif replaced:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if started or time.monotonic() < deadline:
+                raise
+            await self._reject(send, scope, rule)
+        finally:
+            current_deadline.reset(token)
+
+    @staticmethod
+    async def _reject(send, scope, rule: DeadlineRule):
+        print(f"[DEADLINE] {scope['method']} {scope['path']} excedeu o prazo de {rule.seconds:g}s ({rule.name})")
+        body = json.dumps({"detail": "A requisicao excedeu o tempo limite. Tente um periodo menor."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", b"5"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,221 @@
+"""
+Engine factory shared by both backend stacks.
+
+Pool settings come from the environment, connections can be pre-warmed at
+startup, and the pool records how often and how long requests waited for a
+connection, so exhaustion shows up in /api/admin/metrics before it shows up as timeouts.
+
+SQLite files get their own profile: WAL and tuned pragmas on every connection,
+a "writer" engine and a "reader" engine whose pooled, read-only connections run
+concurrently with the writer thanks to WAL. Writer connections run reads in
+autocommit and only open a transaction, with BEGIN IMMEDIATE, at the first
+write statement; it lasts until commit/rollback. A request session can hold its
+connection across awaits without holding the database write lock, and only the
+writes themselves are serialized (other writers wait up to busy_timeout).
+"""
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from database.deadlines import apply_deadlines
+from database.instrumentation import instrument_engine
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+DB_POOL_PREWARM = int(os.getenv("DB_POOL_PREWARM", "2"))
+
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB, i.e. 64 MB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "foreign_keys": "ON",
+}
+SQLITE_READER_POOL_SIZE = int(os.getenv("SQLITE_READER_POOL_SIZE", "5"))
+# Statements that run without opening a write transaction on a writer connection
+_SQLITE_READ_STATEMENT = re.compile(r"^\s*(SELECT|PRAGMA|EXPLAIN|VALUES)\b", re.I)
+
+# Upper bounds (seconds) of the checkout wait histogram
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 1.0)
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            bucket = next((i for i, bound in enumerate(WAIT_BUCKETS) if waited < bound), len(WAIT_BUCKETS))
+            self.wait_histogram[bucket] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            labels = [f"<{int(b * 1000)}ms" for b in WAIT_BUCKETS] + [f">={int(WAIT_BUCKETS[-1] * 1000)}ms"]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / attempts * 1000, 3) if attempts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "wait_histogram": dict(zip(labels, self.wait_histogram)),
+            }
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that measures how long each checkout waited for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+def normalize_database_url(url: str) -> str:
+    # Fix for Railway/Heroku/Render DATABASE_URL format
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql://", 1)
+    return url
+
+def is_sqlite_file(url: str) -> bool:
+    url = make_url(normalize_database_url(url))
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+def _set_sqlite_pragmas(dbapi_connection, read_only: bool):
+    # Transactions are opened by the engine events (see _create_sqlite_engine), never by the driver
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+def _create_sqlite_engine(url: str, role: str, overrides: dict) -> Engine:
+    writer = role == "writer"
+    kwargs = {
+        "query_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE if writer else SQLITE_READER_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW if writer else 0,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "connect_args": {"check_same_thread": False},
+    }
+    kwargs.update(overrides)
+    engine = create_engine(url, **kwargs)
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        _set_sqlite_pragmas(dbapi_connection, read_only=not writer)
+
+    if writer:
+        @event.listens_for(engine, "before_cursor_execute")
+        def on_write(conn, cursor, statement, parameters, context, executemany):
+            # Take the write lock at the first write, not at BEGIN: a deferred transaction
+            # that had read and then writes fails at once with "database is locked" if
+            # another connection wrote in between, instead of waiting for busy_timeout
+            dbapi_connection = conn.connection.dbapi_connection
+            if not dbapi_connection.in_transaction and not _SQLITE_READ_STATEMENT.match(statement):
+                dbapi_connection.execute("BEGIN IMMEDIATE")
+    else:
+        @event.listens_for(engine, "begin")
+        def on_begin(connection):
+            # One snapshot for all the reads of a transaction
+            connection.exec_driver_sql("BEGIN")
+
+    instrument_engine(engine)
+    apply_deadlines(engine)
+    return engine
+
+def create_database_engine(url: str, role: str = "writer", **overrides) -> Engine:
+    """Create an engine with the pool configured from DB_* settings.
+
+    role only matters for SQLite files: "writer" (write transactions serialized) or "reader".
+    """
+    url = normalize_database_url(url)
+    if is_sqlite_file(url):
+        return _create_sqlite_engine(url, role, overrides)
+
+    kwargs = {"query_cache_size": DB_STATEMENT_CACHE_SIZE}
+    if make_url(url).get_backend_name() != "sqlite":
+        kwargs.update({
+            "poolclass": InstrumentedQueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        })
+
+    kwargs.update(overrides)
+    engine = create_engine(url, **kwargs)
+    instrument_engine(engine)
+    apply_deadlines(engine)
+    return engine
+
+def prewarm_pool(engine: Engine, connections: Optional[int] = None):
+    """Open pool connections up front so the first requests do not pay for connecting"""
+    if not isinstance(engine.pool, QueuePool):
+        return
+    count = min(DB_POOL_PREWARM if connections is None else connections, engine.pool.size())
+    opened = []
+    try:
+        for _ in range(count):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            opened.append(connection)
+    except Exception as e:
+        print(f"[DATABASE] Erro ao pre-aquecer pool de conexoes: {e}")
+    finally:
+        for connection in opened:
+            connection.close()
+
+def pool_status(engine: Engine) -> dict:
+    """Current pool occupancy plus checkout wait metrics"""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": pool._max_overflow,
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update(metrics.snapshot())
+    return status
@@ -0,0 +1,165 @@
+"""
+Per-request SQL instrumentation.
+
+Every engine built by create_database_engine counts statements and cursor time
+into the RequestQueryStats of the current request (a context variable set by
+SQLInstrumentationMiddleware). The middleware reports them in a Server-Timing
+header and aggregates per-route histograms, shown in /api/admin/metrics. Statements run
+outside a request (background workers) are not counted.
+
+Tests can pin a query budget per endpoint:
+
+    response = client.get("/api/units/")
+    assert_query_budget(response, 2)
+"""
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+
+# Upper bounds of the per-route histograms
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50)
+DB_TIME_BUCKETS_MS = (1, 5, 10, 50, 100, 500)
+
+class RequestQueryStats:
+    def __init__(self, scope: Optional[dict] = None):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.scope = scope
+
+    @property
+    def db_ms(self) -> float:
+        return self.db_seconds * 1000
+
+current_request_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_request_stats", default=None)
+
+# Called after every statement with (conn, statement, parameters, context, executemany, seconds)
+statement_observers: List[Callable] = []
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    for observer in statement_observers:
+        observer(conn, statement, parameters, context, executemany, elapsed)
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get("query_started") if exception_context.connection is not None else None
+    if started:
+        started.pop()
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def _bucket(value: float, bounds) -> int:
+    return next((i for i, bound in enumerate(bounds) if value <= bound), len(bounds))
+
+class RouteQueryMetrics:
+    """Query count and DB time histograms per "METHOD /route/{template}" """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, dict] = {}
+
+    def record(self, route: str, stats: RequestQueryStats):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {
+                    "requests": 0,
+                    "queries": 0,
+                    "max_queries": 0,
+                    "db_ms": 0.0,
+                    "query_histogram": [0] * (len(QUERY_COUNT_BUCKETS) + 1),
+                    "db_ms_histogram": [0] * (len(DB_TIME_BUCKETS_MS) + 1),
+                }
+            entry["requests"] += 1
+            entry["queries"] += stats.queries
+            entry["max_queries"] = max(entry["max_queries"], stats.queries)
+            entry["db_ms"] += stats.db_ms
+            entry["query_histogram"][_bucket(stats.queries, QUERY_COUNT_BUCKETS)] += 1
+            entry["db_ms_histogram"][_bucket(stats.db_ms, DB_TIME_BUCKETS_MS)] += 1
+
+    def snapshot(self) -> dict:
+        query_labels = [f"<={b}" for b in QUERY_COUNT_BUCKETS] + [f">{QUERY_COUNT_BUCKETS[-1]}"]
+        time_labels = [f"<={b}ms" for b in DB_TIME_BUCKETS_MS] + [f">{DB_TIME_BUCKETS_MS[-1]}ms"]
+        with self._lock:
+            return {
+                route: {
+                    "requests": entry["requests"],
+                    "avg_queries": round(entry["queries"] / entry["requests"], 2),
+                    "max_queries": entry["max_queries"],
+                    "avg_db_ms": round(entry["db_ms"] / entry["requests"], 3),
+                    "query_histogram": dict(zip(query_labels, entry["query_histogram"])),
+                    "db_ms_histogram": dict(zip(time_labels, entry["db_ms_histogram"])),
+                }
+                for route, entry in sorted(self._routes.items())
+            }
+
+route_query_metrics = RouteQueryMetrics()
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else 'unmatched'}"
+
+class SQLInstrumentationMiddleware:
+    """Counts the SQL of each request and reports it as Server-Timing: db;dur=<ms>;desc="<n> queries" """
+
+    def __init__(self, app, metrics: RouteQueryMetrics = route_query_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(scope)
+        token = current_request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                timing = f'db;dur={stats.db_ms:.2f};desc="{stats.queries} queries"'
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            self.metrics.record(route_label(scope), stats)
+
+@contextmanager
+def count_queries():
+    """Count the statements run inside the block (same thread/task), outside of a request"""
+    stats = RequestQueryStats()
+    token = current_request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_request_stats.reset(token)
+
+_SERVER_TIMING_QUERIES = re.compile(r'(?:^|,)\s*db;[^,]*desc="(\d+) queries"')
+
+def assert_query_budget(response, max_queries: int) -> int:
+    """Test helper: fail when the request behind response ran more than max_queries statements"""
+    match = _SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+    assert match, "response has no db Server-Timing entry (is SQLInstrumentationMiddleware installed?)"
+    queries = int(match.group(1))
+    assert queries <= max_queries, (
+        f"{response.request.method} {response.request.url.path} ran {queries} queries, budget is {max_queries}"
+    )
+    return queries
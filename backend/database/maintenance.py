@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_
+
+from database.connection import engine
+from models.bookings import Booking, BookingStatus
+from models.booking_view import refresh_booking_view
+from models.users import RevokedToken
+from utils.jobs import BOOKING_SETTLE_HOURS, Job, JobContext, JobRunner, local_now
+from utils.mailer import purge_email_outbox
+
+# Maintenance sweeps for the routes stack, executed by the leader process only
+
+def settle_past_bookings(ctx: JobContext) -> int:
+    """Past PENDING bookings become NO_SHOW, past CONFIRMED ones COMPLETED"""
+    bookings = Booking.__table__
+    cutoff = local_now() - timedelta(hours=BOOKING_SETTLE_HOURS)
+    no_shows = ctx.batched(
+        bookings,
+        and_(bookings.c.appointment_date < cutoff, bookings.c.status == BookingStatus.PENDING),
+        {"status": BookingStatus.NO_SHOW},
+        on_batch=refresh_booking_view
+    )
+    completed = ctx.batched(
+        bookings,
+        and_(bookings.c.appointment_date < cutoff, bookings.c.status == BookingStatus.CONFIRMED),
+        {"status": BookingStatus.COMPLETED},
+        on_batch=refresh_booking_view
+    )
+    return no_shows + completed
+
+def purge_revoked_tokens(ctx: JobContext) -> int:
+    """Revoked tokens past their exp can no longer be used anyway"""
+    revoked = RevokedToken.__table__
+    return ctx.batched(revoked, revoked.c.expires_at < datetime.utcnow())
+
+job_runner = JobRunner(engine, [
+    Job("settle_past_bookings", 15 * 60, settle_past_bookings),
+    Job("purge_revoked_tokens", 60 * 60, purge_revoked_tokens),
+    Job("purge_email_outbox", 6 * 60 * 60, purge_email_outbox),
+])
@@ -0,0 +1,202 @@
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+# Schema changes for tables that already exist. create_all() only creates missing
+# tables, so new columns/indexes on existing tables are added here. Every step must
+# be idempotent because it runs on each init_db().
+
+def _has_column(engine, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(engine).get_columns(table)}
+
+def _has_index(engine, table: str, index: str) -> bool:
+    return index in {i["name"] for i in inspect(engine).get_indexes(table)}
+
+def add_users_token_version(engine):
+    """users.token_version - bumped to revoke every token issued to a user"""
+    if _has_column(engine, "users", "token_version"):
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"))
+
+def add_users_updated_at_index(engine):
+    """Index on users.updated_at - the token version map reloads only recently updated users"""
+    if not _has_index(engine, "users", "ix_users_updated_at"):
+        with engine.begin() as conn:
+            conn.execute(text("CREATE INDEX ix_users_updated_at ON users (updated_at)"))
+
+def add_profile_details(engine):
+    """massagista_profiles.birth_date, gender and experience_years - collected at registration"""
+    for column, sql_type in (("birth_date", "DATE"), ("gender", "VARCHAR(20)"), ("experience_years", "INTEGER")):
+        if not _has_column(engine, "massagista_profiles", column):
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE massagista_profiles ADD COLUMN {column} {sql_type}"))
+
+def create_email_outbox(engine):
+    """email_outbox - queued emails, see utils.mailer"""
+    from utils.mailer import outbox_metadata
+    outbox_metadata.create_all(bind=engine)
+
+def add_bookings_reminders(engine):
+    """bookings.reminders_sent flags and the appointment_date index used by the reminder scheduler"""
+    if not _has_column(engine, "bookings", "reminders_sent"):
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE bookings ADD COLUMN reminders_sent INTEGER NOT NULL DEFAULT 0"))
+    if not _has_index(engine, "bookings", "ix_bookings_appointment_date"):
+        with engine.begin() as conn:
+            conn.execute(text("CREATE INDEX ix_bookings_appointment_date ON bookings (appointment_date)"))
+
+def create_job_locks(engine):
+    """job_locks - leader lease for the maintenance job runner, see utils.jobs"""
+    from utils.jobs import jobs_metadata
+    jobs_metadata.create_all(bind=engine)
+
+def create_replica_heartbeat(engine):
+    """replica_heartbeat - written on the primary to measure replica lag, see database.replica"""
+    from database.replica import replica_metadata
+    replica_metadata.create_all(bind=engine)
+
+JSON_COLUMNS = [
+    ("massagista_profiles", "specialties"),
+    ("massagista_profiles", "working_hours"),
+    ("units", "working_hours"),
+]
+
+def convert_json_columns(engine):
+    """JSON held in Text columns becomes JSONB on PostgreSQL, with a GIN index on
+    massagista_profiles.specialties for "has specialty X" lookups. SQLite keeps the
+    text storage (read by the JSON1 functions). Values that are not valid JSON are
+    cleared, so the JSON column type can load every row."""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import JSONB
+        for table, column in JSON_COLUMNS:
+            columns = {c["name"]: c["type"] for c in inspect(engine).get_columns(table)}
+            if isinstance(columns[column], JSONB):
+                continue
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "CREATE OR REPLACE FUNCTION pg_temp.try_jsonb(value text) RETURNS jsonb AS $$ "
+                    "BEGIN RETURN NULLIF(btrim(value), '')::jsonb; EXCEPTION WHEN others THEN RETURN NULL; END "
+                    "$$ LANGUAGE plpgsql IMMUTABLE"
+                ))
+                conn.execute(text(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB USING pg_temp.try_jsonb({column})"
+                ))
+        if not _has_index(engine, "massagista_profiles", "ix_massagista_profiles_specialties"):
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "CREATE INDEX ix_massagista_profiles_specialties ON massagista_profiles "
+                    "USING GIN (specialties jsonb_path_ops)"
+                ))
+    elif engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            for table, column in JSON_COLUMNS:
+                conn.execute(text(
+                    f"UPDATE {table} SET {column} = NULL WHERE {column} IS NOT NULL AND json_valid({column}) = 0"
+                ))
+
+BACKFILL_BATCH_SIZE = 1000
+
+# Start (day of appointment_date at appointment_time) and end (+ duration) of each booking,
+# matching models.bookings.booking_period
+BOOKING_PERIOD_SQL = {
+    "postgresql": (
+        "CASE WHEN appointment_time ~ '^([01]?[0-9]|2[0-3]):[0-5][0-9]$' "
+        "THEN appointment_date::date + appointment_time::time ELSE appointment_date END",
+        "{start} + make_interval(mins => COALESCE(duration_minutes, 60))",
+    ),
+    # Text in SQLAlchemy's storage format, so comparisons with bound datetimes stay correct
+    "sqlite": (
+        "COALESCE(datetime(date(appointment_date) || ' ' || substr('0' || appointment_time, -5)), "
+        "datetime(appointment_date)) || '.000000'",
+        "datetime({start}, '+' || COALESCE(duration_minutes, 60) || ' minutes') || '.000000'",
+    ),
+}
+
+def add_bookings_period(engine):
+    """bookings.starts_at/ends_at, backfilled in batches, with range indexes. On
+    PostgreSQL, bookings_no_overlap rejects overlapping active bookings of a unit."""
+    for column in ("starts_at", "ends_at"):
+        if not _has_column(engine, "bookings", column):
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE bookings ADD COLUMN {column} TIMESTAMP"))
+    for index, columns in (("ix_bookings_unit_starts_at", "unit_id, starts_at"),
+                           ("ix_bookings_massagista_starts_at", "massagista_id, starts_at")):
+        if not _has_index(engine, "bookings", index):
+            with engine.begin() as conn:
+                conn.execute(text(f"CREATE INDEX {index} ON bookings ({columns})"))
+
+    start_sql, end_sql = BOOKING_PERIOD_SQL.get(engine.dialect.name, BOOKING_PERIOD_SQL["postgresql"])
+    end_sql = end_sql.format(start=f"({start_sql})")
+    with engine.connect() as conn:
+        low, high = conn.execute(text("SELECT MIN(id), MAX(id) FROM bookings WHERE starts_at IS NULL")).first()
+    total = 0
+    while low is not None and low <= high:
+        # One id range per short transaction, so the backfill never holds locks on bookings for long
+        with engine.begin() as conn:
+            total += conn.execute(text(
+                f"UPDATE bookings SET starts_at = {start_sql}, ends_at = {end_sql} "
+                "WHERE id >= :low AND id < :high AND starts_at IS NULL"
+            ), {"low": low, "high": low + BACKFILL_BATCH_SIZE}).rowcount
+        low += BACKFILL_BATCH_SIZE
+        time.sleep(0.01)
+    if total:
+        print(f"[DATABASE] starts_at/ends_at preenchidos em {total} agendamentos")
+
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.connect() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'bookings_no_overlap'"
+        )).first() is not None
+    if exists:
+        return
+    try:
+        with engine.begin() as conn:
+            # btree_gist provides the = operator on unit_id inside a GiST index
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            conn.execute(text(
+                "ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap EXCLUDE USING gist "
+                "(unit_id WITH =, tsrange(starts_at, ends_at) WITH &&) "
+                "WHERE (status IN ('PENDING', 'CONFIRMED') AND starts_at IS NOT NULL)"
+            ))
+    except DBAPIError as e:
+        # Overlapping rows already stored, or no permission to create the extension
+        print(f"[DATABASE] AVISO: restricao bookings_no_overlap nao criada: {str(e.orig).strip()[:300]}")
+
+def backfill_booking_view(engine):
+    """booking_view - denormalized bookings read by the list endpoints, see models.booking_view.
+    create_all creates the table; bookings written before it existed are copied in batches."""
+    from models.booking_view import fill_booking_view
+    with engine.connect() as conn:
+        missing = conn.execute(text("SELECT COUNT(*) FROM bookings")).scalar() - \
+            conn.execute(text("SELECT COUNT(*) FROM booking_view")).scalar()
+        if missing <= 0:
+            return
+        low, high = conn.execute(text("SELECT MIN(id), MAX(id) FROM bookings")).first()
+    total = 0
+    while low <= high:
+        with engine.begin() as conn:
+            total += fill_booking_view(conn, low, low + BACKFILL_BATCH_SIZE)
+        low += BACKFILL_BATCH_SIZE
+        time.sleep(0.01)
+    print(f"[DATABASE] booking_view preenchida com {total} agendamentos")
+
+MIGRATIONS = [
+    add_users_token_version,
+    create_email_outbox,
+    add_bookings_reminders,
+    create_job_locks,
+    create_replica_heartbeat,
+    convert_json_columns,
+    add_bookings_period,
+    backfill_booking_view,
+    add_users_updated_at_index,
+    add_profile_details,
+]
+
+def apply_migrations(engine):
+    """Apply pending schema changes in order"""
+    for migration in MIGRATIONS:
+        migration(engine)
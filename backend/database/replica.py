@@ -0,0 +1,173 @@
+"""
+Read-replica routing.
+
+Read-only endpoints depend on get_read_db, which hands out a session on the
+replica (DATABASE_REPLICA_URL) unless:
+  - the replica lags more than REPLICA_MAX_LAG_SECONDS behind the primary, or
+    cannot be reached; or
+  - the client wrote something in the last REPLICA_STICKY_SECONDS, so it must
+    see its own writes (read-your-writes).
+Lag is measured with a heartbeat row written on the primary and read back from
+the replica every REPLICA_PROBE_SECONDS.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+from database.engine import create_database_engine
+from utils.cache import TTLCache, token_cache_key
+
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "15"))
+REPLICA_PROBE_SECONDS = float(os.getenv("REPLICA_PROBE_SECONDS", "2"))
+STICKY_COOKIE = "db_rw_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+replica_metadata = MetaData()
+
+replica_heartbeat = Table(
+    "replica_heartbeat", replica_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("beat_at", DateTime, nullable=False),
+)
+
+def client_key(authorization: Optional[str], client) -> str:
+    """Identify a client by its bearer token, or by IP for anonymous requests"""
+    if authorization:
+        return token_cache_key(authorization).hex()
+    return client[0] if client else "unknown"
+
+class ReplicaRouter:
+    def __init__(self, primary_engine, replica_url: Optional[str]):
+        self.primary_engine = primary_engine
+        self.replica_engine = create_database_engine(replica_url, role="reader") if replica_url else None
+        self.ReplicaSession = (
+            sessionmaker(autocommit=False, autoflush=False, bind=self.replica_engine)
+            if self.replica_engine is not None else None
+        )
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        # Clients that wrote recently, for clients that do not keep the cookie
+        self._recent_writers = TTLCache(maxsize=10000, ttl=REPLICA_STICKY_SECONDS)
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.replica_engine is not None
+
+    @property
+    def replica_usable(self) -> bool:
+        return self.enabled and self.lag_seconds is not None and self.lag_seconds <= REPLICA_MAX_LAG_SECONDS
+
+    def start(self):
+        if self.enabled and (self._thread is None or not self._thread.is_alive()):
+            self.probe()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="replica-lag-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(5)
+
+    def probe(self):
+        """Read the replica's heartbeat, then write a new one on the primary"""
+        was_usable = self.replica_usable
+        now = datetime.utcnow()
+        try:
+            with self.replica_engine.connect() as conn:
+                beat_at = conn.execute(select(replica_heartbeat.c.beat_at).where(replica_heartbeat.c.id == 1)).scalar()
+            # Measured against the last beat, so it overestimates by up to REPLICA_PROBE_SECONDS
+            self.lag_seconds = (now - beat_at).total_seconds() if beat_at else None
+            self.last_error = None
+        except Exception as e:
+            self.lag_seconds = None
+            self.last_error = str(e)[:200]
+
+        try:
+            with self.primary_engine.begin() as conn:
+                updated = conn.execute(
+                    update(replica_heartbeat).where(replica_heartbeat.c.id == 1).values(beat_at=now)
+                ).rowcount
+                if not updated:
+                    conn.execute(insert(replica_heartbeat).values(id=1, beat_at=now))
+        except Exception as e:
+            print(f"[DATABASE] Erro ao gravar heartbeat da replica: {e}")
+
+        if was_usable != self.replica_usable:
+            if self.replica_usable:
+                print(f"[DATABASE] Replica de leitura ativa (atraso {self.lag_seconds:.1f}s)")
+            else:
+                print(f"[DATABASE] Replica de leitura indisponivel ou atrasada, leituras no primario "
+                      f"(atraso: {self.lag_seconds}, erro: {self.last_error})")
+
+    def _run(self):
+        while not self._stopping.wait(REPLICA_PROBE_SECONDS):
+            self.probe()
+
+    def mark_write(self, key: str):
+        self._recent_writers.set(key, True)
+
+    def is_sticky(self, request) -> bool:
+        try:
+            if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+                return True
+        except ValueError:
+            pass
+        return self._recent_writers.get(client_key(request.headers.get("authorization"), request.client)) is not None
+
+    def read_sessionmaker(self, request):
+        """Session factory for a read-only request, or None to use the primary"""
+        if self.replica_usable and not self.is_sticky(request):
+            self.replica_reads += 1
+            return self.ReplicaSession
+        self.primary_reads += 1
+        return None
+
+    def status(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "usable": self.replica_usable,
+            "lag_seconds": round(self.lag_seconds, 3) if self.lag_seconds is not None else None,
+            "max_lag_seconds": REPLICA_MAX_LAG_SECONDS,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "last_error": self.last_error,
+        }
+
+class ReadYourWritesMiddleware:
+    """Marks clients that wrote successfully so their reads stay on the primary for a while"""
+
+    def __init__(self, app, router: ReplicaRouter):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not self.router.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                authorization = dict(scope["headers"]).get(b"authorization")
+                self.router.mark_write(client_key(
+                    authorization.decode("latin-1") if authorization else None, scope.get("client")
+                ))
+                until = int(time.time()) + REPLICA_STICKY_SECONDS
+                cookie = f"{STICKY_COOKIE}={until}; Max-Age={REPLICA_STICKY_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,176 @@
+"""
+Slow query log.
+
+Statements slower than SLOW_QUERY_MS are kept in a bounded ring buffer with
+normalized SQL, redacted parameters, duration and the route that issued them
+("background" outside requests). Their plan is captured off the request path
+by a worker thread: EXPLAIN (EXPLAIN QUERY PLAN on SQLite), or with
+SLOW_QUERY_EXPLAIN=analyze, EXPLAIN ANALYZE for SELECTs on PostgreSQL (this
+runs the query again). The buffer is served by the admin slow-queries endpoint.
+"""
+import os
+import queue
+import re
+import threading
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from database.instrumentation import current_request_stats, route_label, statement_observers
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))  # <= 0 disables the log
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "plan").lower()  # off, plan or analyze
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200"))
+MAX_PARAM_LENGTH = 64
+
+# Bind names whose values are personal data or secrets
+PII_NAMES = re.compile(r"email|password|senha|phone|telefone|cpf|token|jti|name|nome|notes|address|recipient|context", re.I)
+PII_VALUES = [
+    (re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+"), "<email>"),
+    (re.compile(r"^\d{3}\.?\d{3}\.?\d{3}-?\d{2}$"), "<cpf>"),
+    (re.compile(r"^\+?[\d\s()-]{8,}$"), "<phone>"),
+    (re.compile(r"^(?:[A-Fa-f0-9]{32,}|[\w-]{20,}\.[\w-]{20,}\.[\w-]+|\$2[aby]\$.+)$"), "<secret>"),
+]
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Set while the explain worker runs, so its own statements are not logged
+_explaining: ContextVar[bool] = ContextVar("slow_query_explaining", default=False)
+
+def normalize_sql(statement: str) -> str:
+    """Collapse whitespace and replace literals and placeholder lists, so equal queries group together"""
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return _PLACEHOLDER_LIST.sub("(...)", sql)
+
+def _redact_value(name: Optional[str], value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if name and PII_NAMES.search(name):
+        return "<redacted>"
+    text = str(value)
+    for pattern, label in PII_VALUES:
+        if pattern.search(text):
+            return label
+    return text if len(text) <= MAX_PARAM_LENGTH else text[:MAX_PARAM_LENGTH] + "..."
+
+def redact_parameters(parameters, context=None):
+    """Parameters of one execution with personal data replaced by placeholders"""
+    if isinstance(parameters, dict):
+        return {name: _redact_value(name, value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        compiled = getattr(context, "compiled", None)
+        names = list(getattr(compiled, "positiontup", None) or [])
+        names += [None] * (len(parameters) - len(names))
+        return [_redact_value(name, value) for name, value in zip(names, parameters)]
+    return parameters
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, explain_mode: str = SLOW_QUERY_EXPLAIN,
+                 size: int = SLOW_QUERY_BUFFER_SIZE):
+        self.threshold_ms = threshold_ms
+        self.explain_mode = explain_mode
+        self._entries: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._explain_engines: Dict[int, object] = {}
+        self._queue: queue.Queue = queue.Queue(maxsize=100)
+        self._thread = None
+        self.total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def use_explain_engine(self, engine, explain_engine):
+        """Explain statements of engine on explain_engine (e.g. the SQLite reader pool
+        instead of the writer engine)"""
+        self._explain_engines[id(engine)] = explain_engine
+
+    def observe(self, conn, statement, parameters, context, executemany, seconds):
+        duration_ms = seconds * 1000
+        if duration_ms < self.threshold_ms or not self.enabled or _explaining.get():
+            return
+        stats = current_request_stats.get()
+        route = route_label(stats.scope) if stats is not None and stats.scope is not None else "background"
+        with self._lock:
+            entry = {
+                "id": self._next_id,
+                "at": datetime.now(timezone.utc).isoformat(),
+                "duration_ms": round(duration_ms, 2),
+                "route": route,
+                "sql": normalize_sql(statement),
+                "parameters": "<executemany>" if executemany else redact_parameters(parameters, context),
+                "plan": None,
+                "plan_status": "pending",
+            }
+            self._next_id += 1
+            self.total += 1
+            self._entries.append(entry)
+
+        if self.explain_mode == "off" or executemany or statement.lstrip().upper().startswith(("EXPLAIN", "BEGIN", "COMMIT", "ROLLBACK")):
+            entry["plan_status"] = "skipped"
+            return
+        engine = self._explain_engines.get(id(conn.engine), conn.engine)
+        try:
+            # The raw parameters go to the worker only, never into the buffer
+            self._queue.put_nowait((entry, engine, statement, parameters))
+        except queue.Full:
+            entry["plan_status"] = "dropped"
+            return
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="slow-query-explain", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        _explaining.set(True)
+        while True:
+            entry, engine, statement, parameters = self._queue.get()
+            try:
+                entry["plan"] = self.explain(engine, statement, parameters)
+                entry["plan_status"] = "captured"
+            except Exception as e:
+                entry["plan_status"] = f"failed: {str(e)[:200]}"
+
+    def explain(self, engine, statement: str, parameters) -> List[str]:
+        if engine.dialect.name == "sqlite":
+            prefix = "EXPLAIN QUERY PLAN "
+        elif (engine.dialect.name == "postgresql" and self.explain_mode == "analyze"
+              and statement.lstrip().upper().startswith(("SELECT", "WITH"))):
+            prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+        else:
+            prefix = "EXPLAIN "
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(prefix + statement, parameters or ()).all()
+            conn.rollback()
+        return [" | ".join(str(value) for value in row) for row in rows]
+
+    def entries(self, limit: int = 50) -> List[dict]:
+        with self._lock:
+            return [dict(entry) for entry in list(self._entries)[-limit:]][::-1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "explain": self.explain_mode,
+            "buffered": len(self._entries),
+            "total": self.total,
+        }
+
+slow_query_log = SlowQueryLog()
+statement_observers.append(slow_query_log.observe)
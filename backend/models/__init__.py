@@ -1,12 +1,15 @@
-from .users import User, MassagistaProfile, Unit
+from .users import User, MassagistaProfile, Unit, RevokedToken
 from .bookings import Booking, BookingStatus, ServiceType, Availability
+from .booking_view import BookingView
 
 __all__ = [
     "User",
     "MassagistaProfile", 
     "Unit",
+    "RevokedToken",
     "Booking",
     "BookingStatus",
     "ServiceType",
-    "Availability"
+    "Availability",
+    "BookingView"
 ]
\ No newline at end of file
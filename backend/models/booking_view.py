@@ -0,0 +1,104 @@
+"""
+Denormalized read model of bookings for the list endpoints.
+
+booking_view holds one row per booking with exactly what the BookingResponse
+family shows, the unit and massagista names included, so listings and the
+calendar read a single table through its (unit_code | massagista_id, starts_at)
+indexes instead of joining bookings, units and users. It is written in the same
+transaction as the source rows: ORM events on Booking, Unit and User, and
+refresh_booking_view for bulk UPDATEs that bypass the ORM.
+"""
+from typing import Iterable
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, Enum, Index, delete, event, insert, inspect, select, update
+from database.connection import Base
+from models.bookings import Booking, BookingStatus
+from models.users import Unit, User
+
+class BookingView(Base):
+    __tablename__ = "booking_view"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # bookings.id
+    client_name = Column(String(255), nullable=False)
+    client_phone = Column(String(20), nullable=False)
+    service = Column(String(100), nullable=False)
+    appointment_date = Column(DateTime, nullable=False)
+    appointment_time = Column(String(10), nullable=False)
+    starts_at = Column(DateTime, nullable=True)
+    status = Column(Enum(BookingStatus), nullable=True)
+    notes = Column(Text, nullable=True)
+    unit_id = Column(Integer, nullable=False)
+    unit_code = Column(String(20), nullable=False)
+    unit_name = Column(String(255), nullable=False)
+    massagista_id = Column(Integer, nullable=True)
+    massagista_name = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_booking_view_starts_at", "starts_at"),
+        Index("ix_booking_view_unit_code_starts_at", "unit_code", "starts_at"),
+        Index("ix_booking_view_massagista_starts_at", "massagista_id", "starts_at"),
+    )
+
+VIEW_COLUMNS = [c.name for c in BookingView.__table__.columns]
+
+def _source_select():
+    """booking_view rows computed from bookings, units and users"""
+    bookings, units, users = Booking.__table__, Unit.__table__, User.__table__
+    return select(
+        bookings.c.id, bookings.c.client_name, bookings.c.client_phone, bookings.c.service,
+        bookings.c.appointment_date, bookings.c.appointment_time, bookings.c.starts_at,
+        bookings.c.status, bookings.c.notes, bookings.c.unit_id,
+        units.c.code, units.c.name, bookings.c.massagista_id, users.c.name, bookings.c.created_at
+    ).select_from(
+        bookings.join(units, units.c.id == bookings.c.unit_id)
+        .outerjoin(users, users.c.id == bookings.c.massagista_id)
+    )
+
+def refresh_booking_view(conn, booking_ids: Iterable[int]):
+    """Rewrite the booking_view rows of booking_ids from the source tables, on conn's transaction"""
+    ids = list(booking_ids)
+    if not ids:
+        return
+    view = BookingView.__table__
+    conn.execute(delete(view).where(view.c.id.in_(ids)))
+    conn.execute(insert(view).from_select(VIEW_COLUMNS, _source_select().where(Booking.__table__.c.id.in_(ids))))
+
+def fill_booking_view(conn, low: int, high: int) -> int:
+    """Insert the rows of bookings with low <= id < high that are missing from booking_view"""
+    bookings, view = Booking.__table__, BookingView.__table__
+    query = _source_select().where(
+        bookings.c.id >= low, bookings.c.id < high,
+        ~select(view.c.id).where(view.c.id == bookings.c.id).exists()
+    )
+    return conn.execute(insert(view).from_select(VIEW_COLUMNS, query)).rowcount
+
+def _changed(target, *names) -> bool:
+    state = inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+@event.listens_for(Booking, "after_insert")
+def _booking_inserted(mapper, connection, booking: Booking):
+    connection.execute(insert(BookingView.__table__).from_select(
+        VIEW_COLUMNS, _source_select().where(Booking.__table__.c.id == booking.id)
+    ))
+
+@event.listens_for(Booking, "after_update")
+def _booking_updated(mapper, connection, booking: Booking):
+    refresh_booking_view(connection, [booking.id])
+
+@event.listens_for(Booking, "after_delete")
+def _booking_deleted(mapper, connection, booking: Booking):
+    connection.execute(delete(BookingView.__table__).where(BookingView.__table__.c.id == booking.id))
+
+@event.listens_for(Unit, "after_update")
+def _unit_updated(mapper, connection, unit: Unit):
+    if _changed(unit, "code", "name"):
+        view = BookingView.__table__
+        connection.execute(update(view).where(view.c.unit_id == unit.id).values(unit_code=unit.code, unit_name=unit.name))
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, user: User):
+    if _changed(user, "name"):
+        view = BookingView.__table__
+        connection.execute(update(view).where(view.c.massagista_id == user.id).values(massagista_name=user.name))
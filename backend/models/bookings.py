@@ -1,9 +1,18 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Enum, Index, event, inspect
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
 from database.connection import Base
 
+DEFAULT_DURATION_MINUTES = 60
+
+# PostgreSQL exclusion constraint on active bookings of a unit (see database.migrations)
+OVERLAP_CONSTRAINT = "bookings_no_overlap"
+EXCLUSION_VIOLATION = "23P01"
+
 class BookingStatus(enum.Enum):
     PENDING = "pending"
     CONFIRMED = "confirmed"
@@ -21,9 +30,13 @@ class Booking(Base):
     
     # Service details
     service = Column(String(100), nullable=False)  # shiatsu, relaxante, etc
-    appointment_date = Column(DateTime, nullable=False)
+    appointment_date = Column(DateTime, nullable=False, index=True)
     appointment_time = Column(String(10), nullable=False)  # HH:MM format
-    duration_minutes = Column(Integer, default=60)
+    duration_minutes = Column(Integer, default=DEFAULT_DURATION_MINUTES)
+    # Derived from the three columns above on every write, see booking_period.
+    # On PostgreSQL an exclusion constraint rejects overlapping active bookings of a unit.
+    starts_at = Column(DateTime, nullable=True)
+    ends_at = Column(DateTime, nullable=True)
     
     # Location and staff
     unit_id = Column(Integer, ForeignKey("units.id"), nullable=False)
@@ -33,6 +46,7 @@ class Booking(Base):
     status = Column(Enum(BookingStatus), default=BookingStatus.PENDING)
     notes = Column(Text, nullable=True)
     promotion = Column(String(255), nullable=True)  # If booking came from promotion
+    reminders_sent = Column(Integer, nullable=False, default=0, server_default="0")  # bit flags, see utils.reminders
     
     # Tracking
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -44,6 +58,52 @@ class Booking(Base):
     unit = relationship("Unit", back_populates="bookings")
     massagista = relationship("User", back_populates="bookings_assigned")
 
+    __table_args__ = (
+        Index("ix_bookings_unit_starts_at", "unit_id", "starts_at"),
+        Index("ix_bookings_massagista_starts_at", "massagista_id", "starts_at"),
+    )
+
+    @classmethod
+    def overlapping(cls, starts_at: datetime, ends_at: datetime):
+        """Filter on bookings whose period intersects [starts_at, ends_at)"""
+        return (cls.starts_at < ends_at) & (cls.ends_at > starts_at)
+
+def booking_period(appointment_date: datetime, appointment_time: Optional[str],
+                   duration_minutes: Optional[int]) -> Tuple[datetime, datetime]:
+    """Start and end of a booking: the day of appointment_date at appointment_time (HH:MM),
+    falling back to appointment_date itself when the time cannot be parsed"""
+    starts_at = appointment_date
+    try:
+        parsed = datetime.strptime(appointment_time or "", "%H:%M").time()
+        starts_at = datetime.combine(appointment_date.date(), parsed)
+    except ValueError:
+        pass
+    return starts_at, starts_at + timedelta(minutes=duration_minutes or DEFAULT_DURATION_MINUTES)
+
+def is_overlap_violation(error: IntegrityError) -> bool:
+    """True when error was raised by the bookings_no_overlap constraint"""
+    orig = error.orig
+    diag = getattr(orig, "diag", None)
+    if diag is not None and getattr(diag, "constraint_name", None):
+        return diag.constraint_name == OVERLAP_CONSTRAINT
+    # psycopg2 exposes the SQLSTATE as pgcode, psycopg 3 as sqlstate
+    return (getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)) == EXCLUSION_VIOLATION
+
+PERIOD_FIELDS = ("appointment_date", "appointment_time", "duration_minutes")
+
+@event.listens_for(Booking, "before_insert")
+def _set_booking_period(mapper, connection, booking: Booking):
+    if booking.appointment_date is not None:
+        booking.starts_at, booking.ends_at = booking_period(
+            booking.appointment_date, booking.appointment_time, booking.duration_minutes
+        )
+
+@event.listens_for(Booking, "before_update")
+def _update_booking_period(mapper, connection, booking: Booking):
+    state = inspect(booking)
+    if any(state.attrs[name].history.has_changes() for name in PERIOD_FIELDS):
+        _set_booking_period(mapper, connection, booking)
+
 class ServiceType(Base):
     __tablename__ = "service_types"
 
@@ -1,8 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey
+from typing import Any, Dict, List
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Text, ForeignKey, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.connection import Base
 
+# JSONB on PostgreSQL (GIN indexable), JSON text read with the JSON1 functions on SQLite.
+# None is stored as SQL NULL, not as the JSON null value.
+JSONDocument = JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql")
+
 class User(Base):
     __tablename__ = "users"
 
@@ -14,8 +20,9 @@ class User(Base):
     phone = Column(String(20), nullable=True)
     user_type = Column(String(20), default="massagista")  # massagista, admin
     is_active = Column(Boolean, default=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # bump to revoke tokens
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)  # incremental token version reloads
     
     # Relationships
     massagista_profile = relationship("MassagistaProfile", back_populates="user", uselist=False)
@@ -26,18 +33,29 @@ class MassagistaProfile(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True)
-    specialties = Column(Text, nullable=True)  # JSON string with specialties
+    specialties = Column(JSONDocument, nullable=True)  # list of specialty names
     unit_preference = Column(String(50), nullable=True)
     bio = Column(Text, nullable=True)
     avatar_url = Column(String(500), nullable=True)
     is_available = Column(Boolean, default=True)
-    working_hours = Column(Text, nullable=True)  # JSON string with schedule
+    working_hours = Column(JSONDocument, nullable=True)  # schedule by weekday
+    birth_date = Column(Date, nullable=True)
+    gender = Column(String(20), nullable=True)
+    experience_years = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="massagista_profile")
 
+    @property
+    def specialty_list(self) -> List[str]:
+        return [str(s) for s in self.specialties] if isinstance(self.specialties, list) else []
+
+    @property
+    def working_hours_map(self) -> Dict[str, Any]:
+        return self.working_hours if isinstance(self.working_hours, dict) else {}
+
 class Unit(Base):
     __tablename__ = "units"
 
@@ -49,10 +67,22 @@ class Unit(Base):
     address = Column(Text, nullable=False)
     phone = Column(String(20), nullable=True)
     email = Column(String(255), nullable=True)
-    working_hours = Column(Text, nullable=True)  # JSON string
+    working_hours = Column(JSONDocument, nullable=True)  # opening hours by weekday
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
-    bookings = relationship("Booking", back_populates="unit")
\ No newline at end of file
+    bookings = relationship("Booking", back_populates="unit")
+
+    @property
+    def working_hours_map(self) -> Dict[str, Any]:
+        return self.working_hours if isinstance(self.working_hours, dict) else {}
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)  # "jti" claim of the revoked access token
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)  # token exp (UTC), row can be purged after
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database.connection import engine, get_db, replica_router
+from database.engine import pool_status
+from database.instrumentation import route_query_metrics
+from database.maintenance import job_runner
+from database.slow_queries import slow_query_log
+from models.users import User
+from utils.auth import deactivate_user, get_current_admin
+
+router = APIRouter()
+
+@router.get("/metrics", response_model=dict)
+async def get_metrics(admin: dict = Depends(get_current_admin)):
+    """Connection pool, replica, background jobs and per-route SQL histograms"""
+    return {
+        "database_pool": pool_status(engine),
+        "database_replica": replica_router.status(),
+        "jobs": job_runner.status(),
+        "sql_by_route": route_query_metrics.snapshot()
+    }
+
+@router.get("/slow-queries", response_model=dict)
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=500),
+    admin: dict = Depends(get_current_admin)
+):
+    """Most recent slow statements first, with their captured plans"""
+    return {**slow_query_log.status(), "entries": slow_query_log.entries(limit)}
+
+@router.delete("/slow-queries", response_model=dict)
+async def clear_slow_queries(admin: dict = Depends(get_current_admin)):
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
+
+@router.post("/users/{user_id}/deactivate", response_model=dict)
+async def deactivate_user_account(
+    user_id: int,
+    admin: dict = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Deactivate a user; their tokens stop working at once"""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if user.id == admin.get("uid"):
+        raise HTTPException(status_code=400, detail="Admins cannot deactivate themselves")
+    
+    deactivate_user(db, user)
+    return {"message": "User deactivated", "user_id": user.id}
@@ -2,21 +2,23 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
-import json
 import secrets
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
 
-from database.connection import get_db
+from database.connection import get_db, engine
 from models.users import User, MassagistaProfile
-from utils.auth import verify_password, get_password_hash, create_access_token, get_current_user
+from utils.auth import (
+    verify_password_async, get_password_hash_async, create_access_token, get_current_user,
+    invalidate_principal, user_token_claims, decode_token_claims, revoke_access_token, revoke_user_tokens,
+    current_password_hash
+)
+from utils.profiles import invalidate_profile
+from utils.mailer import Mailer
 
 router = APIRouter()
 security = HTTPBearer()
+mailer = Mailer(engine)
 
 # Pydantic models
 class UserRegister(BaseModel):
@@ -176,7 +178,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Formato de data inválido (use YYYY-MM-DD)")
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         name=user_data.name.strip(),
         email=user_data.email.lower(),
@@ -187,14 +189,14 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db.flush()
     
-    # Create massagista profile with additional fields
+    # Create massagista profile with additional fields in the same transaction,
+    # so every registered user has a profile and reads never need to create one
     profile_data = {
         "user_id": db_user.id,
         "unit_preference": user_data.unit_preference,
-        "specialties": json.dumps(user_data.specialties) if user_data.specialties else None,
+        "specialties": user_data.specialties or None,
     }
     
     if birth_date_obj:
@@ -208,6 +210,8 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     
     db.add(massagista_profile)
     db.commit()
+    db.refresh(db_user)
+    invalidate_profile(db_user.id)
     
     return UserResponse.from_orm(db_user)
 
@@ -215,7 +219,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
 async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == user_credentials.email).first()
     
-    if not user or not verify_password(user_credentials.password, user.password_hash):
+    if not user or not await verify_password_async(user_credentials.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -230,7 +234,7 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     
     access_token_expires = timedelta(hours=24)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=user_token_claims(user), expires_delta=access_token_expires
     )
     
     return TokenResponse(
@@ -256,57 +260,17 @@ async def update_current_user(
             setattr(current_user, field, value)
     
     db.commit()
+    invalidate_principal(current_user.email)
     db.refresh(current_user)
     
     return UserResponse.from_orm(current_user)
 
 def send_password_reset_email(email: str, reset_token: str):
-    """Send password reset email"""
-    smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_user = os.getenv("SMTP_USER", "")
-    smtp_password = os.getenv("SMTP_PASSWORD", "")
-    
-    if not all([smtp_user, smtp_password]):
+    """Queue the password reset email; the outbox worker delivers it in the background"""
+    if not mailer.enabled:
         print("⚠️  Email credentials not configured. Reset token:", reset_token)
         return False
-    
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = smtp_user
-        msg['To'] = email
-        msg['Subject'] = "Espaço VIV - Redefinir Senha"
-        
-        # HTML body
-        html_body = f"""
-        <html>
-        <body>
-            <h2>🌿 Espaço VIV - Redefinição de Senha</h2>
-            <p>Olá!</p>
-            <p>Você solicitou a redefinição da sua senha. Use o código abaixo para criar uma nova senha:</p>
-            <div style="background-color: #f0f0f0; padding: 20px; border-radius: 8px; text-align: center; margin: 20px 0;">
-                <h3 style="color: #2c5530; font-family: monospace; letter-spacing: 2px;">{reset_token}</h3>
-            </div>
-            <p>Este código é válido por 1 hora.</p>
-            <p>Se você não solicitou esta redefinição, ignore este email.</p>
-            <br>
-            <p>Equipe Espaço VIV 🌱</p>
-        </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(html_body, 'html'))
-        
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
-        
-        return True
-    except Exception as e:
-        print(f"❌ Erro ao enviar email: {e}")
-        return False
+    return mailer.enqueue(email, "password_reset", {"reset_token": reset_token})
 
 @router.post("/forgot-password")
 async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
@@ -355,11 +319,12 @@ async def reset_password(request: ResetPasswordRequest, db: Session = Depends(ge
         )
     
     # Update password
-    user.password_hash = get_password_hash(request.new_password)
+    user.password_hash = await get_password_hash_async(request.new_password)
     user.reset_token = None
     user.reset_token_expires = None
     
-    db.commit()
+    # Commits, and signs out every session opened with the old password
+    revoke_user_tokens(db, user)
     
     return {"message": "Senha redefinida com sucesso! Você já pode fazer login."}
 
@@ -371,7 +336,8 @@ async def change_password(
 ):
     """Change user password with current password verification"""
     # Verify current password
-    if not verify_password(request.current_password, current_user.password_hash):
+    password_hash = current_password_hash(db, current_user)
+    if not await verify_password_async(request.current_password, password_hash):
         raise HTTPException(
             status_code=400,
             detail="Senha atual incorreta"
@@ -389,17 +355,21 @@ async def change_password(
         )
     
     # Check if new password is different from current
-    if verify_password(request.new_password, current_user.password_hash):
+    if await verify_password_async(request.new_password, password_hash):
         raise HTTPException(
             status_code=400,
             detail="A nova senha deve ser diferente da senha atual"
         )
     
     # Update password
-    current_user.password_hash = get_password_hash(request.new_password)
-    db.commit()
+    current_user.password_hash = await get_password_hash_async(request.new_password)
+    # Commits, and signs out every other session; this one gets a fresh token
+    revoke_user_tokens(db, current_user)
+    access_token = create_access_token(
+        data=user_token_claims(current_user), expires_delta=timedelta(hours=24)
+    )
     
-    return {"message": "Senha alterada com sucesso!"}
+    return {"message": "Senha alterada com sucesso!", "access_token": access_token, "token_type": "bearer"}
 
 @router.put("/profile", response_model=UserResponse)
 async def update_profile(
@@ -429,7 +399,7 @@ async def update_profile(
     
     if massagista_profile:
         if profile_data.specialties is not None:
-            massagista_profile.specialties = json.dumps(profile_data.specialties)
+            massagista_profile.specialties = profile_data.specialties
         
         if profile_data.unit_preference:
             massagista_profile.unit_preference = profile_data.unit_preference
@@ -438,6 +408,8 @@ async def update_profile(
             massagista_profile.experience_years = profile_data.experience_years
     
     db.commit()
+    invalidate_principal(current_user.email)
+    invalidate_profile(current_user.id)
     db.refresh(current_user)
     
     return UserResponse.from_orm(current_user)
@@ -468,7 +440,7 @@ async def get_complete_profile(current_user: User = Depends(get_current_user), d
     
     if massagista_profile:
         profile_data.update({
-            "specialties": json.loads(massagista_profile.specialties) if massagista_profile.specialties else [],
+            "specialties": massagista_profile.specialty_list,
             "unit_preference": massagista_profile.unit_preference,
             "experience_years": massagista_profile.experience_years,
             "is_available": massagista_profile.is_available,
@@ -477,6 +449,12 @@ async def get_complete_profile(current_user: User = Depends(get_current_user), d
     return profile_data
 
 @router.post("/logout")
-async def logout(current_user: User = Depends(get_current_user)):
-    """Logout user (client should discard token)"""
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Logout user, revoking the token used for this request"""
+    claims = decode_token_claims(credentials.credentials)
+    revoke_access_token(db, claims, current_user.id)
     return {"message": f"Usuário {current_user.name} deslogado com sucesso"}
\ No newline at end of file
@@ -1,17 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timedelta
 import json
 
-from database.connection import get_db
-from models.bookings import Booking, BookingStatus, Availability
+from database.connection import get_db, get_read_db, SessionLocal
+from models.bookings import Booking, BookingStatus, Availability, ServiceType, booking_period, is_overlap_violation, DEFAULT_DURATION_MINUTES
 from models.users import User, Unit
-from utils.auth import get_current_user
+from models.booking_view import BookingView
+from utils.auth import get_current_admin, get_current_user
+from utils.assignment import auto_assign_bookings
+from utils.reminders import ReminderScheduler
+from routes.auth import mailer
 
 router = APIRouter()
+reminder_scheduler = ReminderScheduler(SessionLocal, mailer)
 
 # Pydantic models
 class BookingCreate(BaseModel):
@@ -45,6 +51,22 @@ class BookingResponse(BaseModel):
 class BookingStatusUpdate(BaseModel):
     status: BookingStatus
 
+def view_response(view: BookingView) -> BookingResponse:
+    """BookingResponse from a booking_view row (no joins needed)"""
+    return BookingResponse(
+        id=view.id,
+        client_name=view.client_name,
+        client_phone=view.client_phone,
+        service=view.service,
+        appointment_date=view.appointment_date,
+        appointment_time=view.appointment_time,
+        status=view.status.value,
+        notes=view.notes,
+        unit_name=view.unit_name,
+        massagista_name=view.massagista_name,
+        created_at=view.created_at
+    )
+
 @router.post("/", response_model=BookingResponse)
 async def create_booking(booking_data: BookingCreate, db: Session = Depends(get_db)):
     # Get unit by code
@@ -82,12 +104,17 @@ async def create_booking(booking_data: BookingCreate, db: Session = Depends(get_
             detail="Invalid date or time format"
         )
     
-    # Check if slot is available
-    existing_booking = db.query(Booking).filter(
+    # The booking lasts as long as its service
+    duration_minutes = db.query(ServiceType.duration_minutes).filter(
+        ServiceType.code == booking_data.service
+    ).scalar() or DEFAULT_DURATION_MINUTES
+    starts_at, ends_at = booking_period(appointment_datetime, booking_data.appointment_time, duration_minutes)
+    
+    # Check if slot is available (any overlap with an active booking of the unit)
+    existing_booking = db.query(Booking.id).filter(
         and_(
             Booking.unit_id == unit.id,
-            Booking.appointment_date == appointment_datetime,
-            Booking.appointment_time == booking_data.appointment_time,
+            Booking.overlapping(starts_at, ends_at),
             Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED])
         )
     ).first()
@@ -106,6 +133,7 @@ async def create_booking(booking_data: BookingCreate, db: Session = Depends(get_
         service=booking_data.service,
         appointment_date=appointment_datetime,
         appointment_time=booking_data.appointment_time,
+        duration_minutes=duration_minutes,
         unit_id=unit.id,
         massagista_id=booking_data.massagista_id,
         notes=booking_data.notes,
@@ -114,8 +142,20 @@ async def create_booking(booking_data: BookingCreate, db: Session = Depends(get_
     )
     
     db.add(new_booking)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if not is_overlap_violation(e):
+            raise
+        # bookings_no_overlap (PostgreSQL) caught a concurrent booking of the same slot
+        raise HTTPException(
+            status_code=400,
+            detail="Time slot is already booked"
+        )
     db.refresh(new_booking)
+    if new_booking.client_email:
+        reminder_scheduler.schedule_booking(new_booking.id, new_booking.appointment_date)
     
     # Return formatted response
     return BookingResponse(
@@ -138,75 +178,44 @@ async def get_bookings(
     unit_code: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(Booking).join(Unit).outerjoin(User, Booking.massagista_id == User.id)
+    query = db.query(BookingView)
     
     # Apply filters
     if status:
-        query = query.filter(Booking.status == status)
+        query = query.filter(BookingView.status == status)
     
     if unit_code:
-        query = query.filter(Unit.code == unit_code)
+        query = query.filter(BookingView.unit_code == unit_code)
     
     if date_from:
         try:
             from_date = datetime.strptime(date_from, "%Y-%m-%d").date()
-            query = query.filter(func.date(Booking.appointment_date) >= from_date)
+            query = query.filter(BookingView.starts_at >= datetime.combine(from_date, time.min))
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date_from format")
     
     if date_to:
         try:
             to_date = datetime.strptime(date_to, "%Y-%m-%d").date()
-            query = query.filter(func.date(Booking.appointment_date) <= to_date)
+            query = query.filter(BookingView.starts_at < datetime.combine(to_date + timedelta(days=1), time.min))
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date_to format")
     
-    bookings = query.order_by(Booking.appointment_date.desc()).all()
-    
-    # Format response
-    response = []
-    for booking in bookings:
-        response.append(BookingResponse(
-            id=booking.id,
-            client_name=booking.client_name,
-            client_phone=booking.client_phone,
-            service=booking.service,
-            appointment_date=booking.appointment_date,
-            appointment_time=booking.appointment_time,
-            status=booking.status.value,
-            notes=booking.notes,
-            unit_name=booking.unit.name,
-            massagista_name=booking.massagista.name if booking.massagista else None,
-            created_at=booking.created_at
-        ))
-    
-    return response
+    return [view_response(view) for view in query.order_by(BookingView.starts_at.desc()).all()]
 
 @router.get("/{booking_id}", response_model=BookingResponse)
-async def get_booking(booking_id: int, db: Session = Depends(get_db)):
-    booking = db.query(Booking).join(Unit).outerjoin(User, Booking.massagista_id == User.id).filter(Booking.id == booking_id).first()
+async def get_booking(booking_id: int, db: Session = Depends(get_read_db)):
+    view = db.query(BookingView).filter(BookingView.id == booking_id).first()
     
-    if not booking:
+    if not view:
         raise HTTPException(
             status_code=404,
             detail="Booking not found"
         )
     
-    return BookingResponse(
-        id=booking.id,
-        client_name=booking.client_name,
-        client_phone=booking.client_phone,
-        service=booking.service,
-        appointment_date=booking.appointment_date,
-        appointment_time=booking.appointment_time,
-        status=booking.status.value,
-        notes=booking.notes,
-        unit_name=booking.unit.name,
-        massagista_name=booking.massagista.name if booking.massagista else None,
-        created_at=booking.created_at
-    )
+    return view_response(view)
 
 @router.put("/{booking_id}/status", response_model=BookingResponse)
 async def update_booking_status(
@@ -236,6 +245,9 @@ async def update_booking_status(
     db.commit()
     db.refresh(booking)
     
+    if booking.status not in (BookingStatus.PENDING, BookingStatus.CONFIRMED):
+        reminder_scheduler.cancel_booking(booking.id)
+    
     # Return updated booking
     return BookingResponse(
         id=booking.id,
@@ -251,11 +263,31 @@ async def update_booking_status(
         created_at=booking.created_at
     )
 
+@router.post("/auto-assign")
+async def auto_assign(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    dry_run: bool = False,
+    admin: dict = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Assign all pending bookings without a massagista in the period (admins only)"""
+    try:
+        from_date = datetime.strptime(date_from, "%Y-%m-%d").date() if date_from else None
+        to_date = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
+    
+    if from_date and to_date and to_date < from_date:
+        raise HTTPException(status_code=400, detail="date_to must not be before date_from")
+    
+    return auto_assign_bookings(db, from_date, to_date, dry_run=dry_run)
+
 @router.get("/available-slots/{unit_code}")
 async def get_available_slots(
     unit_code: str,
     date: str,  # YYYY-MM-DD format
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     # Get unit
     unit = db.query(Unit).filter(Unit.code == unit_code).first()
@@ -268,11 +300,12 @@ async def get_available_slots(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
     
-    # Get existing bookings for the date
-    existing_bookings = db.query(Booking).filter(
+    # Get existing bookings overlapping the date
+    day_start = datetime.combine(target_date, time.min)
+    existing_bookings = db.query(Booking.appointment_time, Booking.starts_at, Booking.ends_at).filter(
         and_(
             Booking.unit_id == unit.id,
-            func.date(Booking.appointment_date) == target_date,
+            Booking.overlapping(day_start, day_start + timedelta(days=1)),
             Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED])
         )
     ).all()
@@ -285,8 +318,12 @@ async def get_available_slots(
         "16:00", "17:00", "18:00", "19:00", "20:00"
     ]
     
-    # Filter out booked slots
-    available_slots = [slot for slot in all_slots if slot not in booked_times]
+    # Filter out slots that overlap a booking, including longer services started earlier
+    def is_free(slot: str) -> bool:
+        slot_start, slot_end = booking_period(day_start, slot, DEFAULT_DURATION_MINUTES)
+        return not any(b.starts_at < slot_end and b.ends_at > slot_start for b in existing_bookings)
+    
+    available_slots = [slot for slot in all_slots if is_free(slot)]
     
     return {
         "date": date,
@@ -7,7 +7,7 @@ from datetime import datetime, date, time, timedelta
 import calendar as cal
 from collections import defaultdict
 
-from database.connection import get_db
+from database.connection import get_read_db
 from models.bookings import Booking, BookingStatus
 from models.users import User, Unit
 from utils.auth import get_current_user
@@ -94,7 +94,7 @@ async def get_day_availability(
     unit_code: str, 
     date: str,
     massagista_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get detailed availability for a specific day"""
     # Validate unit
@@ -157,7 +157,7 @@ async def get_day_availability(
 async def get_week_availability(
     unit_code: str,
     week_start: str = Query(..., description="Start of week in YYYY-MM-DD format"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get availability for a full week"""
     unit = db.query(Unit).filter(Unit.code == unit_code).first()
@@ -233,7 +233,7 @@ async def get_month_availability(
     unit_code: str,
     year: int,
     month: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get availability for a full month"""
     unit = db.query(Unit).filter(Unit.code == unit_code).first()
@@ -312,7 +312,7 @@ async def get_availability_stats(
     massagista_id: Optional[int] = Query(None),
     date_from: str = Query(...),
     date_to: str = Query(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get comprehensive availability statistics"""
     try:
@@ -391,7 +391,7 @@ async def find_next_available_slot(
     unit_code: str,
     from_date: Optional[str] = Query(None),
     service_duration: Optional[int] = Query(60, description="Service duration in minutes"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Find the next available time slot"""
     unit = db.query(Unit).filter(Unit.code == unit_code).first()
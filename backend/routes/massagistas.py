@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta
 
-from database.connection import get_db
+from database.connection import get_db, get_read_db
 from models.users import User, MassagistaProfile, Unit
 from models.bookings import Booking, BookingStatus
-from utils.auth import get_current_user
-from routes.bookings import BookingResponse
+from utils.auth import get_current_active_massagista, get_current_user
+from models.booking_view import BookingView
+from routes.bookings import BookingResponse, view_response
+from utils.profiles import get_profile_view, has_specialty, invalidate_profile
+from utils.avatars import save_avatar, thumbnail_url, InvalidAvatar, MAX_AVATAR_BYTES
 
 router = APIRouter()
 
@@ -32,14 +35,18 @@ class MassagistaProfileUpdate(BaseModel):
     working_hours: Optional[dict] = None
 
 @router.get("/by-unit/{unit_code}", response_model=List[MassagistaInfo])
-async def get_massagistas_by_unit(unit_code: str, db: Session = Depends(get_db)):
+async def get_massagistas_by_unit(
+    unit_code: str,
+    specialty: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
     # Get unit to validate
     unit = db.query(Unit).filter(Unit.code == unit_code).first()
     if not unit:
         raise HTTPException(status_code=400, detail="Invalid unit")
     
     # Get massagistas for this unit
-    massagistas = db.query(User).join(MassagistaProfile).filter(
+    query = db.query(User).join(MassagistaProfile).filter(
         and_(
             User.user_type == "massagista",
             User.is_active == True,
@@ -49,24 +56,20 @@ async def get_massagistas_by_unit(unit_code: str, db: Session = Depends(get_db))
                 MassagistaProfile.unit_preference == None
             )
         )
-    ).all()
+    )
+    if specialty:
+        query = query.filter(has_specialty(db, specialty))
+    massagistas = query.all()
     
     response = []
     for massagista in massagistas:
         profile = massagista.massagista_profile
-        specialties = []
-        if profile and profile.specialties:
-            try:
-                import json
-                specialties = json.loads(profile.specialties)
-            except:
-                specialties = []
         
         response.append(MassagistaInfo(
             id=massagista.id,
             name=massagista.name,
-            specialties=specialties,
-            avatar_url=profile.avatar_url if profile else None,
+            specialties=profile.specialty_list if profile else [],
+            avatar_url=thumbnail_url(profile.avatar_url) if profile else None,
             is_available=profile.is_available if profile else True,
             unit_preference=profile.unit_preference if profile else None
         ))
@@ -78,56 +81,37 @@ async def get_my_appointments(
     status: Optional[BookingStatus] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    massagista: dict = Depends(get_current_active_massagista),
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(Booking).join(Unit).filter(Booking.massagista_id == current_user.id)
+    query = db.query(BookingView).filter(BookingView.massagista_id == massagista["uid"])
     
     # Apply filters
     if status:
-        query = query.filter(Booking.status == status)
+        query = query.filter(BookingView.status == status)
     
     if date_from:
         try:
             from_date = datetime.strptime(date_from, "%Y-%m-%d").date()
-            query = query.filter(func.date(Booking.appointment_date) >= from_date)
+            query = query.filter(BookingView.starts_at >= datetime.combine(from_date, time.min))
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date_from format")
     
     if date_to:
         try:
             to_date = datetime.strptime(date_to, "%Y-%m-%d").date()
-            query = query.filter(func.date(Booking.appointment_date) <= to_date)
+            query = query.filter(BookingView.starts_at < datetime.combine(to_date + timedelta(days=1), time.min))
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date_to format")
     
-    bookings = query.order_by(Booking.appointment_date.asc()).all()
-    
-    # Format response
-    response = []
-    for booking in bookings:
-        response.append(BookingResponse(
-            id=booking.id,
-            client_name=booking.client_name,
-            client_phone=booking.client_phone,
-            service=booking.service,
-            appointment_date=booking.appointment_date,
-            appointment_time=booking.appointment_time,
-            status=booking.status.value,
-            notes=booking.notes,
-            unit_name=booking.unit.name,
-            massagista_name=current_user.name,
-            created_at=booking.created_at
-        ))
-    
-    return response
+    return [view_response(view) for view in query.order_by(BookingView.starts_at.asc()).all()]
 
 @router.get("/appointments/calendar")
 async def get_calendar_appointments(
     month: Optional[int] = None,
     year: Optional[int] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    massagista: dict = Depends(get_current_active_massagista),
+    db: Session = Depends(get_read_db)
 ):
     # Default to current month/year if not provided
     if not month or not year:
@@ -142,12 +126,12 @@ async def get_calendar_appointments(
     else:
         end_date = date(year, month + 1, 1)
     
-    bookings = db.query(Booking).filter(
+    bookings = db.query(BookingView).filter(
         and_(
-            Booking.massagista_id == current_user.id,
-            func.date(Booking.appointment_date) >= start_date,
-            func.date(Booking.appointment_date) < end_date,
-            Booking.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED])
+            BookingView.massagista_id == massagista["uid"],
+            BookingView.starts_at >= datetime.combine(start_date, time.min),
+            BookingView.starts_at < datetime.combine(end_date, time.min),
+            BookingView.status.in_([BookingStatus.PENDING, BookingStatus.CONFIRMED])
         )
     ).all()
     
@@ -229,32 +213,8 @@ async def get_my_profile(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    profile = db.query(MassagistaProfile).filter(MassagistaProfile.user_id == current_user.id).first()
-    
-    if not profile:
-        # Create default profile if it doesn't exist
-        profile = MassagistaProfile(user_id=current_user.id)
-        db.add(profile)
-        db.commit()
-        db.refresh(profile)
-    
-    specialties = []
-    working_hours = {}
-    
-    if profile.specialties:
-        try:
-            import json
-            specialties = json.loads(profile.specialties)
-        except:
-            pass
-    
-    if profile.working_hours:
-        try:
-            import json
-            working_hours = json.loads(profile.working_hours)
-        except:
-            pass
-    
+    # Profiles are created at registration; a missing one is shown with defaults
+    # and only persisted by update_my_profile, so this GET never writes
     return {
         "user": {
             "id": current_user.id,
@@ -262,14 +222,7 @@ async def get_my_profile(
             "email": current_user.email,
             "phone": current_user.phone
         },
-        "profile": {
-            "specialties": specialties,
-            "unit_preference": profile.unit_preference,
-            "bio": profile.bio,
-            "avatar_url": profile.avatar_url,
-            "is_available": profile.is_available,
-            "working_hours": working_hours
-        }
+        "profile": get_profile_view(db, current_user.id)
     }
 
 @router.put("/profile", response_model=dict)
@@ -286,8 +239,7 @@ async def update_my_profile(
     
     # Update profile fields
     if profile_update.specialties is not None:
-        import json
-        profile.specialties = json.dumps(profile_update.specialties)
+        profile.specialties = profile_update.specialties
     
     if profile_update.bio is not None:
         profile.bio = profile_update.bio
@@ -296,10 +248,32 @@ async def update_my_profile(
         profile.is_available = profile_update.is_available
     
     if profile_update.working_hours is not None:
-        import json
-        profile.working_hours = json.dumps(profile_update.working_hours)
+        profile.working_hours = profile_update.working_hours
+    
+    db.commit()
+    invalidate_profile(current_user.id)
+    
+    return {"message": "Profile updated successfully"}
+
+@router.post("/profile/avatar", response_model=dict)
+async def upload_my_avatar(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    data = await file.read(MAX_AVATAR_BYTES + 1)
+    try:
+        result = save_avatar(current_user.id, data)
+    except InvalidAvatar as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    profile = db.query(MassagistaProfile).filter(MassagistaProfile.user_id == current_user.id).first()
+    if not profile:
+        profile = MassagistaProfile(user_id=current_user.id)
+        db.add(profile)
     
+    profile.avatar_url = result["avatar_url"]
     db.commit()
-    db.refresh(profile)
+    invalidate_profile(current_user.id)
     
-    return {"message": "Profile updated successfully"}
\ No newline at end of file
+    return {"message": "Avatar updated successfully", **result}
\ No newline at end of file
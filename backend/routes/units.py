@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
 
-from database.connection import get_db
+from database.connection import get_db, get_read_db
 from models.users import Unit
 
 router = APIRouter()
@@ -33,12 +33,12 @@ class UnitCreate(BaseModel):
     email: Optional[str] = None
 
 @router.get("/", response_model=List[UnitInfo])
-async def get_all_units(db: Session = Depends(get_db)):
+async def get_all_units(db: Session = Depends(get_read_db)):
     units = db.query(Unit).filter(Unit.is_active == True).order_by(Unit.name).all()
     return [UnitInfo.from_orm(unit) for unit in units]
 
 @router.get("/{unit_code}", response_model=UnitInfo)
-async def get_unit_by_code(unit_code: str, db: Session = Depends(get_db)):
+async def get_unit_by_code(unit_code: str, db: Session = Depends(get_read_db)):
     unit = db.query(Unit).filter(
         Unit.code == unit_code,
         Unit.is_active == True
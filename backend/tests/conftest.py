@@ -0,0 +1,54 @@
+"""
+Shared test setup for the routes stack.
+
+Runs before any test module imports the app: the backend directory goes on
+sys.path and DATABASE_URL points to a throwaway SQLite file, so the engines
+created at import time never touch a real database. Background workers that
+are not under test, and the rate limiter, stay off.
+
+    cd backend && python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TEST_DIR = tempfile.mkdtemp(prefix="espacoviv-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'app.db')}"
+os.environ.setdefault("JOBS_ENABLED", "false")
+os.environ.setdefault("EMAIL_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+PASSWORD = "Senha123!"
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def make_user(client):
+    """Register a user (optionally promoted to another user_type) and return its auth headers"""
+    from database.connection import SessionLocal
+    from models.users import User
+
+    def make(email: str, user_type: str = "massagista", name: str = "Teste", **fields) -> dict:
+        response = client.post("/api/auth/register", json={"name": name, "email": email, "password": PASSWORD, **fields})
+        assert response.status_code == 200, response.text
+        if user_type != "massagista":
+            db = SessionLocal()
+            try:
+                db.query(User).filter(User.email == email).update({"user_type": user_type})
+                db.commit()
+            finally:
+                db.close()
+        response = client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return make
@@ -0,0 +1,76 @@
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from conftest import TEST_DIR
+from database.connection import Base
+from models.bookings import Availability, Booking, BookingStatus
+from models.users import MassagistaProfile, Unit, User
+from utils.assignment import auto_assign_bookings
+
+DAY = date(2031, 3, 10)
+
+@pytest.fixture
+def db():
+    # Own database, so massagistas created by other tests are not candidates
+    path = os.path.join(TEST_DIR, "assignment.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    unit = Unit(code="sp-teste", name="Unidade Teste", city="Sao Paulo", state="SP", address="Rua 1")
+    massagista = User(name="Ana", email="ana@teste.com", password_hash="x", user_type="massagista")
+    session.add_all([unit, massagista])
+    session.flush()
+    session.add(MassagistaProfile(user_id=massagista.id, unit_preference="sp-teste", is_available=True))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+def _booking(db, appointment_time: str) -> Booking:
+    unit = db.query(Unit).one()
+    booking = Booking(
+        client_name="Cliente", client_phone="1", service="relaxante", unit_id=unit.id,
+        appointment_date=datetime(DAY.year, DAY.month, DAY.day),
+        appointment_time=appointment_time, duration_minutes=60, status=BookingStatus.PENDING
+    )
+    db.add(booking)
+    db.commit()
+    return booking
+
+def test_blocked_only_day_keeps_default_hours_minus_blocked_slots(db):
+    massagista = db.query(User).one()
+    db.add(Availability(
+        massagista_id=massagista.id, unit_id=db.query(Unit).one().id,
+        date=datetime(DAY.year, DAY.month, DAY.day), start_time="10:00", end_time="11:00", is_available=False
+    ))
+    db.commit()
+    blocked = _booking(db, "10:00")
+    free = _booking(db, "14:00")
+
+    result = auto_assign_bookings(db, DAY, DAY)
+
+    assert result["assignments"] == {free.id: massagista.id}
+    assert blocked.id not in result["assignments"]
+
+def test_malformed_appointment_time_is_skipped(db):
+    bad = _booking(db, "9h")
+    good = _booking(db, "15:00")
+
+    result = auto_assign_bookings(db, DAY, DAY)
+
+    assert result["skipped_invalid_time"] == [bad.id]
+    assert list(result["assignments"]) == [good.id]
+
+def test_auto_assign_requires_admin(client, make_user):
+    massagista = make_user("atribuicao-massagista@teste.com")
+    admin = make_user("atribuicao-admin@teste.com", user_type="admin")
+    params = {"date_from": "2031-03-01", "date_to": "2031-03-02", "dry_run": "true"}
+
+    assert client.post("/api/bookings/auto-assign", params=params, headers=massagista).status_code == 403
+    assert client.post("/api/bookings/auto-assign", params=params, headers=admin).status_code == 200
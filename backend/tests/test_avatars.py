@@ -0,0 +1,58 @@
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from utils import avatars
+from utils.avatars import InvalidAvatar, generate_thumbnails, save_avatar, thumbnail_url
+
+def _image(fmt: str, size=(300, 200)) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, (200, 120, 40)).save(buffer, fmt)
+    return buffer.getvalue()
+
+class _DoneFuture:
+    def add_done_callback(self, callback):
+        pass
+
+@pytest.fixture
+def avatar_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(avatars, "AVATAR_DIR", str(tmp_path))
+    monkeypatch.setattr(avatars, "_ready_variants", set())
+    # Thumbnails are rendered by the test itself
+    monkeypatch.setattr(avatars.thumbnail_executor, "submit", lambda *args: _DoneFuture())
+    return tmp_path
+
+def test_upload_is_content_addressed_and_thumbnails_are_square_webp(avatar_dir):
+    data = _image("PNG")
+    saved = save_avatar(7, data)
+
+    filename = saved["avatar_url"].rsplit("/", 1)[1]
+    digest = filename.split(".")[0]
+    assert saved["avatar_url"] == f"{avatars.AVATAR_URL_PREFIX}/7/{filename}" and filename.endswith(".png")
+    assert (avatar_dir / "7" / filename).read_bytes() == data
+    assert save_avatar(7, data)["avatar_url"] == saved["avatar_url"]
+
+    # Until the thumbnail exists, lists fall back to the original
+    assert thumbnail_url(saved["avatar_url"]) == saved["avatar_url"]
+    generate_thumbnails(7, digest, os.path.join(str(avatar_dir), "7", filename))
+
+    for size in avatars.THUMBNAIL_SIZES:
+        with Image.open(avatar_dir / "7" / f"{digest}-{size}.webp") as thumbnail:
+            assert (thumbnail.format, thumbnail.size) == ("WEBP", (size, size))
+    assert thumbnail_url(saved["avatar_url"]) == saved["thumbnails"][avatars.LIST_THUMBNAIL_SIZE]
+
+def test_invalid_uploads_are_rejected(avatar_dir, monkeypatch):
+    with pytest.raises(InvalidAvatar, match="not a valid image"):
+        save_avatar(7, b"isto nao e uma imagem")
+    with pytest.raises(InvalidAvatar, match="Unsupported"):
+        save_avatar(7, _image("BMP"))
+    monkeypatch.setattr(avatars, "MAX_AVATAR_BYTES", 100)
+    with pytest.raises(InvalidAvatar, match="larger"):
+        save_avatar(7, _image("PNG"))
+    assert not os.listdir(avatar_dir)
+
+def test_external_avatar_urls_are_left_alone():
+    assert thumbnail_url(None) is None
+    assert thumbnail_url("https://cdn.exemplo.com/foto.jpg") == "https://cdn.exemplo.com/foto.jpg"
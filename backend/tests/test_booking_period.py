@@ -0,0 +1,84 @@
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from conftest import TEST_DIR
+from database.connection import Base, SessionLocal
+from database.migrations import add_bookings_period
+from models.bookings import Booking, is_overlap_violation
+from models.users import Unit
+
+UNIT_CODE = "teste-sobrepos"
+
+@pytest.fixture(scope="module")
+def unit(client):
+    db = SessionLocal()
+    try:
+        db.add(Unit(code=UNIT_CODE, name="Unidade Sobreposicao", city="Sao Paulo", state="SP", address="Rua 2"))
+        db.commit()
+    finally:
+        db.close()
+    return UNIT_CODE
+
+def _book(client, unit, time, day="2031-04-07"):
+    return client.post("/api/bookings/", json={
+        "client_name": "Cliente", "client_phone": "11999999999", "service": "relaxante",
+        "appointment_date": day, "appointment_time": time, "unit_id": unit
+    })
+
+def test_overlapping_bookings_of_a_unit_are_rejected(client, unit):
+    assert _book(client, unit, "10:00").status_code == 200
+
+    # 60 minute default duration: 10:30 overlaps, 09:00-10:00 and 11:00 only touch the edges
+    overlapping = _book(client, unit, "10:30")
+    assert overlapping.status_code == 400
+    assert overlapping.json()["detail"] == "Time slot is already booked"
+    assert _book(client, unit, "09:00").status_code == 200
+    assert _book(client, unit, "11:00").status_code == 200
+    assert _book(client, unit, "10:30", day="2031-04-08").status_code == 200
+
+def _integrity_error(**orig):
+    return IntegrityError("INSERT", {}, SimpleNamespace(**orig))
+
+def test_only_the_overlap_constraint_maps_to_a_conflict():
+    overlap = SimpleNamespace(constraint_name="bookings_no_overlap")
+    other = SimpleNamespace(constraint_name="bookings_unit_id_fkey")
+
+    assert is_overlap_violation(_integrity_error(diag=overlap, pgcode="23P01"))
+    assert not is_overlap_violation(_integrity_error(diag=other, pgcode="23503"))
+    assert is_overlap_violation(_integrity_error(sqlstate="23P01"))
+    assert not is_overlap_violation(_integrity_error(pgcode="23505"))
+    assert not is_overlap_violation(_integrity_error())
+
+def test_backfill_fills_starts_at_and_ends_at():
+    path = os.path.join(TEST_DIR, "period.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO units (id, code, name, city, state, address) VALUES (1, 'u', 'U', 'C', 'SP', 'A')"))
+        conn.execute(text(
+            "INSERT INTO bookings (id, client_name, client_phone, service, unit_id, appointment_date, "
+            "appointment_time, duration_minutes, status) VALUES "
+            "(1, 'a', '1', 's', 1, '2031-04-07 00:00:00.000000', '14:30', 90, 'PENDING'), "
+            "(2, 'b', '1', 's', 1, '2031-04-07 00:00:00.000000', '9:00', NULL, 'PENDING'), "
+            "(3, 'c', '1', 's', 1, '2031-04-07 08:15:00.000000', 'manha', 30, 'PENDING')"
+        ))
+
+    add_bookings_period(engine)
+
+    with engine.connect() as conn:
+        rows = {row.id: (row.starts_at, row.ends_at) for row in conn.execute(
+            Booking.__table__.select().order_by(Booking.id)
+        )}
+    assert rows == {
+        1: (datetime(2031, 4, 7, 14, 30), datetime(2031, 4, 7, 16, 0)),
+        2: (datetime(2031, 4, 7, 9, 0), datetime(2031, 4, 7, 10, 0)),
+        3: (datetime(2031, 4, 7, 8, 15), datetime(2031, 4, 7, 8, 45)),
+    }
+    engine.dispose()
@@ -0,0 +1,59 @@
+from database.connection import SessionLocal
+from models.booking_view import BookingView, VIEW_COLUMNS, _source_select
+from models.bookings import Booking, BookingStatus
+from models.users import Unit, User
+
+UNIT_CODE = "teste-view"
+
+def _assert_view_matches_source(booking_id: int) -> BookingView:
+    db = SessionLocal()
+    try:
+        source = db.execute(_source_select().where(Booking.__table__.c.id == booking_id)).one()
+        view = db.get(BookingView, booking_id)
+        assert view is not None
+        assert tuple(getattr(view, name) for name in VIEW_COLUMNS) == tuple(source)
+        return view
+    finally:
+        db.close()
+
+def test_booking_view_follows_create_update_and_cancel(client, make_user):
+    massagista_headers = make_user("view-massagista@teste.com", name="Carla")
+    admin = make_user("view-admin@teste.com", user_type="admin")
+    db = SessionLocal()
+    try:
+        db.add(Unit(code=UNIT_CODE, name="Unidade View", city="Sao Paulo", state="SP", address="Rua 3"))
+        db.commit()
+        massagista_id = db.query(User.id).filter(User.email == "view-massagista@teste.com").scalar()
+    finally:
+        db.close()
+
+    created = client.post("/api/bookings/", json={
+        "client_name": "Cliente View", "client_phone": "11988887777", "service": "relaxante",
+        "appointment_date": "2031-05-06", "appointment_time": "14:00", "unit_id": UNIT_CODE,
+        "massagista_id": massagista_id
+    })
+    assert created.status_code == 200, created.text
+    booking_id = created.json()["id"]
+    view = _assert_view_matches_source(booking_id)
+    assert (view.status, view.unit_code, view.massagista_name) == (BookingStatus.PENDING, UNIT_CODE, "Carla")
+
+    confirmed = client.put(f"/api/massagista/appointments/{booking_id}/status",
+                           json={"status": "confirmed"}, headers=massagista_headers)
+    assert confirmed.status_code == 200, confirmed.text
+    assert _assert_view_matches_source(booking_id).status == BookingStatus.CONFIRMED
+
+    # Renames of the unit and the massagista reach the denormalized columns
+    db = SessionLocal()
+    try:
+        db.query(Unit).filter(Unit.code == UNIT_CODE).one().name = "Unidade View Renomeada"
+        db.get(User, massagista_id).name = "Carla Souza"
+        db.commit()
+    finally:
+        db.close()
+    view = _assert_view_matches_source(booking_id)
+    assert (view.unit_name, view.massagista_name) == ("Unidade View Renomeada", "Carla Souza")
+
+    cancelled = client.put(f"/api/bookings/{booking_id}/status", json={"status": "cancelled"}, headers=admin)
+    assert cancelled.status_code == 200, cancelled.text
+    assert _assert_view_matches_source(booking_id).status == BookingStatus.CANCELLED
+    assert client.get(f"/api/bookings/{booking_id}", headers=admin).json()["status"] == "cancelled"
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from conftest import TEST_DIR
+from database import deadlines
+from database.deadlines import DeadlineMiddleware, DeadlineRule
+from database.engine import create_database_engine
+
+# Counting to 200 million takes SQLite tens of seconds
+SLOW_QUERY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000000) SELECT count(*) FROM n"
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(deadlines, "DEADLINES_ENABLED", True)
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_database_engine(f"sqlite:///{os.path.join(TEST_DIR, 'deadlines.db')}")
+    yield engine
+    engine.dispose()
+
+def test_sqlite_statement_past_the_deadline_is_interrupted_with_503(engine):
+    app = FastAPI()
+
+    @app.get("/api/stats/heavy")
+    def heavy_report():
+        with engine.connect() as conn:
+            return {"count": conn.execute(text(SLOW_QUERY)).scalar()}
+
+    app.add_middleware(DeadlineMiddleware, rules=[DeadlineRule("reports", r"^/api/stats/", 0.2)])
+
+    began = time.monotonic()
+    response = TestClient(app).get("/api/stats/heavy")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+    assert time.monotonic() - began < 5
+    # The connection went back to the pool without the handler: later statements run normally
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+def _run(app, sent):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = DeadlineMiddleware(app, rules=[DeadlineRule("reports", r"^/api/stats/", 0.05)])
+    scope = {"type": "http", "method": "GET", "path": "/api/stats/heavy", "headers": []}
+    asyncio.run(middleware(scope, receive, send))
+
+def test_response_already_started_is_not_rewritten():
+    async def streaming(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"parcial", "more_body": True})
+        await asyncio.sleep(0.1)
+        raise RuntimeError("stream broke after the deadline")
+
+    sent = []
+    with pytest.raises(RuntimeError):
+        _run(streaming, sent)
+    assert [m.get("status") for m in sent if m["type"] == "http.response.start"] == [200]
+    assert sent[-1]["body"] == b"parcial"
+
+def test_error_before_the_deadline_keeps_its_status():
+    async def failing(scope, receive, send):
+        await send({"type": "http.response.start", "status": 500, "headers": []})
+        await send({"type": "http.response.body", "body": b"erro"})
+
+    sent = []
+    _run(failing, sent)
+
+    assert [m.get("status") for m in sent if m["type"] == "http.response.start"] == [500]
+    assert sent[-1]["body"] == b"erro"
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from utils import denylist
+from utils.denylist import TokenDenylist
+
+class SlowRevokedTokens:
+    """Stand-in for a ReadSessionLocal session whose revoked_tokens query blocks until released"""
+
+    def __init__(self, started: threading.Event, release: threading.Event):
+        self.started, self.release = started, release
+
+    def query(self, *columns):
+        return self
+
+    def filter(self, *conditions):
+        return self
+
+    def all(self):
+        self.started.set()
+        self.release.wait(5)
+        return []
+
+    def close(self):
+        pass
+
+class NoLookups(dict):
+    def get(self, key, default=None):
+        raise AssertionError("the exact set must not be consulted on a Bloom filter miss")
+
+@pytest.fixture
+def loaded():
+    tokens = TokenDenylist(refresh_seconds=30, capacity=1000)
+    tokens._loaded_at = time.monotonic()
+    return tokens
+
+def test_revoked_jti_is_reported(loaded):
+    loaded.add("jti-revogado", time.time() + 60)
+
+    assert loaded.is_revoked("jti-revogado")
+    assert not loaded.is_revoked("jti-valido")
+
+def test_bloom_filter_miss_skips_the_exact_set(loaded):
+    loaded._revoked = NoLookups()
+
+    assert not loaded.is_revoked("jti-nunca-revogado")
+
+def test_revocation_survives_a_concurrent_refresh(loaded, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    monkeypatch.setattr(denylist, "ReadSessionLocal", lambda: SlowRevokedTokens(started, release))
+    refresh = threading.Thread(target=loaded.refresh)
+    refresh.start()
+    assert started.wait(5)
+
+    # Logout handled while the reload query runs: the query result does not contain it
+    loaded.add("jti-logout", time.time() + 60)
+    release.set()
+    refresh.join(5)
+
+    assert loaded.is_revoked("jti-logout")
+
+def test_stale_denylist_reloads_without_blocking_the_request(loaded, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    monkeypatch.setattr(denylist, "ReadSessionLocal", lambda: SlowRevokedTokens(started, release))
+    loaded.add("jti-revogado", time.time() + 60)
+    loaded._loaded_at = time.monotonic() - 60
+
+    began = time.perf_counter()
+    assert loaded.is_revoked("jti-revogado")
+    assert time.perf_counter() - began < 1
+    assert started.wait(5)
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while loaded._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not loaded._is_stale() and loaded.is_revoked("jti-revogado")
+
+def test_logout_revokes_the_token(client, make_user):
+    headers = make_user("logout-denylist@teste.com")
+
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
@@ -0,0 +1,66 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, func, select, update
+
+from conftest import TEST_DIR
+from utils import jobs
+from utils.jobs import Job, JobRunner, job_locks
+
+items_metadata = MetaData()
+items = Table("items", items_metadata, Column("id", Integer, primary_key=True), Column("done", Integer, default=0))
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_BATCH_SIZE", 2)
+    monkeypatch.setattr(jobs, "JOB_BUSINESS_HOURS_BATCH_SIZE", 2)
+    monkeypatch.setattr(jobs, "MIN_PAUSE_SECONDS", 0)
+    path = os.path.join(TEST_DIR, "jobs.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    items_metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(items.insert(), [{"id": i, "done": 0} for i in range(1, 11)])
+    yield engine
+    engine.dispose()
+
+def _lease_expiry(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(job_locks.c.expires_at)).scalar()
+
+def _done(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).where(items.c.done == 1)).scalar()
+
+def test_lease_is_renewed_between_batches(engine):
+    expiries = []
+    job = Job("mark", 60, lambda ctx: ctx.batched(
+        items, items.c.done == 0, {"done": 1}, on_batch=lambda conn, ids: expiries.append(_lease_expiry(engine))
+    ))
+    runner = JobRunner(engine, [job], name="renew")
+    runner.create_table()
+    runner.lease = timedelta(0)  # renew on every batch
+    assert runner.acquire_leadership()
+
+    runner.run_job(job)
+
+    assert runner.stats["mark"].last_rows == 10
+    assert expiries == sorted(expiries) and len(set(expiries)) == len(expiries)
+
+def test_job_stops_when_the_lease_is_taken(engine):
+    def steal(conn, ids):
+        conn.execute(update(job_locks).values(holder="other", expires_at=datetime.utcnow() + timedelta(minutes=5)))
+
+    job = Job("mark", 60, lambda ctx: ctx.batched(items, items.c.done == 0, {"done": 1}, on_batch=steal))
+    runner = JobRunner(engine, [job], name="steal")
+    runner.create_table()
+    runner.lease = timedelta(0)
+    assert runner.acquire_leadership()
+
+    runner.run_job(job)
+
+    assert _done(engine) == 2
+    assert runner.is_leader is False
+    assert runner.stats["mark"].last_error.startswith("lease perdido")
@@ -0,0 +1,64 @@
+import os
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from conftest import TEST_DIR
+from database.connection import Base, SessionLocal
+from database.migrations import convert_json_columns
+from models.users import MassagistaProfile, Unit
+from utils.profiles import has_specialty
+
+UNIT_CODE = "teste-json"
+
+def test_invalid_json_text_is_cleared_on_sqlite():
+    path = os.path.join(TEST_DIR, "json.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, name, email, password_hash) VALUES (1, 'a', 'a@a', 'x'), (2, 'b', 'b@b', 'x')"))
+        conn.execute(text(
+            "INSERT INTO massagista_profiles (id, user_id, specialties, working_hours) VALUES "
+            "(1, 1, '[\"Relaxante\", \"Shiatsu\"]', '{\"seg\": [\"09:00\", \"18:00\"]}'), "
+            "(2, 2, 'Relaxante, Shiatsu', '')"
+        ))
+
+    convert_json_columns(engine)
+
+    with Session(engine) as db:
+        valid, invalid = db.query(MassagistaProfile).order_by(MassagistaProfile.id).all()
+        assert valid.specialty_list == ["Relaxante", "Shiatsu"]
+        assert valid.working_hours_map == {"seg": ["09:00", "18:00"]}
+        assert (invalid.specialties, invalid.working_hours) == (None, None)
+        assert (invalid.specialty_list, invalid.working_hours_map) == ([], {})
+        assert [p.id for p in db.query(MassagistaProfile).filter(has_specialty(db, "Shiatsu"))] == [1]
+    engine.dispose()
+
+def test_specialty_filter_matches_whole_list_items(client, make_user):
+    db = SessionLocal()
+    try:
+        db.add(Unit(code=UNIT_CODE, name="Unidade JSON", city="Sao Paulo", state="SP", address="Rua 4"))
+        db.commit()
+    finally:
+        db.close()
+    make_user("json-shiatsu@teste.com", name="Shiatsu JSON", specialties=["Shiatsu Teste JSON", "Relaxante"])
+    make_user("json-outra@teste.com", name="Outra JSON", specialties=["Shiatsu Teste JSON Avancado"])
+
+    response = client.get(f"/api/massagista/by-unit/{UNIT_CODE}", params={"specialty": "Shiatsu Teste JSON"})
+
+    assert response.status_code == 200, response.text
+    assert [m["name"] for m in response.json()] == ["Shiatsu JSON"]
+    assert response.json()[0]["specialties"] == ["Shiatsu Teste JSON", "Relaxante"]
+
+def test_postgresql_uses_the_jsonb_containment_operator():
+    db = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=postgresql.dialect()))
+
+    compiled = has_specialty(db, "Shiatsu").compile(dialect=postgresql.dialect())
+
+    # jsonb @> jsonb is the operator the GIN (jsonb_path_ops) index serves
+    assert str(compiled) == "massagista_profiles.specialties @> %(param_1)s::JSONB"
+    assert compiled.params == {"param_1": ["Shiatsu"]}
@@ -0,0 +1,120 @@
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import create_engine, select, update
+
+from conftest import TEST_DIR
+from utils import mailer as mailer_module
+from utils.mailer import Mailer, SmtpSettings, email_outbox
+
+class Inbox:
+    """aiosmtpd handler keeping delivered messages; answers 451 while failures remain"""
+
+    def __init__(self):
+        self.messages = []
+        self.failures = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failures:
+            self.failures -= 1
+            return "451 Tente novamente mais tarde"
+        self.messages.append(envelope)
+        return "250 OK"
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def inbox():
+    handler = Inbox()
+    handler.port = _free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=handler.port)
+    controller.start()
+    yield handler
+    controller.stop()
+
+@pytest.fixture
+def mailer(inbox, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENABLED", "true")
+    monkeypatch.setenv("SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(inbox.port))
+    monkeypatch.setenv("SMTP_USE_TLS", "false")
+    monkeypatch.setenv("SMTP_USER", "")
+    path = os.path.join(TEST_DIR, "outbox.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    mailer = Mailer(engine, SmtpSettings())
+    mailer.create_table()
+    yield mailer
+    mailer.stop()
+    engine.dispose()
+
+def _row(mailer):
+    with mailer.engine.connect() as conn:
+        return conn.execute(select(email_outbox)).one()
+
+def _wait_for(mailer, condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        row = _row(mailer)
+        if condition(row):
+            return row
+        time.sleep(0.05)
+    raise AssertionError(f"outbox row never reached the expected state: {_row(mailer)}")
+
+def _retry_now(mailer):
+    """Make the pending row due immediately and wake the worker"""
+    with mailer.engine.begin() as conn:
+        conn.execute(update(email_outbox).values(next_attempt_at=datetime.utcnow()))
+    mailer._wakeup.set()
+
+def test_worker_delivers_queued_email(mailer, inbox):
+    assert mailer.enqueue("cliente@teste.com", "password_reset", {"reset_token": "ABC123"})
+
+    row = _wait_for(mailer, lambda row: row.status == "sent")
+
+    assert row.attempts == 1 and row.sent_at is not None
+    assert [message.rcpt_tos for message in inbox.messages] == [["cliente@teste.com"]]
+    assert b"ABC123" in inbox.messages[0].content
+
+def test_failed_delivery_is_retried_with_exponential_backoff(mailer, inbox):
+    inbox.failures = 2
+    before = datetime.utcnow()
+    mailer.enqueue("cliente@teste.com", "password_reset", {"reset_token": "XYZ789"})
+
+    first = _wait_for(mailer, lambda row: row.attempts == 1 and row.last_error is not None)
+    assert first.status == "pending" and "451" in first.last_error
+    delay = (first.next_attempt_at - before).total_seconds()
+    assert mailer_module.RETRY_BASE_SECONDS <= delay < mailer_module.RETRY_BASE_SECONDS + 5
+
+    before = datetime.utcnow()
+    _retry_now(mailer)
+    # While claimed the row is rescheduled CLAIM_LEASE_SECONDS ahead; wait for the backoff instead
+    lease = timedelta(seconds=mailer_module.CLAIM_LEASE_SECONDS - 1)
+    second = _wait_for(mailer, lambda row: row.attempts == 2 and row.next_attempt_at < before + lease)
+    delay = (second.next_attempt_at - before).total_seconds()
+    assert 2 * mailer_module.RETRY_BASE_SECONDS <= delay < 2 * mailer_module.RETRY_BASE_SECONDS + 5
+
+    _retry_now(mailer)
+    third = _wait_for(mailer, lambda row: row.status == "sent")
+    assert third.attempts == 3 and third.last_error is None
+    assert len(inbox.messages) == 1
+
+def test_delivery_gives_up_after_max_attempts(mailer, inbox, monkeypatch):
+    monkeypatch.setattr(mailer_module, "MAX_ATTEMPTS", 2)
+    inbox.failures = 10
+    mailer.enqueue("cliente@teste.com", "password_reset", {"reset_token": "NOPE00"})
+
+    _wait_for(mailer, lambda row: row.attempts == 1 and row.last_error is not None)
+    _retry_now(mailer)
+    row = _wait_for(mailer, lambda row: row.status == "failed")
+
+    assert row.attempts == 2
+    assert inbox.messages == []
@@ -0,0 +1,26 @@
+from database.instrumentation import assert_query_budget
+
+INTERNALS = {"database_pool", "database_replica", "jobs", "sql_by_route"}
+
+def test_public_endpoints_do_not_expose_internals(client):
+    for path in ("/", "/health"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert INTERNALS.isdisjoint(response.json())
+
+def test_metrics_are_restricted_to_admins(client, make_user):
+    massagista = make_user("metricas-massagista@teste.com")
+    admin = make_user("metricas-admin@teste.com", user_type="admin")
+
+    assert client.get("/api/admin/metrics").status_code in (401, 403)
+    assert client.get("/api/admin/metrics", headers=massagista).status_code == 403
+    response = client.get("/api/admin/metrics", headers=admin)
+    assert response.status_code == 200
+    assert INTERNALS <= set(response.json())
+
+def test_unit_listing_query_budget(client):
+    response = client.get("/api/units/")
+    assert response.status_code == 200
+
+    # BEGIN on the SQLite reader + the units SELECT
+    assert_query_budget(response, 2)
@@ -0,0 +1,46 @@
+import os
+from datetime import date
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect
+
+from conftest import TEST_DIR
+from app.database import ALEMBIC_INI
+from app.partitions import add_months, archive_partitions, ensure_future_partitions, partition_name
+
+@pytest.fixture(scope="module")
+def migrated():
+    path = os.path.join(TEST_DIR, "render.db")
+    url = f"sqlite:///{path}"
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "9b1e5c2d7a44")
+    command.upgrade(config, "c3f5a7d9e1b2")
+    engine = create_engine(url)
+    yield config, engine
+    engine.dispose()
+
+def test_partition_migration_keeps_a_plain_table_on_sqlite(migrated):
+    config, engine = migrated
+    tables = set(inspect(engine).get_table_names())
+    assert "bookings" in tables
+    assert "bookings_archive" not in tables and "bookings_default" not in tables
+
+    command.downgrade(config, "9b1e5c2d7a44")
+    assert "bookings" in inspect(engine).get_table_names()
+    command.upgrade(config, "head")
+
+def test_partition_maintenance_is_a_no_op_on_sqlite(migrated):
+    _, engine = migrated
+
+    assert ensure_future_partitions(engine, months_ahead=3) == []
+    assert archive_partitions(engine, older_than_months=12) == 0
+    with pytest.raises(ValueError):
+        archive_partitions(engine, older_than_months=12, mode="s3")
+
+def test_partition_names_follow_calendar_months():
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_name(date(2027, 1, 1)) == "bookings_p2027_01"
@@ -0,0 +1,29 @@
+from conftest import PASSWORD
+from database.connection import SessionLocal
+from models.users import User
+from utils.auth import get_password_hash, principal_cache
+
+EMAIL = "cache-principal@teste.com"
+CHANGED_ELSEWHERE = "OutroWorker789!"
+
+def test_password_checks_never_use_the_cached_hash(client, make_user):
+    headers = make_user(EMAIL)
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    cached = principal_cache.get(EMAIL)
+    assert cached is not None and "password_hash" not in cached
+
+    # Password changed by another worker, whose invalidation never reaches this process's cache
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.email == EMAIL).update({"password_hash": get_password_hash(CHANGED_ELSEWHERE)})
+        db.commit()
+    finally:
+        db.close()
+
+    stale = client.post("/api/auth/change-password", headers=headers,
+                        json={"current_password": PASSWORD, "new_password": "NovaSenha456!"})
+    assert stale.status_code == 400
+
+    response = client.post("/api/auth/change-password", headers=headers,
+                           json={"current_password": CHANGED_ELSEWHERE, "new_password": "NovaSenha456!"})
+    assert response.status_code == 200, response.text
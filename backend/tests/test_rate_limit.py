@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from utils import rate_limit
+from utils.rate_limit import InMemoryBackend, RateLimitMiddleware, RateLimitRule
+
+def test_sweep_keeps_buckets_that_have_not_refilled(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    backend = InMemoryBackend(sweep_interval=60)
+    # 5 tokens per 300s: one token every 60s
+    for _ in range(5):
+        assert asyncio.run(backend.allow("password:ip:a", 5, 5 / 300))[0]
+    assert asyncio.run(backend.allow("login:ip:b", 10, 10 / 60))[0]
+
+    clock[0] += 120
+    backend._sweep(clock[0])
+
+    # login refilled in 6s and is gone; password got 2 of its 5 tokens back and stays
+    assert list(backend._buckets) == ["password:ip:a"]
+    results = [asyncio.run(backend.allow("password:ip:a", 5, 5 / 300))[0] for _ in range(3)]
+    assert results == [True, True, False]
+
+def _run(middleware, body_chunks):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(body_chunks) - 1}
+        for i, chunk in enumerate(body_chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/api/auth/login", "headers": [], "client": ("1.2.3.4", 1)}
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+@pytest.fixture
+def middleware(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    seen = []
+
+    async def app(scope, receive, send):
+        message = await receive()
+        seen.append(json.loads(message["body"]))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    rules = [RateLimitRule("login", r"^/api/auth/login$", ("POST",), capacity=2, per_seconds=60, by_account=True)]
+    limiter = RateLimitMiddleware(app, rules=rules, backend=InMemoryBackend())
+    limiter.seen = seen
+    return limiter
+
+def test_body_is_replayed_and_account_limited(middleware):
+    body = json.dumps({"email": "Ana@Teste.com", "password": "x"}).encode()
+    statuses = [_run(middleware, [body[:10], body[10:]])[0]["status"] for _ in range(3)]
+
+    assert statuses == [200, 200, 429]
+    assert middleware.seen[0]["email"] == "Ana@Teste.com"
+
+def test_oversized_body_is_rejected_with_413(middleware):
+    chunk = b" " * (rate_limit.MAX_BODY_BYTES // 2)
+    sent = _run(middleware, [b'{"email": "a@b.com",', chunk, chunk, b"}"])
+
+    assert sent[0]["status"] == 413
+    assert middleware.seen == []
+
+def _scope(forwarded_for):
+    return {"headers": [(b"x-forwarded-for", forwarded_for.encode())], "client": ("10.0.0.1", 443)}
+
+def test_forwarded_client_address_behind_one_proxy(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PROXY_HOPS", 1)
+
+    # The proxy appends the address it saw; anything before it came from the client
+    assert rate_limit.client_ip(_scope("203.0.113.7")) == "203.0.113.7"
+    assert rate_limit.client_ip(_scope("1.2.3.4, 203.0.113.7")) == "203.0.113.7"
+    assert rate_limit.client_ip({"headers": [], "client": ("10.0.0.1", 443)}) == "10.0.0.1"
+
+def test_forwarded_header_is_ignored_without_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PROXY_HOPS", 0)
+
+    assert rate_limit.client_ip(_scope("1.2.3.4")) == "10.0.0.1"
@@ -0,0 +1,25 @@
+from datetime import date
+
+from conftest import PASSWORD
+from database.connection import SessionLocal
+from models.users import MassagistaProfile, User
+
+def test_registration_keeps_every_profile_field(client):
+    response = client.post("/api/auth/register", json={
+        "name": "Bia", "email": "cadastro-completo@teste.com", "password": PASSWORD,
+        "specialties": ["Relaxante"], "birth_date": "1990-05-17", "gender": "feminino", "experience_years": 7
+    })
+    assert response.status_code == 200, response.text
+
+    db = SessionLocal()
+    try:
+        profile = db.query(MassagistaProfile).join(User).filter(User.email == "cadastro-completo@teste.com").one()
+        assert (profile.birth_date, profile.gender, profile.experience_years) == (date(1990, 5, 17), "feminino", 7)
+    finally:
+        db.close()
+
+    token = client.post("/api/auth/login", json={"email": "cadastro-completo@teste.com", "password": PASSWORD})
+    headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+    complete = client.get("/api/auth/profile/complete", headers=headers)
+    assert complete.status_code == 200, complete.text
+    assert complete.json()["experience_years"] == 7
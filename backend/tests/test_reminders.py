@@ -0,0 +1,40 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from utils.reminders import ReminderScheduler, local_now
+
+@pytest.fixture
+def scheduler():
+    scheduler = ReminderScheduler(session_factory=None, mailer=SimpleNamespace(enabled=False))
+    scheduler._loaded_until = local_now() + timedelta(days=3)
+    return scheduler
+
+def _due(scheduler, hours_from_now):
+    return {(booking_id, flag) for _, booking_id, flag in scheduler._pop_due(local_now() + timedelta(hours=hours_from_now))}
+
+def test_cancelled_ids_are_pruned_when_their_reminders_are_popped(scheduler):
+    now = local_now()
+    scheduler.schedule_booking(1, now + timedelta(hours=30))
+    scheduler.schedule_booking(2, now + timedelta(hours=30))
+    scheduler.cancel_booking(1)
+    scheduler.cancel_booking(99)  # nothing queued for it
+
+    assert scheduler._cancelled == {1}
+    assert _due(scheduler, 7) == {(2, 1)}
+    assert scheduler._cancelled == {1}  # its 2 h reminder is still queued
+    assert _due(scheduler, 29) == {(2, 2)}
+    assert scheduler._cancelled == set() and scheduler._queued == {}
+
+def test_rescheduling_a_cancelled_booking_only_keeps_the_new_reminders(scheduler):
+    now = local_now()
+    scheduler.schedule_booking(1, now + timedelta(hours=30))
+    scheduler.cancel_booking(1)
+    scheduler.schedule_booking(1, now + timedelta(hours=50))
+
+    assert scheduler._cancelled == set()
+    assert _due(scheduler, 29) == {(1, 1)}
+    assert len(scheduler) == 1
+    assert _due(scheduler, 49) == {(1, 2)}
+    assert scheduler._queued == {}
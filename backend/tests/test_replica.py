@@ -0,0 +1,114 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from conftest import TEST_DIR
+from database import replica
+from database.engine import create_database_engine
+from database.replica import STICKY_COOKIE, ReadYourWritesMiddleware, ReplicaRouter, replica_heartbeat, replica_metadata
+
+def _sqlite_url(name: str) -> str:
+    path = os.path.join(TEST_DIR, name)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return f"sqlite:///{path}"
+
+@pytest.fixture
+def router():
+    primary = create_database_engine(_sqlite_url("primary.db"))
+    replica_url = _sqlite_url("replica.db")
+    replica_metadata.create_all(primary)
+    replica_metadata.create_all(create_database_engine(replica_url))
+    router = ReplicaRouter(primary, replica_url)
+    yield router
+    router.stop()
+    router.replica_engine.dispose()
+    primary.dispose()
+
+def _replicate(router, lag_seconds: float):
+    """Stand-in for replication: the replica's heartbeat is lag_seconds old"""
+    engine = create_database_engine(str(router.replica_engine.url))
+    with engine.begin() as conn:
+        conn.execute(replica_heartbeat.insert().prefix_with("OR REPLACE").values(
+            id=1, beat_at=datetime.utcnow() - timedelta(seconds=lag_seconds)
+        ))
+    engine.dispose()
+
+def test_reads_fall_back_to_the_primary_when_the_replica_lags(router):
+    request = Request({"type": "http", "headers": [], "client": ("10.0.0.1", 1)})
+
+    router.probe()
+    assert router.lag_seconds is None and router.read_sessionmaker(request) is None
+
+    _replicate(router, lag_seconds=1)
+    router.probe()
+    assert router.replica_usable
+    assert router.read_sessionmaker(request) is router.ReplicaSession
+
+    _replicate(router, lag_seconds=replica.REPLICA_MAX_LAG_SECONDS + 5)
+    router.probe()
+    assert not router.replica_usable
+    assert router.read_sessionmaker(request) is None
+    assert router.status()["primary_reads"] == 2 and router.status()["replica_reads"] == 1
+
+def test_replica_errors_fall_back_to_the_primary(router):
+    _replicate(router, lag_seconds=1)
+    router.probe()
+    assert router.replica_usable
+
+    with router.replica_engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA query_only=OFF")
+        conn.exec_driver_sql("DROP TABLE replica_heartbeat")
+    router.probe()
+
+    assert not router.replica_usable
+    assert "replica_heartbeat" in router.last_error
+
+@pytest.fixture
+def app_client(router):
+    _replicate(router, lag_seconds=0)
+    router.probe()
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, router=router)
+
+    @app.post("/write")
+    async def write(fail: bool = False):
+        if fail:
+            raise HTTPException(status_code=400, detail="invalid")
+        return {"ok": True}
+
+    @app.get("/read")
+    async def read(request: Request):
+        return {"replica": router.read_sessionmaker(request) is not None}
+
+    return TestClient(app)
+
+def test_writes_keep_the_client_on_the_primary(app_client):
+    writer = {"Authorization": "Bearer escritor"}
+    reader = {"Authorization": "Bearer leitor"}
+    assert app_client.get("/read", headers=writer).json() == {"replica": True}
+
+    failed = app_client.post("/write", params={"fail": True}, headers=writer)
+    assert STICKY_COOKIE not in failed.cookies
+    assert app_client.get("/read", headers=writer).json() == {"replica": True}
+
+    response = app_client.post("/write", headers=writer)
+    assert int(response.cookies[STICKY_COOKIE]) > time.time()
+    assert app_client.get("/read", headers=writer).json() == {"replica": False}
+
+    # Without the cookie the writer is still recognized by its token; other clients are not
+    app_client.cookies.clear()
+    assert app_client.get("/read", headers=writer).json() == {"replica": False}
+    assert app_client.get("/read", headers=reader).json() == {"replica": True}
+
+def test_sticky_cookie_alone_keeps_reads_on_the_primary(app_client):
+    app_client.cookies.set(STICKY_COOKIE, str(int(time.time()) + 60))
+    assert app_client.get("/read", headers={"Authorization": "Bearer outro"}).json() == {"replica": False}
+
+    app_client.cookies.set(STICKY_COOKIE, str(int(time.time()) - 1))
+    assert app_client.get("/read", headers={"Authorization": "Bearer outro"}).json() == {"replica": True}
@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from database.connection import engine
+
+PASSWORD = "Senha123!"
+
+@pytest.fixture(scope="module")
+def accounts():
+    with TestClient(app) as client:
+        emails = [f"concorrente{i}@teste.com" for i in range(5)]
+        for i, email in enumerate(emails):
+            response = client.post("/api/auth/register", json={"name": f"Concorrente {i}", "email": email, "password": PASSWORD})
+            assert response.status_code == 200, response.text
+        yield emails
+
+async def _gather(requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+        return await asyncio.gather(*(request(client) for request in requests))
+
+def test_concurrent_logins_do_not_exhaust_the_writer_pool(accounts):
+    # Each login keeps its session across the await of the password check
+    responses = asyncio.run(_gather([
+        lambda client, email=email: client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        for email in accounts
+    ]))
+    assert [r.status_code for r in responses] == [200] * len(accounts)
+    assert engine.pool.metrics.timeouts == 0
+
+def test_concurrent_writes_are_serialized(accounts):
+    responses = asyncio.run(_gather([
+        lambda client, i=i: client.post("/api/auth/register", json={
+            "name": f"Escritor {i}", "email": f"escritor{i}@teste.com", "password": PASSWORD
+        })
+        for i in range(5)
+    ]))
+    assert [r.status_code for r in responses] == [200] * 5
@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+from utils import auth
+from utils.auth import create_access_token, decode_token_claims, token_versions, verified_token_cache
+from utils.cache import TTLCache, token_cache_key
+
+CLAIMS = {"sub": "cache-token@teste.com", "uid": 987654, "user_type": "massagista", "token_version": 0}
+
+@pytest.fixture
+def decodes(client, monkeypatch):
+    calls = []
+    real_decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    return calls
+
+def test_signature_is_verified_once_per_token(decodes):
+    token = create_access_token(CLAIMS)
+    first = decode_token_claims(token)
+    first["user_type"] = "admin"  # callers get a copy, not the cached payload
+
+    assert decode_token_claims(token)["user_type"] == "massagista"
+    assert decodes == [token]
+
+def test_cached_payload_expires_with_the_token(decodes):
+    token = create_access_token(CLAIMS, expires_delta=timedelta(minutes=5))
+    decode_token_claims(token)
+
+    expires_in = verified_token_cache._data[token_cache_key(token)][0] - time.monotonic()
+    assert 290 < expires_in <= 300
+
+def test_revocation_applies_to_cached_tokens(decodes):
+    claims = {**CLAIMS, "uid": 987655}
+    token = create_access_token(claims)
+    assert decode_token_claims(token) is not None
+
+    token_versions.update(987655, 1, True)
+    assert decode_token_claims(token) is None
+    assert len(decodes) == 1
+
+def test_invalid_tokens_are_not_cached(decodes):
+    forged = create_access_token(CLAIMS)[:-4] + "AAAA"
+
+    assert decode_token_claims(forged) is None
+    assert verified_token_cache.get(token_cache_key(forged)) is None
+
+def test_entries_past_their_expiry_are_not_kept():
+    cache = TTLCache(maxsize=2)
+    cache.set("expirado", 1, expires_at=time.time() - 1)
+    for key in ("a", "b", "c"):
+        cache.set(key, key, expires_at=time.time() + 60)
+
+    assert cache.get("expirado") is None
+    assert [cache.get(key) for key in ("a", "b", "c")] == [None, "b", "c"]
@@ -0,0 +1,92 @@
+import threading
+import time
+
+from conftest import PASSWORD
+from database.connection import SessionLocal
+from models.users import User
+from utils.auth import TokenVersionMap, create_access_token
+
+NEW_PASSWORD = "NovaSenha456!"
+
+def _login(client, email, password=PASSWORD):
+    response = client.post("/api/auth/login", json={"email": email, "password": password})
+    return response.status_code, {"Authorization": f"Bearer {response.json().get('access_token')}"}
+
+def test_change_password_signs_out_other_sessions(client, make_user):
+    headers = make_user("troca-senha@teste.com")
+    _, other_session = _login(client, "troca-senha@teste.com")
+
+    response = client.post("/api/auth/change-password", headers=headers,
+                           json={"current_password": PASSWORD, "new_password": NEW_PASSWORD})
+    assert response.status_code == 200, response.text
+
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+    assert client.get("/api/auth/me", headers=other_session).status_code == 401
+    fresh = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("/api/auth/me", headers=fresh).status_code == 200
+
+def test_admin_deactivation_revokes_tokens(client, make_user):
+    headers = make_user("desativada@teste.com")
+    admin = make_user("desativa-admin@teste.com", user_type="admin")
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+
+    assert client.post(f"/api/admin/users/{user_id}/deactivate", headers=headers).status_code == 403
+    assert client.post(f"/api/admin/users/{user_id}/deactivate", headers=admin).status_code == 200
+
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+    assert _login(client, "desativada@teste.com")[0] == 401
+
+def test_appointments_are_for_massagistas_only(client, make_user):
+    massagista = make_user("agenda-massagista@teste.com")
+    admin = make_user("agenda-admin@teste.com", user_type="admin")
+
+    assert client.get("/api/massagista/appointments", headers=massagista).status_code == 200
+    assert client.get("/api/massagista/appointments", headers=admin).status_code == 403
+    assert client.get("/api/massagista/appointments/calendar", headers=admin).status_code == 403
+
+def test_stale_versions_reload_without_blocking_the_request():
+    versions = TokenVersionMap(refresh_seconds=30)
+    versions.update(7, 2, True)
+    versions._loaded_at = time.monotonic() - 60
+    release = threading.Event()
+    reloaded = threading.Event()
+
+    def slow_refresh():
+        release.wait(5)
+        versions._loaded_at = time.monotonic()
+        reloaded.set()
+
+    versions.refresh = slow_refresh
+    started = time.perf_counter()
+    assert versions.is_current(7, 2)
+    assert versions.is_current(7, 1) is False
+    assert time.perf_counter() - started < 1
+
+    release.set()
+    assert reloaded.wait(5)
+
+def test_other_workers_revocations_are_picked_up_incrementally(client, make_user):
+    headers = make_user("outro-worker@teste.com")
+    user_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    versions = TokenVersionMap(refresh_seconds=2)
+    versions.refresh(full=True)
+    assert versions.is_current(user_id, 0)
+    versions.update(-1, 0, True)  # only a full reload would drop it
+
+    # Revocation committed by another worker: only the database knows about it
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.id == user_id).update({"token_version": User.token_version + 1})
+        db.commit()
+    finally:
+        db.close()
+    versions.refresh()
+
+    assert not versions.is_current(user_id, 0) and versions.is_current(user_id, 1)
+    assert -1 in versions._versions
+
+def test_tokens_without_uid_are_rejected(client, make_user):
+    make_user("sem-uid@teste.com")
+    token = create_access_token({"sub": "sem-uid@teste.com", "user_type": "massagista"})
+
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"}).status_code == 401
@@ -0,0 +1,265 @@
+"""
+Automatic assignment of unassigned bookings to massagistas.
+
+Each massagista's day is a 48-bit integer (one bit per 30 minute slot). Bookings
+are matched greedily, most constrained first, to the least loaded massagista
+whose unit, specialties and free slots fit. The whole batch is written in one
+transaction.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, date, timedelta
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, update
+from sqlalchemy.orm import Session
+
+from models.bookings import Booking, BookingStatus, Availability
+from models.booking_view import refresh_booking_view
+from models.users import User, MassagistaProfile, Unit
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Used when a massagista has no Availability rows for a day
+DEFAULT_WORKING_HOURS = ("08:00", "21:00")
+
+# Availability window valid for any unit
+ANY_UNIT = 0
+
+@dataclass
+class BookingRequest:
+    id: int
+    unit_id: int
+    unit_code: str
+    service: str
+    day: int  # date ordinal
+    start: int  # first slot index
+    length: int  # number of slots
+
+    @property
+    def mask(self) -> int:
+        return ((1 << self.length) - 1) << self.start
+
+@dataclass
+class Therapist:
+    id: int
+    unit_code: Optional[str]  # None means the massagista works at any unit
+    specialties: FrozenSet[str] = field(default_factory=frozenset)
+    load: int = 0
+
+    def can_serve(self, booking: BookingRequest) -> bool:
+        if self.unit_code is not None and self.unit_code != booking.unit_code:
+            return False
+        return not self.specialties or booking.service in self.specialties
+
+def time_to_slot(value: str) -> int:
+    """Convert an HH:MM string to a slot index (rounded down); ValueError if malformed"""
+    hours, minutes = value.split(":")
+    total = int(hours) * 60 + int(minutes)
+    if not 0 <= total < 24 * 60 or not 0 <= int(minutes) < 60:
+        raise ValueError(f"invalid time: {value!r}")
+    return total // SLOT_MINUTES
+
+def window_mask(start_time: str, end_time: str) -> int:
+    """Bitmask of the slots fully or partially covered by [start_time, end_time)"""
+    start = time_to_slot(start_time)
+    hours, minutes = end_time.split(":")
+    end_minutes = int(hours) * 60 + int(minutes)
+    end = min(-(-end_minutes // SLOT_MINUTES), SLOTS_PER_DAY)
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+def normalize_service(name: str) -> str:
+    return name.strip().lower()
+
+DEFAULT_MASK = window_mask(*DEFAULT_WORKING_HOURS)
+
+def match_bookings(
+    bookings: List[BookingRequest],
+    therapists: List[Therapist],
+    windows: Dict[Tuple[int, int], Dict[int, int]],
+    busy: Dict[Tuple[int, int], int],
+) -> Dict[int, int]:
+    """Match bookings to therapists.
+
+    `windows` maps (therapist_id, day) to {unit_id or ANY_UNIT: mask} for days with
+    explicit availability; other days use DEFAULT_MASK. `busy` maps (therapist_id, day)
+    to the mask of slots already taken and is updated in place.
+    Returns {booking_id: therapist_id}.
+    """
+    # Candidate lists only depend on unit and service, so share them between bookings
+    by_profile: Dict[Tuple[str, str], List[Therapist]] = {}
+    candidates = {}
+    for booking in bookings:
+        profile = (booking.unit_code, booking.service)
+        if profile not in by_profile:
+            by_profile[profile] = [t for t in therapists if t.can_serve(booking)]
+        candidates[booking.id] = by_profile[profile]
+
+    # Most constrained bookings first so flexible ones don't steal their only option
+    ordered = sorted(bookings, key=lambda b: (len(candidates[b.id]), b.day, b.start))
+
+    assignments = {}
+    for booking in ordered:
+        need = booking.mask
+        best = None
+        for therapist in candidates[booking.id]:
+            key = (therapist.id, booking.day)
+            if busy.get(key, 0) & need:
+                continue
+
+            day_windows = windows.get(key)
+            if day_windows is None:
+                free = DEFAULT_MASK
+            else:
+                free = day_windows.get(booking.unit_id, 0) | day_windows.get(ANY_UNIT, 0)
+            if free & need != need:
+                continue
+
+            if best is None or (therapist.load, therapist.id) < (best.load, best.id):
+                best = therapist
+
+        if best is None:
+            continue
+
+        key = (best.id, booking.day)
+        busy[key] = busy.get(key, 0) | need
+        best.load += 1
+        assignments[booking.id] = best.id
+
+    return assignments
+
+def _slot_length(duration_minutes: Optional[int]) -> int:
+    return max(1, -(-(duration_minutes or 60) // SLOT_MINUTES))
+
+def auto_assign_bookings(
+    db: Session,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    dry_run: bool = False,
+) -> Dict[str, object]:
+    """Assign every pending unassigned booking in the period and commit once"""
+    date_from = date_from or datetime.now().date()
+    date_to = date_to or date_from + timedelta(days=30)
+    start_dt = datetime.combine(date_from, datetime.min.time())
+    end_dt = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    active_statuses = [BookingStatus.PENDING, BookingStatus.CONFIRMED]
+
+    unit_codes = dict(db.query(Unit.id, Unit.code).all())
+
+    pending = db.query(
+        Booking.id, Booking.unit_id, Booking.service, Booking.appointment_date,
+        Booking.appointment_time, Booking.duration_minutes
+    ).filter(
+        and_(
+            Booking.massagista_id == None,
+            Booking.status == BookingStatus.PENDING,
+            Booking.appointment_date >= start_dt,
+            Booking.appointment_date < end_dt
+        )
+    ).all()
+
+    requests = []
+    skipped = []
+    for row in pending:
+        try:
+            start = time_to_slot(row.appointment_time)
+        except (ValueError, AttributeError):
+            # Malformed appointment_time: left unassigned and reported
+            skipped.append(row.id)
+            continue
+        requests.append(BookingRequest(
+            id=row.id,
+            unit_id=row.unit_id,
+            unit_code=unit_codes.get(row.unit_id),
+            service=normalize_service(row.service),
+            day=row.appointment_date.toordinal(),
+            start=start,
+            length=_slot_length(row.duration_minutes)
+        ))
+
+    therapists = []
+    for user_id, unit_preference, specialties in db.query(
+        User.id, MassagistaProfile.unit_preference, MassagistaProfile.specialties
+    ).join(MassagistaProfile).filter(
+        and_(
+            User.user_type == "massagista",
+            User.is_active == True,
+            MassagistaProfile.is_available == True
+        )
+    ):
+        therapists.append(Therapist(
+            id=user_id,
+            unit_code=unit_preference,
+            specialties=frozenset(normalize_service(s) for s in specialties or [] if isinstance(s, str))
+        ))
+
+    by_id = {t.id: t for t in therapists}
+
+    windows: Dict[Tuple[int, int], Dict[int, int]] = {}
+    blocked: Dict[Tuple[int, int], int] = {}
+    for row in db.query(Availability).filter(
+        and_(
+            Availability.massagista_id.in_(list(by_id)),
+            Availability.date >= start_dt,
+            Availability.date < end_dt
+        )
+    ):
+        key = (row.massagista_id, row.date.toordinal())
+        try:
+            mask = window_mask(row.start_time, row.end_time)
+        except (ValueError, AttributeError):
+            continue
+        if row.is_available:
+            day_windows = windows.setdefault(key, {})
+            day_windows[row.unit_id] = day_windows.get(row.unit_id, 0) | mask
+        else:
+            # A day with only blocked rows keeps the default hours minus the blocked slots
+            blocked[key] = blocked.get(key, 0) | mask
+
+    busy = dict(blocked)
+    for row in db.query(
+        Booking.massagista_id, Booking.appointment_date,
+        Booking.appointment_time, Booking.duration_minutes
+    ).filter(
+        and_(
+            Booking.massagista_id.in_(list(by_id)),
+            Booking.status.in_(active_statuses),
+            Booking.appointment_date >= start_dt,
+            Booking.appointment_date < end_dt
+        )
+    ):
+        key = (row.massagista_id, row.appointment_date.toordinal())
+        try:
+            start = time_to_slot(row.appointment_time)
+        except (ValueError, AttributeError):
+            continue
+        busy[key] = busy.get(key, 0) | (((1 << _slot_length(row.duration_minutes)) - 1) << start)
+        by_id[row.massagista_id].load += 1
+
+    assignments = match_bookings(requests, therapists, windows, busy)
+
+    if assignments and not dry_run:
+        bookings_table = Booking.__table__
+        db.execute(
+            update(bookings_table)
+            .where(and_(
+                bookings_table.c.id == bindparam("b_id"),
+                bookings_table.c.massagista_id == None
+            ))
+            .values(massagista_id=bindparam("m_id")),
+            [{"b_id": b_id, "m_id": m_id} for b_id, m_id in assignments.items()]
+        )
+        refresh_booking_view(db.connection(), list(assignments))
+        db.commit()
+
+    return {
+        "period": {"from": date_from.isoformat(), "to": date_to.isoformat()},
+        "unassigned": len(requests),
+        "skipped_invalid_time": skipped,
+        "assigned": len(assignments),
+        "remaining": len(requests) - len(assignments),
+        "dry_run": dry_run,
+        "assignments": assignments
+    }
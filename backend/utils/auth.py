@@ -1,22 +1,145 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import secrets
+import threading
+import time
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 
-from database.connection import get_db
+from database.connection import get_db, ReadSessionLocal
 from models.users import User
+from utils.cache import TTLCache, token_cache_key
+from utils.denylist import token_denylist
 
 # Security configuration
 SECRET_KEY = "your-secret-key-here"  # In production, use environment variable
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
+# Other workers see a revocation or deactivation at most this many seconds late
+TOKEN_VERSION_REFRESH_SECONDS = int(os.getenv("TOKEN_VERSION_REFRESH_SECONDS", "2"))
+# Full reload, as a safety net for rows an incremental reload could miss
+TOKEN_VERSION_FULL_REFRESH_SECONDS = int(os.getenv("TOKEN_VERSION_FULL_REFRESH_SECONDS", "600"))
+# Incremental reloads re-read rows updated this long before the newest updated_at seen,
+# covering timestamp precision and transactions that commit after a later one
+TOKEN_VERSION_OVERLAP = timedelta(seconds=int(os.getenv("TOKEN_VERSION_OVERLAP_SECONDS", "60")))
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", "2"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt costs ~250ms of CPU per call; running it here keeps the event loop free.
+# The pool size caps how many hashes run at once, the rest wait in its queue.
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_CONCURRENCY,
+    thread_name_prefix="password-hash"
+)
 security = HTTPBearer()
 
+# Authenticated users by email, so authenticated requests skip the users table query.
+# Entries must be invalidated whenever the user row changes (see invalidate_principal).
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+)
+
+# Verified token payloads by token digest, each expiring at the token's own exp, so a
+# burst of requests with the same bearer token runs the signature check only once
+verified_token_cache = TTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "4096")))
+
+class TokenVersionMap:
+    """In-memory copy of users.token_version and is_active, used to revoke tokens
+    without a database query per request. Loaded once on first use; afterwards a
+    background thread re-reads only the users updated since the last reload, every
+    refresh_seconds, plus the whole table every full_refresh_seconds. Revocations
+    made in this process apply immediately; other workers see them within
+    refresh_seconds (TOKEN_VERSION_REFRESH_SECONDS)."""
+
+    def __init__(self, refresh_seconds: int, full_refresh_seconds: int = TOKEN_VERSION_FULL_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self._versions: Dict[int, Tuple[int, bool]] = {}
+        self._loaded_at = None
+        self._full_loaded_at = None
+        self._changed_since: Optional[datetime] = None  # newest users.updated_at seen
+        self._refreshing = False
+        self._lock = threading.RLock()
+
+    def refresh(self, full: bool = False):
+        full = full or self._full_loaded_at is None or \
+            time.monotonic() - self._full_loaded_at > self.full_refresh_seconds
+        db = ReadSessionLocal()
+        try:
+            query = db.query(User.id, User.token_version, User.is_active, User.updated_at)
+            if not full and self._changed_since is not None:
+                query = query.filter(User.updated_at >= self._changed_since - TOKEN_VERSION_OVERLAP)
+            elif not full:
+                query = query.filter(User.updated_at != None)
+            rows = query.all()
+        finally:
+            db.close()
+
+        with self._lock:
+            versions = {} if full else dict(self._versions)
+            for row in rows:
+                versions[row.id] = (row.token_version or 0, row.is_active is not False)
+            # Versions only grow: keep revocations made here while the query ran
+            for user_id, current in self._versions.items():
+                if user_id in versions and versions[user_id][0] < current[0]:
+                    versions[user_id] = current
+            self._versions = versions
+            newest = max((row.updated_at for row in rows if row.updated_at is not None), default=None)
+            if newest is not None and (self._changed_since is None or newest > self._changed_since):
+                self._changed_since = newest
+            self._loaded_at = time.monotonic()
+            if full:
+                self._full_loaded_at = self._loaded_at
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or not self._is_stale():
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="token-versions", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"[AUTH] Erro ao recarregar versoes dos tokens: {e}")
+        finally:
+            self._refreshing = False
+
+    def is_current(self, user_id: int, version: int) -> bool:
+        if self._loaded_at is None:
+            # Without a first copy nothing could be checked, so this one load blocks
+            with self._lock:
+                if self._loaded_at is None:
+                    self.refresh(full=True)
+        elif self._is_stale():
+            # Requests keep using the previous copy while the changed rows are reloaded
+            self._refresh_in_background()
+        
+        current = self._versions.get(user_id)
+        if current is None:
+            # User created after the last refresh, nothing can have been revoked yet
+            return version == 0
+        current_version, is_active = current
+        return is_active and current_version == version
+
+    def update(self, user_id: int, version: int, is_active: bool):
+        with self._lock:
+            self._versions[user_id] = (version, is_active)
+
+token_versions = TokenVersionMap(TOKEN_VERSION_REFRESH_SECONDS)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -25,6 +148,16 @@ def get_password_hash(password: str) -> str:
     """Generate password hash"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the hashing pool, without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate password hash in the hashing pool, without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -34,19 +167,101 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
     
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", secrets.token_hex(16))  # lets logout revoke this one token
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def user_token_claims(user: User) -> dict:
+    """Claims that let role-gated routes authorize without loading the user"""
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "user_type": user.user_type,
+        "is_active": user.is_active is not False,
+        "token_version": user.token_version or 0,
+    }
+
+def decode_token_claims(token: str) -> Optional[dict]:
+    """Decode JWT access token and return its claims, or None if invalid or revoked"""
+    key = token_cache_key(token)
+    payload = verified_token_cache.get(key)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        
+        if payload.get("sub") is None:
+            return None
+        verified_token_cache.set(key, payload, expires_at=payload.get("exp"))
+    
+    # Revocation is checked on every call, cached or not
+    # Tokens without a uid could not be revoked, so they are not accepted
+    user_id = payload.get("uid")
+    if user_id is None or not token_versions.is_current(user_id, payload.get("token_version", 0)):
+        return None
+    
+    jti = payload.get("jti")
+    if jti is not None and token_denylist.is_revoked(jti):
+        return None
+    
+    return dict(payload)
+
 def decode_access_token(token: str) -> Optional[str]:
     """Decode JWT access token and return email"""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
-    except JWTError:
+    payload = decode_token_claims(token)
+    if payload is None:
         return None
+    return payload["sub"]
+
+def revoke_access_token(db: Session, claims: dict, user_id: int):
+    """Revoke a single token (logout) until it would have expired anyway"""
+    if claims.get("jti") is None:
+        # Issued before tokens carried a jti; expires on its own
+        return
+    token_denylist.revoke(db, claims["jti"], user_id, claims["exp"])
+
+def revoke_user_tokens(db: Session, user: User):
+    """Invalidate every token issued to the user so far"""
+    user.token_version = User.token_version + 1
+    db.commit()
+    db.refresh(user)
+    token_versions.update(user.id, user.token_version, user.is_active is not False)
+    invalidate_principal(user.email)
+
+def deactivate_user(db: Session, user: User):
+    """Deactivate a user; their existing tokens stop working immediately"""
+    user.is_active = False
+    revoke_user_tokens(db, user)
+
+def invalidate_principal(email: str):
+    """Drop a cached principal after its user row was updated"""
+    principal_cache.pop(email)
+
+# Never cached: password checks must see the current hash (see current_password_hash)
+PRINCIPAL_UNCACHED_COLUMNS = {"password_hash"}
+
+def current_password_hash(db: Session, user: User) -> Optional[str]:
+    """The user's password hash read from the database, never from the principal cache"""
+    return db.query(User.password_hash).filter(User.id == user.id).scalar()
+
+def _load_principal(db: Session, email: str) -> Optional[User]:
+    """Load the user for a token, from the principal cache when possible"""
+    columns = principal_cache.get(email)
+    if columns is not None:
+        # Rebuild the row and attach it to this session without a SELECT;
+        # changes made by the handler are still flushed on commit
+        user = User(**columns)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+    
+    user = db.query(User).filter(User.email == email).first()
+    if user is not None:
+        principal_cache.set(email, {
+            attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs
+            if attr.key not in PRINCIPAL_UNCACHED_COLUMNS
+        })
+    return user
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -67,7 +282,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = _load_principal(db, email)
     if user is None:
         raise credentials_exception
     
@@ -79,11 +294,38 @@ async def get_current_user(
     
     return user
 
-async def get_current_active_massagista(current_user: User = Depends(get_current_user)) -> User:
-    """Get current user ensuring they are an active massagista"""
-    if current_user.user_type != "massagista":
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Get the verified token claims without any database query"""
+    payload = decode_token_claims(credentials.credentials)
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    if not payload.get("is_active", True):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user"
+        )
+    
+    return payload
+
+async def get_current_active_massagista(claims: dict = Depends(get_token_claims)) -> dict:
+    """Get the token claims ensuring they belong to an active massagista"""
+    if claims.get("user_type") != "massagista":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return claims
+
+async def get_current_admin(claims: dict = Depends(get_token_claims)) -> dict:
+    """Get the token claims ensuring they belong to an admin"""
+    if claims.get("user_type") != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    return current_user
\ No newline at end of file
+    return claims
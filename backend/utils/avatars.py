@@ -0,0 +1,129 @@
+"""
+Avatar upload and thumbnail generation.
+
+Uploads are stored content-addressed under frontend/assets/avatars/<user_id>/, so a
+given URL never changes content and can be cached forever by browsers and CDNs.
+The WebP thumbnails are generated once, in a small background thread pool.
+"""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Optional
+
+from PIL import Image, UnidentifiedImageError
+from starlette.staticfiles import StaticFiles
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "frontend")
+AVATAR_DIR = os.path.join(FRONTEND_DIR, "assets", "avatars")
+AVATAR_URL_PREFIX = "/static/assets/avatars"
+
+THUMBNAIL_SIZES = (64, 128, 256)
+LIST_THUMBNAIL_SIZE = 128
+MAX_AVATAR_BYTES = 5 * 1024 * 1024
+ALLOWED_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+thumbnail_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AVATAR_WORKERS", "2")),
+    thread_name_prefix="avatar-thumbnails"
+)
+
+# Variants already known to exist on disk, to avoid a stat() per list item
+_ready_variants = set()
+
+class InvalidAvatar(ValueError):
+    pass
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose URLs are content-addressed and never change"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+def _variant_name(digest: str, size: int) -> str:
+    return f"{digest}-{size}.webp"
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def generate_thumbnails(user_id: int, digest: str, original_path: str):
+    """Render every thumbnail size for an uploaded avatar (runs in the worker pool)"""
+    user_dir = os.path.join(AVATAR_DIR, str(user_id))
+    with Image.open(original_path) as image:
+        image = image.convert("RGB")
+        # Center-crop to a square before resizing so thumbnails are not distorted
+        side = min(image.size)
+        left = (image.width - side) // 2
+        top = (image.height - side) // 2
+        square = image.crop((left, top, left + side, top + side))
+
+        for size in THUMBNAIL_SIZES:
+            name = _variant_name(digest, size)
+            path = os.path.join(user_dir, name)
+            if not os.path.exists(path):
+                buffer = BytesIO()
+                square.resize((size, size), Image.LANCZOS).save(buffer, "WEBP", quality=82, method=4)
+                _write_atomic(path, buffer.getvalue())
+            _ready_variants.add(f"{user_id}/{name}")
+
+def _log_thumbnail_failure(future):
+    error = future.exception()
+    if error:
+        print(f"❌ Erro ao gerar miniaturas de avatar: {error}")
+
+def save_avatar(user_id: int, data: bytes) -> Dict[str, object]:
+    """Validate and store an uploaded avatar, then queue its thumbnails"""
+    if len(data) > MAX_AVATAR_BYTES:
+        raise InvalidAvatar("Image is larger than 5 MB")
+
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image_format = image.format
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise InvalidAvatar("File is not a valid image")
+
+    extension = ALLOWED_FORMATS.get(image_format)
+    if extension is None:
+        raise InvalidAvatar("Unsupported image format")
+
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    user_dir = os.path.join(AVATAR_DIR, str(user_id))
+    os.makedirs(user_dir, exist_ok=True)
+
+    original_name = f"{digest}.{extension}"
+    original_path = os.path.join(user_dir, original_name)
+    if not os.path.exists(original_path):
+        _write_atomic(original_path, data)
+
+    future = thumbnail_executor.submit(generate_thumbnails, user_id, digest, original_path)
+    future.add_done_callback(_log_thumbnail_failure)
+
+    return {
+        "avatar_url": f"{AVATAR_URL_PREFIX}/{user_id}/{original_name}",
+        "thumbnails": {
+            size: f"{AVATAR_URL_PREFIX}/{user_id}/{_variant_name(digest, size)}"
+            for size in THUMBNAIL_SIZES
+        }
+    }
+
+def thumbnail_url(avatar_url: Optional[str], size: int = LIST_THUMBNAIL_SIZE) -> Optional[str]:
+    """URL of the avatar thumbnail, or the original while the thumbnail is not ready yet"""
+    if not avatar_url or not avatar_url.startswith(AVATAR_URL_PREFIX + "/"):
+        return avatar_url
+
+    relative = avatar_url[len(AVATAR_URL_PREFIX) + 1:]
+    user_part, _, filename = relative.partition("/")
+    variant = f"{user_part}/{_variant_name(filename.rsplit('.', 1)[0], size)}"
+
+    if variant not in _ready_variants:
+        if not os.path.exists(os.path.join(AVATAR_DIR, variant)):
+            return avatar_url
+        _ready_variants.add(variant)
+
+    return f"{AVATAR_URL_PREFIX}/{variant}"
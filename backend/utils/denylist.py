@@ -0,0 +1,131 @@
+"""
+Denylist of revoked access tokens (logout).
+
+Revoked jti values are stored in the revoked_tokens table and mirrored in memory:
+a Bloom filter answers "certainly not revoked" for almost every request without
+touching the exact set, and the exact set (jti -> exp) confirms the rare hits.
+Entries leave memory once the token itself has expired.
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from database.connection import ReadSessionLocal
+from models.users import RevokedToken
+
+DENYLIST_REFRESH_SECONDS = int(os.getenv("DENYLIST_REFRESH_SECONDS", "30"))
+DENYLIST_CAPACITY = int(os.getenv("DENYLIST_CAPACITY", "100000"))
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, value: str):
+        # Double hashing: k positions derived from the two halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+class TokenDenylist:
+    """In-memory mirror of revoked_tokens. Loaded once on first use, then reloaded in a
+    background thread every DENYLIST_REFRESH_SECONDS so revocations made by other
+    workers are picked up; revocations made here apply immediately."""
+
+    def __init__(self, refresh_seconds: int, capacity: int):
+        self.refresh_seconds = refresh_seconds
+        self.capacity = capacity
+        self._bloom = BloomFilter(capacity)
+        self._revoked: Dict[str, float] = {}
+        self._loaded_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        db = ReadSessionLocal()
+        try:
+            rows = db.query(RevokedToken.jti, RevokedToken.expires_at).filter(
+                RevokedToken.expires_at > datetime.utcnow()
+            ).all()
+        finally:
+            db.close()
+
+        now = time.time()
+        revoked = {row.jti: _timestamp(row.expires_at) for row in rows}
+        with self._lock:
+            # Keep jtis revoked here while the query ran, they may not be in its result
+            for jti, expires_at in self._revoked.items():
+                if expires_at > now:
+                    revoked.setdefault(jti, expires_at)
+            # Rebuilding drops expired entries and resizes the filter if it grew past capacity
+            bloom = BloomFilter(max(self.capacity, 2 * len(revoked)))
+            for jti in revoked:
+                bloom.add(jti)
+            self._bloom, self._revoked = bloom, revoked
+            self._loaded_at = time.monotonic()
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or not self._is_stale():
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="token-denylist", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"[AUTH] Erro ao recarregar tokens revogados: {e}")
+        finally:
+            self._refreshing = False
+
+    def is_revoked(self, jti: str) -> bool:
+        if self._loaded_at is None:
+            # Without a first copy revoked tokens would pass, so this one load blocks
+            self.refresh()
+        elif self._is_stale():
+            # Requests keep using the previous copy while the table is reloaded
+            self._refresh_in_background()
+
+        if jti not in self._bloom:
+            return False
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def add(self, jti: str, expires_at: float):
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._bloom.add(jti)
+
+    def revoke(self, db: Session, jti: str, user_id: int, expires_at: float):
+        """Persist the revocation and apply it to this process immediately"""
+        if db.query(RevokedToken.jti).filter(RevokedToken.jti == jti).first() is None:
+            db.add(RevokedToken(jti=jti, user_id=user_id, expires_at=datetime.utcfromtimestamp(expires_at)))
+            db.commit()
+        self.add(jti, expires_at)
+
+def _timestamp(value: Optional[datetime]) -> float:
+    # expires_at is stored as naive UTC
+    return (value - datetime(1970, 1, 1)).total_seconds() if value else 0.0
+
+token_denylist = TokenDenylist(DENYLIST_REFRESH_SECONDS, DENYLIST_CAPACITY)
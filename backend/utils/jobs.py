@@ -0,0 +1,234 @@
+"""
+In-process runner for periodic maintenance jobs.
+
+Every process starts a runner, but only the one holding the job_locks row for
+the runner (a lease renewed on each tick and between a job's batches) executes
+jobs, so several workers or instances never sweep at the same time. Jobs change rows in small batches, each
+in its own short transaction, and pause between batches in proportion to how
+long the batch took, so a sweep never holds locks on hot tables for long.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+JOB_TICK_SECONDS = int(os.getenv("JOB_TICK_SECONDS", "60"))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "500"))
+# Smaller batches while the clinics are open, when bookings are being written
+JOB_BUSINESS_HOURS_BATCH_SIZE = int(os.getenv("JOB_BUSINESS_HOURS_BATCH_SIZE", "100"))
+BUSINESS_HOURS = (8, 21)
+# Pause after each batch = batch duration * ratio (at least MIN_PAUSE_SECONDS)
+BACKPRESSURE_RATIO = float(os.getenv("JOB_BACKPRESSURE_RATIO", "1.0"))
+MIN_PAUSE_SECONDS = 0.05
+# Appointment and availability times are stored in the clinic's local time
+APP_TIMEZONE = ZoneInfo(os.getenv("APP_TIMEZONE", "America/Sao_Paulo"))
+# Bookings are settled this long after their start time (covers the longest session)
+BOOKING_SETTLE_HOURS = int(os.getenv("BOOKING_SETTLE_HOURS", "3"))
+
+def local_now() -> datetime:
+    return datetime.now(APP_TIMEZONE).replace(tzinfo=None)
+
+jobs_metadata = MetaData()
+
+job_locks = Table(
+    "job_locks", jobs_metadata,
+    Column("name", String(50), primary_key=True),
+    Column("holder", String(100), nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+)
+
+@dataclass
+class Job:
+    name: str
+    interval_seconds: int
+    run: Callable[["JobContext"], int]  # returns the number of rows changed
+
+@dataclass
+class JobStats:
+    runs: int = 0
+    errors: int = 0
+    last_started_at: Optional[str] = None
+    last_duration_ms: Optional[float] = None
+    last_rows: int = 0
+    total_rows: int = 0
+    last_error: Optional[str] = None
+
+class LeaseLost(Exception):
+    """Another process took the runner's lease while a job was running"""
+
+class JobContext:
+    """Helpers handed to each job run"""
+
+    def __init__(self, engine, stopping: threading.Event, renew_lease: Optional[Callable[[], bool]] = None):
+        self.engine = engine
+        self.stopping = stopping
+        self.renew_lease = renew_lease
+
+    @property
+    def batch_size(self) -> int:
+        hour = datetime.now(APP_TIMEZONE).hour
+        if BUSINESS_HOURS[0] <= hour < BUSINESS_HOURS[1]:
+            return JOB_BUSINESS_HOURS_BATCH_SIZE
+        return JOB_BATCH_SIZE
+
+    def batched(self, table, condition, values: Optional[dict] = None,
+                on_batch: Optional[Callable] = None) -> int:
+        """UPDATE (with values) or DELETE the rows matching condition, one batch per transaction.
+        on_batch(conn, ids) runs inside each batch's transaction, e.g. to update a read model.
+        The lease is renewed between batches; LeaseLost stops the job if it cannot be."""
+        pk = list(table.primary_key.columns)[0]
+        total = 0
+        while not self.stopping.is_set():
+            batch_size = self.batch_size
+            started = time.monotonic()
+            with self.engine.begin() as conn:
+                ids = [row[0] for row in conn.execute(select(pk).where(condition).limit(batch_size))]
+                if not ids:
+                    break
+                # The condition is repeated so rows changed since the SELECT are skipped
+                if values is None:
+                    statement = delete(table).where(pk.in_(ids), condition)
+                else:
+                    statement = update(table).where(pk.in_(ids), condition).values(**values)
+                total += conn.execute(statement).rowcount
+                if on_batch is not None:
+                    on_batch(conn, ids)
+            if len(ids) < batch_size:
+                break
+            self.stopping.wait(max(MIN_PAUSE_SECONDS, (time.monotonic() - started) * BACKPRESSURE_RATIO))
+            if self.renew_lease is not None and not self.renew_lease():
+                raise LeaseLost(f"{total} registros processados antes da perda do lease")
+        return total
+
+class JobRunner:
+    """Runs jobs on a background thread while this process holds the leader lease"""
+
+    def __init__(self, engine, jobs: List[Job], name: str = "maintenance"):
+        self.engine = engine
+        self.jobs = jobs
+        self.name = name
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease = timedelta(seconds=JOB_TICK_SECONDS * 3)
+        self.is_leader = False
+        self._renewed_at = 0.0
+        self.stats: Dict[str, JobStats] = {job.name: JobStats() for job in jobs}
+        self._next_run: Dict[str, float] = {}
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def create_table(self):
+        jobs_metadata.create_all(bind=self.engine)
+
+    def start(self):
+        if os.getenv("JOBS_ENABLED", "true").lower() != "true":
+            print("[JOBS] Tarefas de manutencao desativadas (JOBS_ENABLED=false)")
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=f"jobs-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.is_leader:
+            self._release()
+
+    def status(self) -> dict:
+        return {
+            "leader": self.is_leader,
+            "jobs": {name: vars(stats) for name, stats in self.stats.items()},
+        }
+
+    def acquire_leadership(self) -> bool:
+        """Take or renew the lease on this runner's lock row"""
+        now = datetime.utcnow()
+        values = {"holder": self.holder, "expires_at": now + self.lease}
+        with self.engine.begin() as conn:
+            renewed = conn.execute(
+                update(job_locks)
+                .where(job_locks.c.name == self.name)
+                .where(or_(job_locks.c.holder == self.holder, job_locks.c.expires_at < now))
+                .values(**values)
+            ).rowcount
+        if renewed == 1:
+            self._renewed_at = time.monotonic()
+            return True
+
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(job_locks).values(name=self.name, **values))
+        except IntegrityError:
+            return False  # another process holds the lease
+        self._renewed_at = time.monotonic()
+        return True
+
+    def renew_lease(self) -> bool:
+        """Renew the lease from inside a job run, at most once per third of the lease"""
+        if time.monotonic() - self._renewed_at < self.lease.total_seconds() / 3:
+            return True
+        self.is_leader = self.acquire_leadership()
+        return self.is_leader
+
+    def _release(self):
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(job_locks)
+                .where(job_locks.c.name == self.name, job_locks.c.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+            )
+        self.is_leader = False
+
+    def run_job(self, job: Job):
+        stats = self.stats[job.name]
+        stats.last_started_at = datetime.utcnow().isoformat()
+        started = time.perf_counter()
+        try:
+            rows = job.run(JobContext(self.engine, self._stopping, self.renew_lease))
+        except LeaseLost as e:
+            self.is_leader = False
+            stats.last_error = f"lease perdido: {e}"
+            print(f"[JOBS] Lease perdido, tarefa {job.name} interrompida: {e}")
+            rows = 0
+        except Exception as e:
+            stats.errors += 1
+            stats.last_error = str(e)[:500]
+            print(f"[JOBS] ERRO na tarefa {job.name}: {e}")
+            rows = 0
+        stats.runs += 1
+        stats.last_rows = rows
+        stats.total_rows += rows
+        stats.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        if rows:
+            print(f"[JOBS] {job.name}: {rows} registros em {stats.last_duration_ms} ms")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                was_leader = self.is_leader
+                self.is_leader = self.acquire_leadership()
+                if self.is_leader and not was_leader:
+                    print(f"[JOBS] Processo {self.holder} assumiu as tarefas de manutencao")
+
+                if self.is_leader:
+                    for job in self.jobs:
+                        now = time.monotonic()
+                        if not self.is_leader or self._stopping.is_set():
+                            break
+                        if now < self._next_run.get(job.name, 0):
+                            continue
+                        self.run_job(job)
+                        self._next_run[job.name] = now + job.interval_seconds
+            except Exception as e:
+                self.is_leader = False
+                print(f"[JOBS] ERRO no executor de tarefas: {e}")
+            self._stopping.wait(JOB_TICK_SECONDS)
@@ -0,0 +1,338 @@
+"""
+Background email delivery.
+
+Requests only insert a row in the email_outbox table; a worker thread delivers
+pending rows over one reused SMTP connection, retrying failures with exponential
+backoff. The outbox survives restarts, so nothing queued is lost. Each backend
+stack creates its own Mailer bound to its engine.
+"""
+import html
+import json
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from string import Template
+from typing import Dict, Optional
+
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, String, Table, Text, and_, insert, or_, select, update
+)
+
+from utils.jobs import JobContext
+
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+RETRY_MAX_SECONDS = 3600
+# A claimed row is retried after this long if its worker died mid-delivery
+CLAIM_LEASE_SECONDS = 300
+POLL_SECONDS = 5
+SMTP_IDLE_SECONDS = 60
+BATCH_SIZE = 20
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "30"))
+
+outbox_metadata = MetaData()
+
+email_outbox = Table(
+    "email_outbox", outbox_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("recipient", String(255), nullable=False),
+    Column("template", String(50), nullable=False),
+    Column("context", Text, nullable=False),  # JSON with the template variables
+    Column("status", String(20), nullable=False, default="pending"),  # pending, sent, failed
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("next_attempt_at", DateTime, nullable=False),
+    Column("last_error", Text),
+    Column("created_at", DateTime, nullable=False),
+    Column("sent_at", DateTime),
+    Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+)
+
+def purge_email_outbox(ctx: JobContext) -> int:
+    """Maintenance job shared by both stacks: drop delivered or given-up rows"""
+    cutoff = datetime.utcnow() - timedelta(days=OUTBOX_RETENTION_DAYS)
+    return ctx.batched(
+        email_outbox,
+        and_(or_(email_outbox.c.status == "sent", email_outbox.c.status == "failed"),
+             email_outbox.c.created_at < cutoff)
+    )
+
+class EmailTemplate:
+    """Subject and HTML body compiled once at import time"""
+
+    def __init__(self, subject: str, body: str):
+        self.subject = Template(subject)
+        self.body = Template(body)
+
+    def render(self, context: Dict[str, str]):
+        escaped = {key: html.escape(str(value)) for key, value in context.items()}
+        return self.subject.substitute(context), self.body.substitute(escaped)
+
+TEMPLATES = {
+    "password_reset": EmailTemplate(
+        "Espaco VIV - Codigo de Redefinicao de Senha",
+        """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <title>Espaco VIV - Redefinicao de Senha</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <div style="background: linear-gradient(135deg, #47103C 0%, #6B2154 100%); padding: 30px; border-radius: 10px; text-align: center;">
+                    <h1 style="color: white; margin: 0; font-size: 24px;">Espaco VIV</h1>
+                    <p style="color: #f0f0f0; margin: 10px 0 0 0;">Redefinicao de Senha</p>
+                </div>
+
+                <div style="padding: 30px; background: #f9f9f9; border-radius: 10px; margin-top: 20px;">
+                    <h2 style="color: #47103C; margin-top: 0;">Ola!</h2>
+                    <p>Voce solicitou a redefinicao da sua senha. Use o codigo de verificacao abaixo:</p>
+
+                    <div style="background: white; padding: 25px; border-radius: 8px; text-align: center; margin: 25px 0; border: 2px dashed #47103C;">
+                        <h2 style="color: #47103C; font-family: 'Courier New', monospace; letter-spacing: 3px; margin: 0; font-size: 28px;">$reset_token</h2>
+                    </div>
+
+                    <div style="background: #fff3cd; border: 1px solid #ffeeba; border-radius: 5px; padding: 15px; margin: 20px 0;">
+                        <p style="margin: 0; font-size: 14px; color: #856404;">
+                            <strong>Importante:</strong> Este codigo e valido por 1 hora. Se voce nao solicitou esta redefinicao, ignore este email.
+                        </p>
+                    </div>
+                </div>
+
+                <div style="text-align: center; margin-top: 30px; padding: 20px; color: #666; font-size: 12px;">
+                    <p>Esta mensagem foi enviada automaticamente pelo sistema Espaco VIV.</p>
+                    <p>Para duvidas, entre em contato conosco.</p>
+                    <hr style="border: none; border-top: 1px solid #eee; margin: 15px 0;">
+                    <p>&copy; 2024 Espaco VIV. Todos os direitos reservados.</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+    ),
+    "booking_reminder": EmailTemplate(
+        "Espaco VIV - Lembrete do seu agendamento",
+        """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <title>Espaco VIV - Lembrete de Agendamento</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <div style="background: linear-gradient(135deg, #47103C 0%, #6B2154 100%); padding: 30px; border-radius: 10px; text-align: center;">
+                    <h1 style="color: white; margin: 0; font-size: 24px;">Espaco VIV</h1>
+                    <p style="color: #f0f0f0; margin: 10px 0 0 0;">Lembrete de Agendamento</p>
+                </div>
+
+                <div style="padding: 30px; background: #f9f9f9; border-radius: 10px; margin-top: 20px;">
+                    <h2 style="color: #47103C; margin-top: 0;">Ola, $client_name!</h2>
+                    <p>Este e um lembrete do seu agendamento:</p>
+
+                    <div style="background: white; padding: 25px; border-radius: 8px; margin: 25px 0; border: 2px dashed #47103C;">
+                        <p style="margin: 0;"><strong>Servico:</strong> $service</p>
+                        <p style="margin: 0;"><strong>Data:</strong> $date as $time</p>
+                        <p style="margin: 0;"><strong>Unidade:</strong> $unit_name</p>
+                    </div>
+
+                    <p>Se nao puder comparecer, entre em contato conosco para remarcar.</p>
+                </div>
+
+                <div style="text-align: center; margin-top: 30px; padding: 20px; color: #666; font-size: 12px;">
+                    <p>Esta mensagem foi enviada automaticamente pelo sistema Espaco VIV.</p>
+                    <hr style="border: none; border-top: 1px solid #eee; margin: 15px 0;">
+                    <p>&copy; 2024 Espaco VIV. Todos os direitos reservados.</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+    ),
+}
+
+class SmtpSettings:
+    def __init__(self):
+        self.server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+        self.port = int(os.getenv("SMTP_PORT", "587"))
+        self.user = os.getenv("SMTP_USER", "")
+        self.password = os.getenv("SMTP_PASSWORD", "")
+        self.use_tls = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+        self.from_name = os.getenv("EMAIL_FROM_NAME", "Espaco VIV")
+        self.from_address = self.user or os.getenv("EMAIL_FROM", "noreply@espacoviv.com")
+        self.reply_to = os.getenv("EMAIL_REPLY_TO", "noreply@espacoviv.com")
+        has_credentials = bool(self.user and self.password)
+        # Without credentials only a local server without TLS (e.g. a debugging server) can work
+        self.enabled = (
+            os.getenv("EMAIL_ENABLED", "true" if has_credentials else "false").lower() == "true"
+            and (has_credentials or not self.use_tls)
+        )
+
+class Mailer:
+    """Outbox writer plus the worker thread that delivers it"""
+
+    def __init__(self, engine, settings: Optional[SmtpSettings] = None):
+        self.engine = engine
+        self.settings = settings or SmtpSettings()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._smtp = None
+        self._smtp_used_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.enabled
+
+    def create_table(self):
+        outbox_metadata.create_all(bind=self.engine, tables=[email_outbox])
+
+    def enqueue(self, recipient: str, template: str, context: Dict[str, str]) -> bool:
+        """Queue an email; returns False when email delivery is not configured"""
+        if template not in TEMPLATES:
+            raise ValueError(f"Unknown email template: {template}")
+        if not self.enabled:
+            return False
+
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            conn.execute(insert(email_outbox).values(
+                recipient=recipient,
+                template=template,
+                context=json.dumps(context),
+                status="pending",
+                attempts=0,
+                next_attempt_at=now,
+                created_at=now,
+            ))
+        self.start()
+        self._wakeup.set()
+        return True
+
+    def start(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._close_smtp()
+
+    def _run(self):
+        print("[EMAIL] Fila de envio iniciada")
+        while not self._stopping.is_set():
+            try:
+                delivered = self.process_due()
+            except Exception as e:
+                print(f"[EMAIL] ERRO ao processar fila de envio: {e}")
+                delivered = 0
+            if delivered < BATCH_SIZE:
+                self._wakeup.wait(POLL_SECONDS)
+                self._wakeup.clear()
+            if self._smtp is not None and time.monotonic() - self._smtp_used_at > SMTP_IDLE_SECONDS:
+                self._close_smtp()
+
+    def process_due(self) -> int:
+        """Deliver one batch of due emails, returning how many were attempted"""
+        now = datetime.utcnow()
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(email_outbox)
+                .where(and_(email_outbox.c.status == "pending", email_outbox.c.next_attempt_at <= now))
+                .order_by(email_outbox.c.next_attempt_at)
+                .limit(BATCH_SIZE)
+            ).fetchall()
+
+        for row in rows:
+            if self._claim(row, now):
+                self._deliver(row)
+        return len(rows)
+
+    def _claim(self, row, now: datetime) -> bool:
+        # Conditional update so two workers (or processes) never send the same row
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(email_outbox)
+                .where(and_(
+                    email_outbox.c.id == row.id,
+                    email_outbox.c.status == "pending",
+                    email_outbox.c.next_attempt_at == row.next_attempt_at,
+                ))
+                .values(
+                    attempts=email_outbox.c.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=CLAIM_LEASE_SECONDS),
+                )
+            )
+        return result.rowcount == 1
+
+    def _deliver(self, row):
+        attempts = row.attempts + 1
+        try:
+            subject, body = TEMPLATES[row.template].render(json.loads(row.context))
+            self._send(row.recipient, subject, body)
+        except Exception as e:
+            if attempts >= MAX_ATTEMPTS:
+                values = {"status": "failed"}
+                print(f"[EMAIL] ERRO: desistindo de enviar para {row.recipient} apos {attempts} tentativas: {e}")
+            else:
+                delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+                values = {"next_attempt_at": datetime.utcnow() + timedelta(seconds=delay)}
+                print(f"[EMAIL] ERRO ao enviar para {row.recipient} (tentativa {attempts}), nova tentativa em {delay}s: {e}")
+            with self.engine.begin() as conn:
+                conn.execute(update(email_outbox).where(email_outbox.c.id == row.id).values(
+                    last_error=str(e)[:1000], **values
+                ))
+            return
+
+        with self.engine.begin() as conn:
+            conn.execute(update(email_outbox).where(email_outbox.c.id == row.id).values(
+                status="sent", sent_at=datetime.utcnow(), last_error=None
+            ))
+        print(f"[EMAIL] Email '{row.template}' enviado com sucesso para {row.recipient}")
+
+    def _send(self, recipient: str, subject: str, body: str):
+        msg = MIMEMultipart()
+        msg["From"] = f"{self.settings.from_name} <{self.settings.from_address}>"
+        msg["To"] = recipient
+        msg["Reply-To"] = self.settings.reply_to
+        msg["Subject"] = subject
+        msg.attach(MIMEText(body, "html"))
+
+        try:
+            self._connection().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The server dropped the idle connection; reconnect once
+            self._close_smtp()
+            self._connection().send_message(msg)
+        self._smtp_used_at = time.monotonic()
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            settings = self.settings
+            smtp = smtplib.SMTP(settings.server, settings.port, timeout=30)
+            if settings.use_tls:
+                smtp.starttls()
+            if settings.user and settings.password:
+                smtp.login(settings.user, settings.password)
+            self._smtp = smtp
+        return self._smtp
+
+    def _close_smtp(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
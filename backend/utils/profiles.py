@@ -0,0 +1,54 @@
+import os
+from typing import Any, Dict
+
+from sqlalchemy import Boolean, exists, func, literal, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from models.users import MassagistaProfile
+from utils.cache import TTLCache
+
+# Parsed massagista profiles by user id, invalidated whenever a profile is written.
+# Invalidation only reaches this worker, so the TTL bounds how long others serve an old profile.
+profile_cache = TTLCache(maxsize=2048, ttl=int(os.getenv("PROFILE_CACHE_TTL", "30")))
+
+def has_specialty(db: Session, specialty: str):
+    """Filter on MassagistaProfile.specialties containing specialty: the GIN-indexed
+    jsonb @> operator on PostgreSQL, json_each on SQLite"""
+    if db.get_bind().dialect.name == "postgresql":
+        return MassagistaProfile.specialties.op("@>", return_type=Boolean)(literal([specialty], JSONB))
+    items = func.json_each(MassagistaProfile.specialties).table_valued("value")
+    return exists(select(1).select_from(items).where(items.c.value == specialty))
+
+def build_profile_view(profile: MassagistaProfile) -> Dict[str, Any]:
+    """Profile fields as returned by the API"""
+    if profile is None:
+        return {
+            "specialties": [],
+            "unit_preference": None,
+            "bio": None,
+            "avatar_url": None,
+            "is_available": True,
+            "working_hours": {}
+        }
+
+    return {
+        "specialties": profile.specialty_list,
+        "unit_preference": profile.unit_preference,
+        "bio": profile.bio,
+        "avatar_url": profile.avatar_url,
+        "is_available": profile.is_available,
+        "working_hours": profile.working_hours_map
+    }
+
+def get_profile_view(db: Session, user_id: int) -> Dict[str, Any]:
+    """Read-through cache of the parsed profile; never writes to the database"""
+    view = profile_cache.get(user_id)
+    if view is None:
+        profile = db.query(MassagistaProfile).filter(MassagistaProfile.user_id == user_id).first()
+        view = build_profile_view(profile)
+        profile_cache.set(user_id, view)
+    return view
+
+def invalidate_profile(user_id: int):
+    profile_cache.pop(user_id)
@@ -0,0 +1,237 @@
+"""
+Rate limiting for credential and public endpoints.
+
+Token buckets per client IP (and per account for login), checked in an ASGI
+middleware so abusive requests are rejected before any password hashing or
+database work. Buckets live in process memory by default; set RATE_LIMIT_REDIS_URL
+to share them between workers.
+"""
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+# Number of reverse proxies in front of the app. Render (which sets RENDER=true) uses 1;
+# elsewhere the default 0 ignores X-Forwarded-For, since clients could forge it.
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "1" if os.getenv("RENDER") else "0"))
+
+MAX_BODY_BYTES = 64 * 1024
+
+@dataclass
+class RateLimitRule:
+    name: str
+    pattern: str  # regex matched against the request path
+    methods: Tuple[str, ...]
+    capacity: int  # burst size
+    per_seconds: float  # time to refill the whole bucket
+    by_account: bool = False  # also limit by the "email" field of the JSON body
+
+    def __post_init__(self):
+        self.regex = re.compile(self.pattern)
+        self.refill_rate = self.capacity / self.per_seconds
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and self.regex.match(path) is not None
+
+def default_rules() -> List[RateLimitRule]:
+    """Limits for login/password endpoints and the unauthenticated calendar reads"""
+    return [
+        RateLimitRule("login", r"^/api/auth/login$", ("POST",),
+                      capacity=int(os.getenv("RATE_LIMIT_LOGIN_PER_IP", "10")), per_seconds=60,
+                      by_account=True),
+        RateLimitRule("password", r"^/api/auth/(forgot|reset)-password$", ("POST",),
+                      capacity=int(os.getenv("RATE_LIMIT_PASSWORD_PER_IP", "5")), per_seconds=300,
+                      by_account=True),
+        RateLimitRule("calendar", r"^/api/(calendar/|bookings/available-|massagista/(by-unit/|\d+/availability/))",
+                      ("GET",),
+                      capacity=int(os.getenv("RATE_LIMIT_CALENDAR_PER_IP", "120")), per_seconds=60),
+    ]
+
+class InMemoryBackend:
+    """Token buckets in a dict of (tokens, updated_at, capacity, refill_rate) tuples, swept once refilled"""
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self._buckets = {}
+        self._sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+
+    async def allow(self, key: str, capacity: int, refill_rate: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        if now - self._last_sweep > self._sweep_interval:
+            self._sweep(now)
+
+        tokens, updated_at, _, _ = self._buckets.get(key, (capacity, now, capacity, refill_rate))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now, capacity, refill_rate)
+            return True, 0.0
+
+        self._buckets[key] = (tokens, now, capacity, refill_rate)
+        return False, (1 - tokens) / refill_rate
+
+    def _sweep(self, now: float):
+        """Drop buckets that are full again - they behave exactly like missing ones"""
+        self._last_sweep = now
+        expired = [
+            key for key, (tokens, updated_at, capacity, refill_rate) in self._buckets.items()
+            if tokens + (now - updated_at) * refill_rate >= capacity
+        ]
+        for key in expired:
+            del self._buckets[key]
+
+class RedisBackend:
+    """Token buckets shared by every worker, updated atomically with a Lua script"""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    async def allow(self, key: str, capacity: int, refill_rate: float) -> Tuple[bool, float]:
+        try:
+            allowed, retry_after = await self._script(
+                keys=[f"ratelimit:{key}"], args=[capacity, refill_rate, time.time()]
+            )
+        except Exception as e:
+            # Fail open: an unavailable Redis must not take the login down
+            print(f"[RATE LIMIT] Erro no Redis, permitindo requisicao: {e}")
+            return True, 0.0
+        return bool(int(allowed)), float(retry_after)
+
+def create_backend():
+    if RATE_LIMIT_REDIS_URL:
+        return RedisBackend(RATE_LIMIT_REDIS_URL)
+    return InMemoryBackend()
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_PROXY_HOPS > 0:
+        for name, value in scope.get("headers", []):
+            if name == b"x-forwarded-for":
+                hops = [part.strip() for part in value.decode("latin-1").split(",") if part.strip()]
+                if hops:
+                    return hops[max(0, len(hops) - RATE_LIMIT_PROXY_HOPS)]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class RateLimitMiddleware:
+    """ASGI middleware rejecting requests over the limit with 429 before the route runs"""
+
+    def __init__(self, app, rules: Optional[List[RateLimitRule]] = None, backend=None):
+        self.app = app
+        self.rules = rules if rules is not None else default_rules()
+        self.backend = backend or create_backend()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        path = scope["path"]
+        rule = next((r for r in self.rules if r.matches(method, path)), None)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed, retry_after = await self.backend.allow(
+            f"{rule.name}:ip:{client_ip(scope)}", rule.capacity, rule.refill_rate
+        )
+
+        if allowed and rule.by_account:
+            body, receive = await self._buffer_body(receive)
+            if body is None:
+                await self._send_error(send, 413, "Requisicao muito grande.")
+                return
+            account = self._account_from_body(body)
+            if account:
+                allowed, retry_after = await self.backend.allow(
+                    f"{rule.name}:account:{account}", rule.capacity, rule.refill_rate
+                )
+
+        if not allowed:
+            headers = [(b"retry-after", str(max(1, int(retry_after + 0.999))).encode())]
+            await self._send_error(send, 429, "Muitas tentativas. Tente novamente em instantes.", headers)
+            return
+
+        await self.app(scope, receive, send)
+
+    async def _buffer_body(self, receive) -> Tuple[Optional[bytes], Callable]:
+        """Read the request body and return a receive() that replays it to the app.
+
+        The body is None when it exceeds MAX_BODY_BYTES; the request must then be rejected.
+        """
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None, receive
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return body, replay
+
+    @staticmethod
+    def _account_from_body(body: bytes) -> Optional[str]:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        email = data.get("email") if isinstance(data, dict) else None
+        if not isinstance(email, str):
+            return None
+        return email.strip().lower() or None
+
+    @staticmethod
+    async def _send_error(send, status: int, detail: str, headers: Optional[List[Tuple[bytes, bytes]]] = None):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ] + (headers or []),
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,208 @@
+"""
+Appointment reminders, sent 24 h and 2 h before each booking.
+
+Only reminders due in the next REMINDER_LOOKAHEAD_HOURS are kept in memory, in a
+heap ordered by due time. The window is extended incrementally with an indexed
+query on bookings.appointment_date, and booking create/cancel events update the
+heap directly, so the work done is proportional to the reminders due, not to the
+size of the bookings table. Each reminder is claimed with a conditional UPDATE on
+bookings.reminders_sent, so several processes never send the same reminder twice.
+"""
+import heapq
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Set, Tuple
+
+from sqlalchemy import and_, update
+
+from models.bookings import Booking, BookingStatus
+from utils.jobs import local_now
+
+# (flag bit in bookings.reminders_sent, time before the appointment)
+REMINDERS = (
+    (1, timedelta(hours=24)),
+    (2, timedelta(hours=2)),
+)
+ALL_REMINDERS_SENT = 3
+LATE_REMINDER_GRACE = timedelta(hours=1)
+
+REMINDER_LOOKAHEAD_HOURS = int(os.getenv("REMINDER_LOOKAHEAD_HOURS", "48"))
+REMINDER_LOAD_MINUTES = int(os.getenv("REMINDER_LOAD_MINUTES", "10"))
+
+ACTIVE_STATUSES = [BookingStatus.PENDING, BookingStatus.CONFIRMED]
+
+class ReminderScheduler:
+    """Heap of (due_at, booking_id, flag) served by one background thread"""
+
+    def __init__(self, session_factory, mailer):
+        self.session_factory = session_factory
+        self.mailer = mailer
+        self.lookahead = timedelta(hours=REMINDER_LOOKAHEAD_HOURS)
+        self.load_interval = timedelta(minutes=REMINDER_LOAD_MINUTES)
+        self._heap: List[Tuple[datetime, int, int]] = []
+        # Heap items per booking, so cancelled ids are forgotten once their last item is popped
+        self._queued: Dict[int, int] = {}
+        self._cancelled: Set[int] = set()
+        self._loaded_until = None
+        self._next_load_at = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def start(self):
+        if not self.mailer.enabled:
+            print("[REMINDERS] Email desativado, lembretes de agendamento nao serao enviados")
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="booking-reminders", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # Booking events
+
+    def schedule_booking(self, booking_id: int, appointment_at: datetime, reminders_sent: int = 0):
+        """Add a booking's reminders if it falls inside the window already loaded"""
+        with self._lock:
+            if booking_id in self._cancelled:
+                # Rescheduled after a cancel: its old reminders must not come back to life
+                self._heap = [item for item in self._heap if item[1] != booking_id]
+                heapq.heapify(self._heap)
+                self._queued.pop(booking_id, None)
+                self._cancelled.discard(booking_id)
+            if self._loaded_until is None or appointment_at > self._loaded_until:
+                return  # picked up by a later incremental load
+            self._push(booking_id, appointment_at, reminders_sent, local_now())
+        self._wakeup.set()
+
+    def cancel_booking(self, booking_id: int):
+        """Drop a booking's pending reminders (removed lazily when they reach the top)"""
+        with self._lock:
+            if booking_id in self._queued:
+                self._cancelled.add(booking_id)
+
+    # Internals
+
+    def _push(self, booking_id: int, appointment_at: datetime, reminders_sent: int, now: datetime):
+        for flag, before in REMINDERS:
+            if reminders_sent & flag or appointment_at <= now:
+                continue
+            due_at = appointment_at - before
+            # Late reminders (booking made less than 24 h ahead, or missed during a
+            # restart) are dropped unless they are the last one before the appointment
+            is_last = before == min(b for _, b in REMINDERS)
+            if not is_last and due_at < now - LATE_REMINDER_GRACE:
+                continue
+            heapq.heappush(self._heap, (due_at, booking_id, flag))
+            self._queued[booking_id] = self._queued.get(booking_id, 0) + 1
+
+    def load_window(self):
+        """Load reminders for appointments between the loaded horizon and now + lookahead"""
+        now = local_now()
+        start = self._loaded_until or now
+        end = now + self.lookahead
+
+        db = self.session_factory()
+        try:
+            rows = db.query(Booking.id, Booking.appointment_date, Booking.reminders_sent).filter(
+                and_(
+                    Booking.appointment_date > start,
+                    Booking.appointment_date <= end,
+                    Booking.status.in_(ACTIVE_STATUSES),
+                    Booking.client_email != None,
+                    Booking.reminders_sent < ALL_REMINDERS_SENT
+                )
+            ).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            for row in rows:
+                self._push(row.id, row.appointment_date, row.reminders_sent or 0, now)
+            self._loaded_until = end
+        self._next_load_at = now + self.load_interval
+
+    def _pop_due(self, now: datetime) -> List[Tuple[datetime, int, int]]:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                item = heapq.heappop(self._heap)
+                booking_id = item[1]
+                if booking_id not in self._cancelled:
+                    due.append(item)
+                self._queued[booking_id] -= 1
+                if not self._queued[booking_id]:
+                    del self._queued[booking_id]
+                    self._cancelled.discard(booking_id)
+        return due
+
+    def _seconds_until_next(self, now: datetime) -> float:
+        next_at = self._next_load_at
+        with self._lock:
+            if self._heap and self._heap[0][0] < next_at:
+                next_at = self._heap[0][0]
+        return max(0.0, (next_at - now).total_seconds())
+
+    def send_reminder(self, booking_id: int, flag: int):
+        db = self.session_factory()
+        try:
+            # Claim the reminder; fails if it was already sent or the booking was cancelled
+            claimed = db.execute(
+                update(Booking)
+                .where(and_(
+                    Booking.id == booking_id,
+                    Booking.status.in_(ACTIVE_STATUSES),
+                    Booking.reminders_sent.op("&")(flag) == 0
+                ))
+                .values(reminders_sent=Booking.reminders_sent.op("|")(flag))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed != 1:
+                db.rollback()
+                return
+
+            booking = db.query(Booking).filter(Booking.id == booking_id).first()
+            recipient = booking.client_email
+            context = {
+                "client_name": booking.client_name,
+                "service": booking.service,
+                "date": booking.appointment_date.strftime("%d/%m/%Y"),
+                "time": booking.appointment_time,
+                "unit_name": booking.unit.name if booking.unit else "",
+            }
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # Enqueued after the claim is committed: a crash in between skips the reminder
+        # rather than sending it twice
+        self.mailer.enqueue(recipient, "booking_reminder", context)
+
+    def _run(self):
+        print("[REMINDERS] Agendador de lembretes iniciado")
+        while not self._stopping.is_set():
+            try:
+                now = local_now()
+                if self._next_load_at is None or now >= self._next_load_at:
+                    self.load_window()
+                for _, booking_id, flag in self._pop_due(now):
+                    self.send_reminder(booking_id, flag)
+                wait = self._seconds_until_next(local_now())
+            except Exception as e:
+                print(f"[REMINDERS] ERRO ao processar lembretes: {e}")
+                wait = 30
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
@@ -0,0 +1,51 @@
+"""
+Startup phase timings.
+
+Lifespans wrap each startup step in startup_timer.phase(...) so cold-start
+latency can be tracked per phase from /api/admin/metrics instead of guessed from logs.
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+class StartupTimer:
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.started_at: Optional[str] = None
+        self.ready_at: Optional[str] = None
+        self.total_ms: Optional[float] = None
+        self._started = None
+
+    def begin(self):
+        self.phases = {}
+        self.started_at = datetime.utcnow().isoformat()
+        self.ready_at = None
+        self.total_ms = None
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        if self._started is None:
+            self.begin()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def finish(self):
+        self.ready_at = datetime.utcnow().isoformat()
+        self.total_ms = round((time.perf_counter() - self._started) * 1000, 1) if self._started else 0.0
+        slowest = max(self.phases, key=self.phases.get) if self.phases else "-"
+        print(f"[STARTUP] Aplicacao pronta em {self.total_ms} ms (fase mais lenta: {slowest})")
+
+    def status(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "ready_at": self.ready_at,
+            "total_ms": self.total_ms,
+            "phases_ms": dict(self.phases),
+        }
+
+startup_timer = StartupTimer()